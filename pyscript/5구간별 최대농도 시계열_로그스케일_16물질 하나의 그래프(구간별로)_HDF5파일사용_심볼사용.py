@@ -5,9 +5,13 @@ import matplotlib.pyplot as plt
 from matplotlib.ticker import FuncFormatter, MaxNLocator
 from cycler import cycler
 
+from freshness import stale_groups
+
 # 기본 경로 설정
 output_path = r'C:\CAM_test_analysis\output'
 hdf5_file = os.path.join(output_path, 'concentration_data.h5')
+# concentration_data.h5 를 만든 1분 간격 프레임 (최신 여부 확인용)
+frames_folder = r'C:\CAM_test_analysis\hdf5_live'
 
 # 거리 구간 정의 (미터 단위)
 distance_ranges = [(0, 500), (500, 1000), (1000, 3000), (3000, 5000), (5000, 7000)]
@@ -90,6 +94,10 @@ if __name__ == "__main__":
         print(f"Error: HDF5 파일 '{hdf5_file}'이 존재하지 않습니다.")
         print("먼저 HDF5 파일 생성 스크립트를 실행해주세요.")
     else:
+        stale = stale_groups(hdf5_file, frames_folder, substances, distance_ranges)
+        if stale:
+            print(f"주의: 입력 프레임이나 설정이 바뀐 그룹이 있습니다 ({', '.join(f'{m}/{s}' for m, s in stale)}).")
+            print("HDF5 파일 생성 스크립트를 먼저 실행하면 최신 결과로 그립니다.")
         print("그래프 생성 중...")
         for medium in ['Air', 'Soil']:
             for distance_range in distance_ranges:
@@ -1,18 +1,21 @@
 import os
+import re
 import numpy as np
 import h5py
+from hdf5_store import MINUTE_TIME_UNITS, frame_store_path, open_frames, frame_times
+from ring_stats import DEFAULT_STATISTICS, check_statistics, ring_summary_series
+from grid_geometry import read_geometry
+from freshness import ring_params, store_signature, is_fresh, clear_inputs, record_inputs
 
 # 기본 경로 설정
-base_input_path = r'C:\CAM_test_analysis\input'
 output_path = r'C:\CAM_test_analysis\output'
 hdf5_file = os.path.join(output_path, 'concentration_data.h5')
+# 1분 간격 자료를 저장한 HDF5 (hdf5_watch.py 또는 convert_to_hdf5(..., interval='1minute_interval'))
+frames_folder = r'C:\CAM_test_analysis\hdf5_live'
 
 # 거리 구간 정의 (미터 단위)
 distance_ranges = [(0, 500), (500, 1000), (1000, 3000), (3000, 5000), (5000, 7000)]
 
-# 중심점 설정 (75번째와 76번째 격자 사이)
-center = (75.5, 75.5)
-
 # 물질 목록
 substances = [
     "Ethylacetate", "Benzene", "Methylacrylate", "Methyltrichlorosilane", "Ethyleneoxide",
@@ -21,72 +24,113 @@ substances = [
 ]
 
 
-def calculate_distance(x, y, center):
-    """격자 위치로부터 중심까지의 거리 계산"""
-    return np.sqrt((x - center[0]) ** 2 + (y - center[1]) ** 2) * 100  # 100m per grid
-
-
-def read_file(file_path):
-    """텍스트 파일을 읽어 numpy 배열로 변환"""
-    with open(file_path, 'r') as f:
-        lines = f.readlines()
-    data = [line.strip().split() for line in lines]
-    return np.array(data, dtype=float)
+def _replace_dataset(group, name, data):
+    if name in group:
+        del group[name]
+    group.create_dataset(name, data=data)
 
 
-def get_max_concentrations(data, distance_ranges):
-    """각 거리 구간별 최대 농도 계산"""
-    max_concentrations = []
-    for start, end in distance_ranges:
-        mask = (calculate_distance(*np.indices(data.shape), center) >= start) & \
-               (calculate_distance(*np.indices(data.shape), center) < end)
-        masked_data = data[mask]
-        masked_data = masked_data[masked_data > 0]  # 0 제외
-        if masked_data.size > 0:
-            max_concentrations.append(np.max(masked_data))
-        else:
-            max_concentrations.append(np.nan)  # 모든 값이 0이면 NaN 추가
-    return max_concentrations
+def _save_statistics(substance_group, results):
+    """통계별 (시간, 구간) 데이터셋을 'statistics' 그룹에 저장 (이미 있는 통계는 덮어씀)"""
+    stats_group = substance_group.require_group('statistics')
+    stats_group.attrs['distance_ranges'] = np.array(distance_ranges)
+    for name, values in results.items():
+        _replace_dataset(stats_group, name, values)
 
 
-def process_and_save_to_hdf5():
-    with h5py.File(hdf5_file, 'w') as f:
+def process_and_save_to_hdf5(statistics=DEFAULT_STATISTICS, force=False):
+    """1분 간격 HDF5 프레임에서 물질/매체별 (시간, 구간) 통계를 블록 단위로 한 번에 계산해 저장.
+    구간별 '{start}m-{end}m' 데이터셋은 기존과 같은 0 제외 최대 농도, 모든 통계는 'statistics' 그룹.
+    그룹마다 입력 프레임과 설정 (거리 구간, 중심점) 을 기록해 두고, 바뀐 그룹만 다시 계산해 그 자리에서 갱신.
+    이미 저장된 다른 통계도 함께 다시 계산함. force: 모든 그룹을 다시 계산"""
+    statistics = tuple(dict.fromkeys(('positive_max',) + check_statistics(statistics)))
+    with h5py.File(hdf5_file, 'a') as f:
         for medium in ['Air', 'Soil']:
-            medium_group = f.create_group(medium)
+            medium_group = f.require_group(medium)
 
             for i, substance_name in enumerate(substances, start=26):
-                substance_group = medium_group.create_group(substance_name)
-                folder_name = f'Concentration{i}'
-
-                if medium == 'Air':
-                    folder_path = os.path.join(base_input_path, folder_name, '1minute_interval', 'Air1')
-                else:
-                    folder_path = os.path.join(base_input_path, folder_name, '1minute_interval', 'Soil')
-
-                if os.path.exists(folder_path):
-                    times = []
-                    results = [[] for _ in range(len(distance_ranges))]
-
-                    for filename in sorted(os.listdir(folder_path)):
-                        if filename.endswith('.TXT'):
-                            minutes = int(filename.split()[1].split('min')[0])
-                            times.append(minutes)
-
-                            file_path = os.path.join(folder_path, filename)
-                            data = read_file(file_path)
-                            max_concentrations = get_max_concentrations(data, distance_ranges)
-
-                            for i, concentration in enumerate(max_concentrations):
-                                results[i].append(concentration)
-
-                    substance_group.create_dataset('times', data=times)
-                    for i, (start, end) in enumerate(distance_ranges):
-                        substance_group.create_dataset(f'{start}m-{end}m', data=results[i])
-                else:
-                    print(f"폴더가 존재하지 않습니다: {folder_path}")
+                substance_group = medium_group.require_group(substance_name)
+                store_path = frame_store_path(frames_folder, i)
+
+                if not os.path.exists(store_path):
+                    print(f"저장 파일이 존재하지 않습니다: {store_path}")
+                    continue
+                with open_frames(store_path) as store:
+                    if medium not in store:
+                        print(f"{store_path}에 {medium} 자료가 없습니다.")
+                        continue
+                    # 중심점과 격자 크기는 저장 파일의 격자 정보 (기본: 75번째와 76번째 격자 사이, 100m)
+                    geometry = read_geometry(store)
+                    params = ring_params(distance_ranges, geometry)
+                    signature = store_signature(store, medium)
+                    stored = list(substance_group['statistics']) if 'statistics' in substance_group else []
+                    wanted = tuple(dict.fromkeys(statistics + tuple(stored)))
+                    if not force and is_fresh(substance_group, signature, params) and set(statistics) <= set(stored):
+                        print(f"{medium}/{substance_name}: 변경 없음")
+                        continue
+
+                    clear_inputs(substance_group)
+                    times, units = frame_times(store[medium])
+                    results = ring_summary_series(store[medium], wanted, distance_ranges, geometry.source,
+                                                  geometry.cell_size)
+
+                # 1분 간격 자료의 시간은 모형 시작 후 경과 분 (정수)
+                if units == MINUTE_TIME_UNITS:
+                    times = times.astype(np.int64)
+                _replace_dataset(substance_group, 'times', times)
+                # 거리 구간이 바뀌었으면 예전 구간 데이터셋은 삭제
+                for name in [k for k in substance_group if re.fullmatch(r'\d+m-\d+m', k)]:
+                    del substance_group[name]
+                for k, (start, end) in enumerate(distance_ranges):
+                    _replace_dataset(substance_group, f'{start}m-{end}m', results['positive_max'][:, k])
+                if 'statistics' in substance_group:
+                    del substance_group['statistics']
+                _save_statistics(substance_group, results)
+                record_inputs(substance_group, store_path, signature, params)
+                print(f"{medium}/{substance_name}: 다시 계산 ({len(times)}개 프레임)")
+
+
+def add_statistics(statistics):
+    """이미 만든 concentration_data.h5 에 없는 통계만 HDF5 프레임에서 계산해 추가 (원본 .TXT 는 읽지 않음)"""
+    statistics = check_statistics(statistics)
+    if not os.path.exists(hdf5_file):
+        print(f"HDF5 파일이 없습니다: {hdf5_file}. process_and_save_to_hdf5()로 먼저 만드세요.")
+        return
+    with h5py.File(hdf5_file, 'r+') as f:
+        for medium in ['Air', 'Soil']:
+            for i, substance_name in enumerate(substances, start=26):
+                path = f"{medium}/{substance_name}"
+                if path not in f:
+                    print(f"{path}: 저장된 결과가 없어 건너뜁니다. process_and_save_to_hdf5()로 만드세요.")
+                    continue
+                substance_group = f[path]
+                # 저장 파일이 없어 계산하지 않은 물질 (process_and_save_to_hdf5 에서 이미 알림)
+                if 'times' not in substance_group:
+                    continue
+                existing = substance_group['statistics'] if 'statistics' in substance_group else {}
+                missing = [name for name in statistics if name not in existing]
+                if not missing:
+                    continue
+                store_path = frame_store_path(frames_folder, i)
+                if not os.path.exists(store_path):
+                    print(f"저장 파일이 존재하지 않습니다: {store_path}")
+                    continue
+                with open_frames(store_path) as store:
+                    if medium not in store:
+                        print(f"{store_path}에 {medium} 자료가 없습니다.")
+                        continue
+                    geometry = read_geometry(store)
+                    if not is_fresh(substance_group, store_signature(store, medium),
+                                    ring_params(distance_ranges, geometry)):
+                        print(f"{medium}/{substance_name}: 입력이 바뀌었습니다. process_and_save_to_hdf5()로 다시 만드세요.")
+                        continue
+                    results = ring_summary_series(store[medium], missing, distance_ranges, geometry.source,
+                                                  geometry.cell_size)
+                _save_statistics(substance_group, results)
+                print(f"{medium}/{substance_name}: {', '.join(missing)} 추가")
 
 
 if __name__ == "__main__":
-    print("HDF5 파일 생성 중...")
+    print("HDF5 파일 갱신 중...")
     process_and_save_to_hdf5()
-    print(f"HDF5 파일이 '{hdf5_file}'에 생성되었습니다.")
\ No newline at end of file
+    print(f"HDF5 파일 '{hdf5_file}'이 갱신되었습니다.")
\ No newline at end of file
@@ -3,16 +3,22 @@ import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 from matplotlib.ticker import FuncFormatter, MaxNLocator
+from grid_reader import read_grid, parse_frame_time
+from frame_catalog import list_catalog_files
+from ring_stats import ring_max
+from grid_geometry import DEFAULT_GEOMETRY
 
 # 기본 경로 설정
 base_input_path = r'C:\CAM_test_analysis\input'
 output_path = r'C:\CAM_test_analysis\output'
+# 파일 목록 카탈로그 (frame_catalog.py)
+catalog_path = r'C:\CAM_test_analysis\frame_catalog.sqlite'
 
 # 거리 구간 정의 (미터 단위)
 distance_ranges = [(0, 500), (500, 1000), (1000, 3000), (3000, 5000), (5000, 7000)]
 
-# 중심점 설정 (75번째와 76번째 격자 사이)
-center = (75.5, 75.5)
+# 중심점 설정 (기본 격자의 배출원 위치, 75번째와 76번째 격자 사이)
+center = DEFAULT_GEOMETRY.source
 
 # 물질 목록
 substances = [
@@ -22,32 +28,9 @@ substances = [
 ]
 
 
-def calculate_distance(x, y, center):
-    """격자 위치로부터 중심까지의 거리 계산"""
-    return np.sqrt((x - center[0]) ** 2 + (y - center[1]) ** 2) * 100  # 100m per grid
-
-
 def read_file(file_path):
     """텍스트 파일을 읽어 numpy 배열로 변환"""
-    with open(file_path, 'r') as f:
-        lines = f.readlines()
-    data = [line.strip().split() for line in lines]
-    return np.array(data, dtype=float)
-
-
-def get_max_concentrations(data, distance_ranges):
-    """각 거리 구간별 최대 농도 계산"""
-    max_concentrations = []
-    for start, end in distance_ranges:
-        mask = (calculate_distance(*np.indices(data.shape), center) >= start) & \
-               (calculate_distance(*np.indices(data.shape), center) < end)
-        masked_data = data[mask]
-        masked_data = masked_data[masked_data > 0]  # 0 제외
-        if masked_data.size > 0:
-            max_concentrations.append(np.max(masked_data))
-        else:
-            max_concentrations.append(np.nan)  # 모든 값이 0이면 NaN 추가
-    return max_concentrations
+    return read_grid(file_path)
 
 
 def process_folder(folder_path, output_path, folder_num, substance_name, medium):
@@ -56,10 +39,10 @@ def process_folder(folder_path, output_path, folder_num, substance_name, medium)
     times = []
 
     # 모든 파일 처리
-    for filename in sorted(os.listdir(folder_path)):
+    for filename in list_catalog_files(catalog_path, folder_path):
         if filename.endswith('.TXT') and filename.startswith(medium):
             # 파일 이름에서 시간 추출
-            minutes = int(filename.split()[1].split('min')[0])
+            minutes = parse_frame_time(filename)
             times.append(minutes)
 
             # 파일 읽기
@@ -67,7 +50,7 @@ def process_folder(folder_path, output_path, folder_num, substance_name, medium)
             data = read_file(file_path)
 
             # 최대 농도 계산
-            max_concentrations = get_max_concentrations(data, distance_ranges)
+            max_concentrations = ring_max(data, distance_ranges, center, positive_only=True)
 
             # 결과 저장
             for i, concentration in enumerate(max_concentrations):
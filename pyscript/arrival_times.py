@@ -0,0 +1,136 @@
+import os
+
+import numpy as np
+import h5py
+
+from hdf5_store import (MEDIA, HOURLY_TIME_UNITS, DEFAULT_CODEC, codec_options, frame_times, iter_frames,
+                        open_frames, frame_store_path, derived_store_path)
+from exceedance import substance_thresholds
+from substances import SUBSTANCES
+
+
+class TimingAccumulator:
+    """프레임을 한 장씩 받아 격자별로 기준 초과 시작 시각 (arrival), 최대 농도 시각 (peak),
+    마지막으로 기준 이하로 내려간 시각 (clearance) 을 기준 여러 개에 대해 한 번에 갱신.
+    시간 축 전체를 메모리에 두지 않고 (기준 수, 행, 열) 배열 몇 개만 유지"""
+
+    def __init__(self, shape, thresholds):
+        self.thresholds = np.asarray(thresholds, dtype=np.float64)
+        k_shape = (self.thresholds.size,) + tuple(shape)
+        self.arrival = np.full(k_shape, np.nan)
+        self.clearance = np.full(k_shape, np.nan)
+        self.above = np.zeros(k_shape, dtype=bool)
+        self.peak_value = np.full(shape, -np.inf)
+        self.peak_time = np.full(shape, np.nan)
+
+    def update(self, frame, time):
+        above = frame > self.thresholds[:, None, None]
+        self.arrival[above & np.isnan(self.arrival)] = time
+        # 다시 기준을 넘으면 이전 clearance 는 무효, 기준 이하로 내려간 첫 프레임의 시각을 기록
+        self.clearance[above] = np.nan
+        self.clearance[self.above & ~above] = time
+        self.above = above
+
+        higher = frame > self.peak_value
+        self.peak_value[higher] = frame[higher]
+        self.peak_time[higher] = time
+
+    def result(self):
+        """{'arrival', 'clearance'}: (기준, 행, 열), {'peak_time', 'peak_value'}: (행, 열).
+        기준을 넘은 적이 없으면 arrival/clearance 는 NaN, 끝까지 기준 이상이면 clearance 는 NaN.
+        농도가 한 번도 0보다 크지 않은 격자의 peak_time 은 NaN"""
+        positive = self.peak_value > 0
+        return {
+            'arrival': self.arrival.copy(),
+            'clearance': self.clearance.copy(),
+            'peak_time': np.where(positive, self.peak_time, np.nan),
+            'peak_value': np.where(np.isfinite(self.peak_value), self.peak_value, np.nan),
+        }
+
+
+def elapsed_minutes(times, units):
+    """시간 좌표를 모형 시작 후 경과 분으로. 1분 간격 자료는 그대로,
+    1시간 간격 자료는 첫 프레임을 시작 후 한 간격 (1시간) 으로 봄"""
+    times = np.asarray(times, dtype=np.float64)
+    if units != HOURLY_TIME_UNITS or times.size == 0:
+        return times
+    step = times[1] - times[0] if times.size > 1 else 60.0
+    return times - (times[0] - step)
+
+
+def timing_file_path(frames_folder, folder_number):
+    return derived_store_path(frames_folder, folder_number, 'timing', 'timing')
+
+
+def compute_timing(frames_folder, folder_number, thresholds=None, codec=DEFAULT_CODEC):
+    """물질 하나의 Air, Soil 프레임을 한 번씩 읽어 기준별 arrival/clearance 와 peak 시각을 계산하고 저장.
+    thresholds: {매체: [기준, ...]} (없으면 exceedance.SUBSTANCE_LEVELS).
+    결과 파일 frames_folder/timing/ConcentrationNN_timing.h5 는 매체별 'frames' 방식 그룹이라
+    기존 지도 그리기 스크립트 (generate_images_from_hdf5 등) 로 그대로 그릴 수 있음.
+    값은 모형 시작 후 경과 분 (elapsed_minutes), 프레임 순서는 read_timing 참고"""
+    if 26 <= folder_number < 26 + len(SUBSTANCES):
+        substance = SUBSTANCES[folder_number - 26]
+    elif thresholds is None:
+        raise ValueError(f"Concentration{folder_number}: 물질 목록 (26~{25 + len(SUBSTANCES)}) 에 없어 기준 농도를 "
+                         f"정할 수 없습니다. thresholds 를 지정하세요.")
+    else:
+        substance = f"Concentration{folder_number}"
+    store_path = frame_store_path(frames_folder, folder_number)
+    with open_frames(store_path) as store, h5py.File(timing_file_path(frames_folder, folder_number), 'w') as out:
+        for medium in MEDIA:
+            if medium not in store:
+                continue
+            levels = (thresholds or {}).get(medium) or substance_thresholds(substance, medium)
+            group = store[medium]
+            times, units = frame_times(group)
+            elapsed = elapsed_minutes(times, units)
+
+            accumulator = None
+            for i, _, data in iter_frames(group):
+                if accumulator is None:
+                    accumulator = TimingAccumulator(data.shape, levels)
+                accumulator.update(data, elapsed[i])
+            if accumulator is None:
+                continue
+            timing = accumulator.result()
+
+            frames = []
+            for k, level in enumerate(levels):
+                frames.append((f'arrival > {level:g}', timing['arrival'][k]))
+                frames.append((f'clearance <= {level:g}', timing['clearance'][k]))
+            frames.append(('peak time', timing['peak_time']))
+            frames.append(('peak value', timing['peak_value']))
+
+            result = out.create_group(medium)
+            result.attrs['substance'] = substance
+            result.attrs['thresholds'] = np.asarray(levels, dtype=np.float64)
+            result.attrs['units'] = 'minutes since model start'
+            for n, (label, raster) in enumerate(frames):
+                key = f"frame_{n:03d}"
+                result.create_dataset(key, data=raster, **codec_options(codec))
+                result[key].attrs['timestamp'] = label
+            print(f"{substance} {medium}: 기준 {len(levels)}개, 프레임 {len(times)}개")
+
+
+def read_timing(timing_file, medium):
+    """compute_timing 결과를 {'thresholds', 'arrival', 'clearance', 'peak_time', 'peak_value'} 로 읽기.
+    저장 순서: 기준마다 frame arrival, clearance 다음 마지막 두 프레임이 peak time, peak value"""
+    with h5py.File(timing_file, 'r') as f:
+        group = f[medium]
+        thresholds = group.attrs['thresholds']
+        rasters = [group[f"frame_{n:03d}"][()] for n in range(2 * len(thresholds) + 2)]
+    return {
+        'thresholds': thresholds,
+        'arrival': np.array(rasters[0:-2:2]),
+        'clearance': np.array(rasters[1:-2:2]),
+        'peak_time': rasters[-2],
+        'peak_value': rasters[-1],
+    }
+
+
+if __name__ == "__main__":
+    # 1분 간격 자료를 저장한 HDF5 (hdf5_watch.py 또는 convert_to_hdf5(..., interval='1minute_interval'))
+    frames_folder = r"C:\CAM_test_analysis\hdf5_live"
+    for folder_number in range(26, 42):
+        if os.path.exists(frame_store_path(frames_folder, folder_number)):
+            compute_timing(frames_folder, folder_number)
@@ -0,0 +1,163 @@
+import os
+import json
+import shutil
+import hashlib
+import urllib.request
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image
+from PIL.PngImagePlugin import PngInfo
+
+from map_render import MAP_MARGIN
+
+# 오프라인 배경 지도. 타일 저장소는 {z}/{x}/{y}.png (OpenStreetMap 과 같은 XYZ, EPSG:3857) 폴더.
+# 격자 범위 (+ 지도 여백) 에 맞춰 한 번 재투영한 배경 이미지를 저장소의 rendered 폴더에 PNG 로 캐시하고
+# 모든 물질, 모든 프레임에서 같은 이미지를 사용
+TILE_SIZE = 256
+DEFAULT_ZOOM = 14
+DEFAULT_WIDTH = 2400
+ATTRIBUTION = '(C) OpenStreetMap contributors'
+WEB_MERCATOR_HALF = 20037508.342789244     # EPSG:3857 의 x 범위 절반 (m)
+
+
+def map_extent(geometry, margin=MAP_MARGIN):
+    """지도 축 범위 (왼쪽, 오른쪽, 아래, 위): 격자 범위 + 여백 (map_render.draw_grid_raster 와 같음)"""
+    left, right, bottom, top = geometry.extent
+    dx, dy = (right - left) * margin, (top - bottom) * margin
+    return left - dx, right + dx, bottom - dy, top + dy
+
+
+def _transformer(crs):
+    from pyproj import Transformer
+    return Transformer.from_crs(crs, 'EPSG:3857', always_xy=True)
+
+
+def tile_range(geometry, zoom=DEFAULT_ZOOM):
+    """지도 범위를 덮는 타일 번호 범위 (x0, y0, x1, y1), 끝 포함"""
+    left, right, bottom, top = map_extent(geometry)
+    mx0, my0, mx1, my1 = _transformer(geometry.crs).transform_bounds(left, bottom, right, top, densify_pts=21)
+    n = 2 ** zoom
+    tile = 2 * WEB_MERCATOR_HALF / n
+    x0, x1 = (int((mx + WEB_MERCATOR_HALF) // tile) for mx in (mx0, mx1))
+    y0, y1 = (int((WEB_MERCATOR_HALF - my) // tile) for my in (my1, my0))
+    return max(x0, 0), max(y0, 0), min(x1, n - 1), min(y1, n - 1)
+
+
+def tile_path(tile_store, z, x, y):
+    return os.path.join(tile_store, str(z), str(x), f"{y}.png")
+
+
+def warm_tile_store(tile_store, source, geometry, zoom=DEFAULT_ZOOM):
+    """격자 범위에 필요한 타일 중 저장소에 없는 것만 source 에서 가져옴. 반환: (가져온 수, 못 가져온 수).
+    source: '{z}/{x}/{y}' 가 들어간 로컬 경로 또는 내부 타일 서버 주소 (예: http://localhost:8080/{z}/{x}/{y}.png)"""
+    x0, y0, x1, y1 = tile_range(geometry, zoom)
+    fetched = missing = 0
+    for x in range(x0, x1 + 1):
+        for y in range(y0, y1 + 1):
+            target = tile_path(tile_store, zoom, x, y)
+            if os.path.exists(target):
+                continue
+            location = source.format(z=zoom, x=x, y=y)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            try:
+                if location.startswith(('http://', 'https://')):
+                    with urllib.request.urlopen(location, timeout=30) as response, open(target + '.part', 'wb') as f:
+                        shutil.copyfileobj(response, f)
+                else:
+                    shutil.copyfile(location, target + '.part')
+                os.replace(target + '.part', target)
+                fetched += 1
+            except OSError as e:
+                print(f"타일을 가져오지 못했습니다 ({location}): {e}")
+                if os.path.exists(target + '.part'):
+                    os.remove(target + '.part')
+                missing += 1
+    return fetched, missing
+
+
+def mosaic_tiles(tile_store, x0, y0, x1, y1, zoom):
+    """타일을 한 장의 RGBA 배열로 이어 붙임 (없는 타일은 투명). 반환: (이미지, EPSG:3857 (왼쪽, 위), 타일 크기 m)"""
+    image = np.zeros(((y1 - y0 + 1) * TILE_SIZE, (x1 - x0 + 1) * TILE_SIZE, 4), dtype=np.uint8)
+    for x in range(x0, x1 + 1):
+        for y in range(y0, y1 + 1):
+            path = tile_path(tile_store, zoom, x, y)
+            if not os.path.exists(path):
+                continue
+            with Image.open(path) as tile:
+                r, c = (y - y0) * TILE_SIZE, (x - x0) * TILE_SIZE
+                image[r:r + TILE_SIZE, c:c + TILE_SIZE] = np.asarray(tile.convert('RGBA').resize((TILE_SIZE, TILE_SIZE)))
+    tile = 2 * WEB_MERCATOR_HALF / 2 ** zoom
+    return image, (x0 * tile - WEB_MERCATOR_HALF, WEB_MERCATOR_HALF - y0 * tile), tile
+
+
+def warp_basemap(tile_store, geometry, zoom=DEFAULT_ZOOM, width=DEFAULT_WIDTH):
+    """타일을 격자 좌표계의 지도 범위로 재투영 (최근접 화소). 반환: (RGBA 이미지, 범위). 0번 행이 북쪽"""
+    x0, y0, x1, y1 = tile_range(geometry, zoom)
+    mosaic, (mleft, mtop), tile = mosaic_tiles(tile_store, x0, y0, x1, y1, zoom)
+    extent = map_extent(geometry)
+    left, right, bottom, top = extent
+    height = max(1, round(width * (top - bottom) / (right - left)))
+    xs = left + (np.arange(width) + 0.5) * (right - left) / width
+    ys = top - (np.arange(height) + 0.5) * (top - bottom) / height
+    mx, my = _transformer(geometry.crs).transform(*np.meshgrid(xs, ys))
+    cols = np.floor((mx - mleft) / tile * TILE_SIZE).astype(np.int64)
+    rows = np.floor((mtop - my) / tile * TILE_SIZE).astype(np.int64)
+    inside = (rows >= 0) & (rows < mosaic.shape[0]) & (cols >= 0) & (cols < mosaic.shape[1])
+    image = np.zeros((height, width, 4), dtype=np.uint8)
+    image[inside] = mosaic[rows[inside], cols[inside]]
+    return image, extent
+
+
+def basemap_path(tile_store, geometry, zoom=DEFAULT_ZOOM, width=DEFAULT_WIDTH):
+    """캐시 파일 경로. 격자 위치/크기/좌표계, 줌, 폭이 같으면 같은 파일"""
+    key = json.dumps({'extent': map_extent(geometry), 'crs': geometry.crs, 'zoom': zoom, 'width': width})
+    name = f"basemap_{hashlib.sha1(key.encode()).hexdigest()[:12]}.png"
+    return os.path.join(tile_store, 'rendered', name)
+
+
+def prepare_basemap(tile_store, geometry, source=None, zoom=DEFAULT_ZOOM, width=DEFAULT_WIDTH, overwrite=False):
+    """배경 지도 캐시 파일을 만들고 경로 반환 (이미 있으면 그대로 반환).
+    source 가 있으면 먼저 저장소에 없는 타일을 가져옴 (warm_tile_store)"""
+    path = basemap_path(tile_store, geometry, zoom, width)
+    if os.path.exists(path) and not overwrite:
+        return path
+    if source:
+        fetched, missing = warm_tile_store(tile_store, source, geometry, zoom)
+        print(f"타일 {fetched}개를 저장소에 추가했습니다 (실패 {missing}개).")
+    image, extent = warp_basemap(tile_store, geometry, zoom, width)
+    if not image[..., 3].any():
+        raise FileNotFoundError(f"{tile_store}: 격자 범위의 타일이 없습니다 (줌 {zoom}).")
+
+    info = PngInfo()
+    info.add_text('extent', json.dumps(extent))
+    info.add_text('crs', geometry.crs)
+    info.add_text('attribution', ATTRIBUTION)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    Image.fromarray(image).save(path + '.part', format='PNG', pnginfo=info)
+    os.replace(path + '.part', path)
+    print(f"배경 지도를 '{path}' 파일로 저장했습니다.")
+    return path
+
+
+def basemap_or_fallback(tile_store, geometry, source=None, fallback=True, **kwargs):
+    """map_render.add_basemap 에 넘길 basemap 값. tile_store 가 None 이거나 배경 지도를 만들 수 없으면
+    (저장소 폴더나 타일 없음, pyproj 없음) 경고 후 fallback (True: 온라인 타일, False: 배경 없음)"""
+    if not tile_store:
+        return fallback
+    try:
+        return prepare_basemap(tile_store, geometry, source, **kwargs)
+    except (OSError, ImportError) as e:
+        print(f"Warning: 오프라인 배경 지도를 만들 수 없어 {'온라인 타일로' if fallback else '배경 없이'} 그립니다: {e}")
+        return fallback
+
+
+@lru_cache(maxsize=None)
+def read_basemap(path):
+    """캐시 파일을 (이미지, 범위, 출처 문구) 로 읽기. 프로세스마다 파일별로 한 번만 읽음"""
+    with Image.open(path) as image:
+        extent = tuple(json.loads(image.text['extent']))
+        attribution = image.text.get('attribution', '')
+        pixels = np.asarray(image.convert('RGBA'))
+    pixels.flags.writeable = False
+    return pixels, extent, attribution
@@ -0,0 +1,151 @@
+import os
+
+import numpy as np
+import h5py
+
+from hdf5_store import (MEDIA, CUBE_DATASET, TIME_DATASET, DEFAULT_CODEC, cube_chunks, codec_options, frame_times,
+                        iter_frames, open_frames, frame_store_path, derived_store_path)
+
+# 독성 기준의 노출 시간 (분)
+DEFAULT_WINDOWS = (10, 30, 60)
+
+
+class DoseAccumulator:
+    """프레임을 한 장씩 받아 격자별 누적 노출량 (농도 x 분) 과 이동 평균을 계산.
+    이동 합은 창 길이 단위 블록의 누적 합 (현재 블록) 과 역누적 합 (이전 블록) 을 더해 구함.
+    프레임마다 창 전체를 다시 더하지 않고, 빼기를 쓰지 않으므로 큰 값이 지나간 뒤에도 0은 정확히 0으로 남음"""
+
+    def __init__(self, shape, windows=DEFAULT_WINDOWS, dt=1.0):
+        """windows: 이동 평균 시간 (분), dt: 프레임 간격 (분). 창 길이는 dt 의 배수여야 함"""
+        self.dt = float(dt)
+        self.steps = {}
+        for window in windows:
+            steps = int(round(window / self.dt))
+            if steps < 1 or not np.isclose(steps * self.dt, window):
+                raise ValueError(f"이동 평균 {window}분은 프레임 간격 {self.dt:g}분의 배수가 아닙니다.")
+            self.steps[window] = steps
+        self.count = 0
+        self.buffer = np.zeros((max(self.steps.values(), default=1),) + tuple(shape))
+        self.dose = np.zeros(shape)
+        self.prefix = {window: np.zeros(shape) for window in self.steps}
+        # suffix[j]: 이전 블록의 j번째부터 끝까지의 합 (마지막 행은 0)
+        self.suffix = {window: np.zeros((steps + 1,) + tuple(shape)) for window, steps in self.steps.items()}
+        self.sums = {window: np.zeros(shape) for window in self.steps}
+        self.max_mean = {window: np.full(shape, -np.inf) for window in self.steps}
+
+    def update(self, frame):
+        n_buffer = self.buffer.shape[0]
+        self.buffer[self.count % n_buffer] = frame
+        self.count += 1
+        self.dose += frame * self.dt
+
+        for window, steps in self.steps.items():
+            position = (self.count - 1) % steps
+            self.prefix[window] += frame
+            np.add(self.prefix[window], self.suffix[window][position + 1], out=self.sums[window])
+            if position == steps - 1:
+                # 블록이 끝나면 역누적 합을 만들고 다음 블록을 새로 시작
+                suffix = self.suffix[window]
+                for j in range(steps - 1, -1, -1):
+                    np.add(suffix[j + 1], self.buffer[(self.count - steps + j) % n_buffer], out=suffix[j])
+                self.prefix[window][...] = 0
+            if self.count >= steps:
+                np.maximum(self.max_mean[window], self.sums[window] / steps, out=self.max_mean[window])
+
+    def rolling_mean(self, window):
+        """마지막 프레임에서 끝나는 window 분 평균. 프레임이 아직 부족하면 None"""
+        steps = self.steps[window]
+        return self.sums[window] / steps if self.count >= steps else None
+
+    def max_rolling_mean(self, window):
+        """지금까지 window 분 평균의 격자별 최대값. 프레임이 부족하면 NaN"""
+        if self.count < self.steps[window]:
+            return np.full(self.dose.shape, np.nan)
+        return self.max_mean[window].copy()
+
+
+def frame_interval(times):
+    """시간 좌표의 프레임 간격 (분). 간격이 일정하지 않으면 ValueError"""
+    steps = np.diff(np.asarray(times, dtype=np.float64))
+    if steps.size == 0:
+        return 1.0
+    if np.isnan(steps).any() or not np.allclose(steps, steps[0]) or steps[0] <= 0:
+        raise ValueError(f"프레임 간격이 일정하지 않습니다: {np.unique(steps)}")
+    return float(steps[0])
+
+
+def dose_file_path(frames_folder, folder_number, suffix='dose'):
+    """frames_folder/dose 아래 결과 파일 (ConcentrationNN_dose.h5, ConcentrationNN_mean10min.h5)"""
+    return derived_store_path(frames_folder, folder_number, 'dose', suffix)
+
+
+def _create_rolling(hf, medium, shape, units, codec, n_frames):
+    group = hf.create_group(medium)
+    cube = group.create_dataset(CUBE_DATASET, shape=(0,) + shape, maxshape=(None,) + shape, dtype=np.float64,
+                                chunks=cube_chunks(n_frames), **codec_options(codec))
+    time = group.create_dataset(TIME_DATASET, shape=(0,), maxshape=(None,), dtype=np.float64, chunks=(1024,))
+    time.attrs['units'] = units
+    return cube, time
+
+
+def accumulate_dose(frames_folder, folder_number, windows=DEFAULT_WINDOWS, save_rolling=False, codec=DEFAULT_CODEC):
+    """1분 간격 프레임을 한 번씩만 읽어 매체별 누적 노출량과 이동 평균을 계산하고 frames_folder/dose 에 저장.
+    ConcentrationNN_dose.h5: 매체별 'frames' 방식 그룹 (frame_000 누적 노출량, 이후 창별 최대 이동 평균).
+    save_rolling: 창별 이동 평균 시계열도 ConcentrationNN_mean{W}min.h5 ('cube' 방식, 시간은 창의 끝) 로 저장.
+    두 파일 모두 open_frames/iter_frames 로 열리므로 기존 지도 그리기 스크립트에 그대로 넘길 수 있음"""
+    store_path = frame_store_path(frames_folder, folder_number)
+    rolling_files = {}
+    try:
+        if save_rolling:
+            for window in windows:
+                rolling_files[window] = h5py.File(dose_file_path(frames_folder, folder_number, f"mean{window}min"), 'w')
+
+        with open_frames(store_path) as store, h5py.File(dose_file_path(frames_folder, folder_number), 'w') as out:
+            for medium in MEDIA:
+                if medium not in store:
+                    continue
+                group = store[medium]
+                times, units = frame_times(group)
+                dt = frame_interval(times)
+                accumulator = None
+                rolling = {}
+                for i, _, data in iter_frames(group):
+                    if accumulator is None:
+                        accumulator = DoseAccumulator(data.shape, windows, dt)
+                        rolling = {window: _create_rolling(hf, medium, data.shape, units, codec, len(times))
+                                   for window, hf in rolling_files.items()}
+                    accumulator.update(data)
+                    for window, (cube, time) in rolling.items():
+                        mean = accumulator.rolling_mean(window)
+                        if mean is None:
+                            continue
+                        n = cube.shape[0]
+                        cube.resize(n + 1, axis=0)
+                        time.resize(n + 1, axis=0)
+                        cube[n] = mean
+                        time[n] = times[i]
+                if accumulator is None:
+                    continue
+
+                result = out.create_group(medium)
+                result.attrs['dt_minutes'] = dt
+                result.attrs['windows_minutes'] = np.array(windows)
+                result.attrs['dose_units'] = 'concentration x minutes'
+                products = [('cumulative dose', accumulator.dose)]
+                products += [(f'max {window}min mean', accumulator.max_rolling_mean(window)) for window in windows]
+                for k, (label, raster) in enumerate(products):
+                    key = f"frame_{k:03d}"
+                    result.create_dataset(key, data=raster, **codec_options(codec))
+                    result[key].attrs['timestamp'] = label
+                print(f"Concentration{folder_number} {medium}: {accumulator.count}개 프레임, 간격 {dt:g}분")
+    finally:
+        for hf in rolling_files.values():
+            hf.close()
+
+
+if __name__ == "__main__":
+    # 1분 간격 자료를 저장한 HDF5 (hdf5_watch.py 또는 convert_to_hdf5(..., interval='1minute_interval'))
+    frames_folder = r"C:\CAM_test_analysis\hdf5_live"
+    for folder_number in range(26, 42):
+        if os.path.exists(frame_store_path(frames_folder, folder_number)):
+            accumulate_dose(frames_folder, folder_number, save_rolling=True)
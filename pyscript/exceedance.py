@@ -0,0 +1,223 @@
+import os
+
+import numpy as np
+import h5py
+
+from hdf5_store import (MEDIA, TIME_DATASET, frame_count, frame_times, iter_frame_blocks, open_frames,
+                        frame_store_path, format_time_value, read_frame)
+from ring_stats import DISTANCE_RANGES, CENTER, CELL_SIZE, ring_index
+from grid_geometry import read_geometry
+from substances import SUBSTANCES
+
+# 물질/매체별 기준 농도 단계 (색상 범위 스크립트의 fixed_ranges 와 같은 값, 첫 값 0 은 기준이 아님)
+SUBSTANCE_LEVELS = {
+    'Ethylacetate': {'Air': [0, 50, 200, 1000, 5000, 20000], 'Soil': [0, 500, 2000, 10000, 50000, 200000]},
+    'Benzene': {'Air': [0, 1.6, 5, 10, 20, 40], 'Soil': [0, 100, 500, 2000, 10000, 50000]},
+    'Methylacrylate': {'Air': [0, 10, 50, 200, 1000, 5000], 'Soil': [0, 100, 500, 2000, 10000, 50000]},
+    'Methyltrichlorosilane': {'Air': [0, 0.5, 2, 10, 50, 200], 'Soil': [0, 50, 200, 1000, 5000, 20000]},
+    'Ethyleneoxide': {'Air': [0, 0.1, 0.5, 2, 10, 50], 'Soil': [0, 10, 50, 200, 1000, 5000]},
+    'Triethylamine': {'Air': [0, 1, 5, 20, 100, 500], 'Soil': [0, 100, 500, 2000, 10000, 50000]},
+    'Methylethylketoneperoxide': {'Air': [0, 0.1, 0.5, 2, 10, 50], 'Soil': [0, 10, 50, 200, 1000, 5000]},
+    'Methylhydrazine': {'Air': [0, 0.01, 0.05, 0.2, 1, 5], 'Soil': [0, 1, 5, 20, 100, 500]},
+    'Chloromethane': {'Air': [0, 50, 200, 1000, 5000, 20000], 'Soil': [0, 500, 2000, 10000, 50000, 200000]},
+    'Methylamine': {'Air': [0, 10, 50, 200, 1000, 5000], 'Soil': [0, 100, 500, 2000, 10000, 50000]},
+    'Vinylchloride': {'Air': [0, 0.1, 0.5, 2, 10, 50], 'Soil': [0, 10, 50, 200, 1000, 5000]},
+    'Carbondisulfide': {'Air': [0, 10, 50, 200, 1000, 5000], 'Soil': [0, 100, 500, 2000, 10000, 50000]},
+    'Trimethylamine': {'Air': [0, 1, 5, 20, 100, 500], 'Soil': [0, 100, 500, 2000, 10000, 50000]},
+    'Propyleneoxide': {'Air': [0, 1, 5, 20, 100, 500], 'Soil': [0, 100, 500, 2000, 10000, 50000]},
+    'Methylvinylketone': {'Air': [0, 0.5, 2, 10, 50, 200], 'Soil': [0, 50, 200, 1000, 5000, 20000]},
+    'Nitrobenzene': {'Air': [0, 1, 5, 20, 100, 500], 'Soil': [0, 100, 500, 2000, 10000, 50000]},
+}
+
+# 초과 사건: 연속해서 기준을 넘은 프레임 구간 (ring -1 은 격자 전체, 끝 프레임 포함)
+EVENT_DTYPE = np.dtype([
+    ('threshold', np.float64),
+    ('ring', np.int32),
+    ('start', np.int32),
+    ('end', np.int32),
+    ('start_time', np.float64),
+    ('end_time', np.float64),
+    ('peak', np.float64),
+    ('peak_frame', np.int32),
+    ('peak_time', np.float64),
+    ('peak_row', np.int32),
+    ('peak_col', np.int32),
+])
+
+
+def substance_thresholds(substance, medium):
+    """SUBSTANCE_LEVELS 의 0이 아닌 기준 농도"""
+    levels = SUBSTANCE_LEVELS.get(substance, {}).get(medium)
+    if levels is None:
+        raise ValueError(f"기준 농도가 없는 물질/매체입니다: {substance}, {medium}")
+    return [level for level in levels if level > 0]
+
+
+def exceedance_block(block, thresholds, distance_ranges=DISTANCE_RANGES, center=CENTER, cell_size=CELL_SIZE):
+    """(시간, 행, 열) 블록의 기준별 초과 면적과 최대값 위치 (프레임 반복 없이 한 번에 계산).
+    반환: area (시간, 기준) m^2, ring_area (시간, 기준, 구간) m^2, peak/peak_cell (시간,),
+    ring_peak/ring_peak_cell (시간, 구간). *_cell 은 1차원 격자 번호 (없으면 -1)"""
+    block = np.asarray(block)
+    index = ring_index(block.shape[-2:], center, cell_size, distance_ranges)
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    cell_area = float(cell_size) ** 2
+
+    flat = block.reshape(block.shape[0], -1)
+    exceeded = flat[:, None, :] > thresholds[None, :, None]
+    values = index.gather(block)
+    ring_exceeded = values[:, None, :] > thresholds[None, :, None]
+    ring_peak = index.reduce(np.maximum, values)
+
+    masked = np.where(np.isnan(flat), -np.inf, flat)
+    peak_cell = masked.argmax(axis=1)
+    peak = masked[np.arange(len(flat)), peak_cell]
+    peak_cell[peak == -np.inf] = -1
+    peak[peak == -np.inf] = np.nan
+    return {
+        'area': exceeded.sum(axis=2) * cell_area,
+        'ring_area': index.reduce(np.add, ring_exceeded.astype(np.int64), empty=0) * cell_area,
+        'peak': peak,
+        'peak_cell': peak_cell,
+        'ring_peak': ring_peak,
+        'ring_peak_cell': index.argmax(values, ring_peak),
+    }
+
+
+def exceedance_series(group, thresholds, distance_ranges=DISTANCE_RANGES, center=CENTER, cell_size=CELL_SIZE,
+                      block_size=64):
+    """저장된 물질/매체 하나 전체에 대한 exceedance_block 결과 (블록 단위로 한 번만 읽음)"""
+    n_frames = frame_count(group)
+    n_thresholds, n_rings = len(thresholds), len(distance_ranges)
+    result = {
+        'area': np.zeros((n_frames, n_thresholds)),
+        'ring_area': np.zeros((n_frames, n_thresholds, n_rings)),
+        'peak': np.full(n_frames, np.nan),
+        'peak_cell': np.full(n_frames, -1, dtype=np.int64),
+        'ring_peak': np.full((n_frames, n_rings), np.nan),
+        'ring_peak_cell': np.full((n_frames, n_rings), -1, dtype=np.int64),
+    }
+    for start, block in iter_frame_blocks(group, block_size):
+        for name, values in exceedance_block(block, thresholds, distance_ranges, center, cell_size).items():
+            result[name][start:start + len(block)] = values
+    return result
+
+
+def find_events(peak, peak_cell, threshold, times, shape, ring=-1):
+    """프레임별 최대값 (peak) 이 threshold 를 넘는 연속 구간을 EVENT_DTYPE 배열로"""
+    above = np.nan_to_num(np.asarray(peak, dtype=np.float64), nan=-np.inf) > threshold
+    edges = np.diff(np.concatenate(([0], above.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1) - 1
+    events = np.zeros(starts.size, dtype=EVENT_DTYPE)
+    for n, (start, end) in enumerate(zip(starts, ends)):
+        peak_frame = start + int(np.argmax(peak[start:end + 1]))
+        row, col = np.unravel_index(peak_cell[peak_frame], shape)
+        events[n] = (threshold, ring, start, end, times[start], times[end], peak[peak_frame], peak_frame,
+                     times[peak_frame], row, col)
+    return events
+
+
+def _ring_scope(distance_ranges, within):
+    """within (m) 안쪽의 구간 번호. 구간 경계가 아니면 ValueError"""
+    if within is None:
+        return None
+    edges = [end for _, end in distance_ranges]
+    if within not in edges:
+        raise ValueError(f"within 은 거리 구간 경계 중 하나여야 합니다: {edges}")
+    return [k for k, (_, end) in enumerate(distance_ranges) if end <= within]
+
+
+def build_exceedance(frames_folder, output_file, substances=SUBSTANCES, media=MEDIA, thresholds=None,
+                     distance_ranges=DISTANCE_RANGES, center=None, cell_size=None):
+    """물질/매체별 초과 면적, 프레임별 최대값과 위치, 초과 사건 목록을 output_file 에 저장.
+    thresholds: {물질: {매체: [기준, ...]}} (없으면 SUBSTANCE_LEVELS). 물질 순서는 ConcentrationNN 26번부터.
+    center, cell_size: 없으면 저장 파일에 기록된 격자 정보 (grid_geometry.read_geometry)"""
+    with h5py.File(output_file, 'w') as out:
+        out.attrs['distance_ranges'] = np.array(distance_ranges)
+        for folder_number, substance in enumerate(substances, start=26):
+            store_path = frame_store_path(frames_folder, folder_number)
+            if not os.path.exists(store_path):
+                print(f"저장 파일이 존재하지 않습니다: {store_path}")
+                continue
+            with open_frames(store_path) as store:
+                geometry = read_geometry(store)
+                store_center = center or geometry.source
+                store_cell_size = cell_size or geometry.cell_size
+                for medium in media:
+                    if medium not in store:
+                        continue
+                    levels = (thresholds or {}).get(substance, {}).get(medium) or substance_thresholds(substance, medium)
+                    group = store[medium]
+                    times, units = frame_times(group)
+                    shape = read_frame(group, 0).shape if frame_count(group) else (0, 0)
+                    series = exceedance_series(group, levels, distance_ranges, store_center, store_cell_size)
+
+                    events = [find_events(series['peak'], series['peak_cell'], level, times, shape)
+                              for level in levels]
+                    for k in range(len(distance_ranges)):
+                        events += [find_events(series['ring_peak'][:, k], series['ring_peak_cell'][:, k], level,
+                                               times, shape, ring=k) for level in levels]
+
+                    result = out.create_group(f"{substance}/{medium}")
+                    result.attrs['shape'] = shape
+                    result.attrs['center'] = np.array(store_center)
+                    result.attrs['cell_size'] = store_cell_size
+                    result.create_dataset(TIME_DATASET, data=times)
+                    result[TIME_DATASET].attrs['units'] = units
+                    result.create_dataset('thresholds', data=np.asarray(levels, dtype=np.float64))
+                    for name, values in series.items():
+                        result.create_dataset(name, data=values)
+                    result.create_dataset('events', data=np.concatenate(events) if events else
+                                          np.zeros(0, dtype=EVENT_DTYPE))
+            print(f"Exceedance saved: {substance}")
+
+
+def read_events(output_file, substance, medium='Air', threshold=None, ring=None):
+    """저장된 초과 사건 목록 (threshold, ring 으로 거르기. ring -1 은 격자 전체)"""
+    with h5py.File(output_file, 'r') as f:
+        events = f[f"{substance}/{medium}/events"][()]
+    if threshold is not None:
+        events = events[events['threshold'] == threshold]
+    if ring is not None:
+        events = events[events['ring'] == ring]
+    return events
+
+
+def query_exceedance(output_file, substance, threshold, within=None, medium='Air'):
+    """threshold 를 넘은 연속 구간을 저장된 프레임별 최대값 표로 바로 계산 (프레임은 읽지 않음).
+    threshold 는 저장한 기준이 아니어도 됨. within: 이 거리 (m, 구간 경계) 안쪽만, None 이면 격자 전체.
+    반환: (EVENT_DTYPE 배열, 시간 단위). within 을 주면 ring 은 포함한 마지막 구간 번호"""
+    with h5py.File(output_file, 'r') as f:
+        distance_ranges = [tuple(r) for r in f.attrs['distance_ranges'].tolist()]
+        result = f[f"{substance}/{medium}"]
+        times = result[TIME_DATASET][()]
+        units = result[TIME_DATASET].attrs['units']
+        shape = tuple(result.attrs['shape'])
+        rings = _ring_scope(distance_ranges, within)
+        if rings is None:
+            peak, peak_cell = result['peak'][()], result['peak_cell'][()]
+        else:
+            ring_peak = result['ring_peak'][:, rings]
+            ring_cell = result['ring_peak_cell'][:, rings]
+            best = np.argmax(np.nan_to_num(ring_peak, nan=-np.inf), axis=1)
+            peak = ring_peak[np.arange(len(best)), best]
+            peak_cell = ring_cell[np.arange(len(best)), best]
+    events = find_events(peak, peak_cell, threshold, times, shape, ring=-1 if rings is None else max(rings))
+    return events, units
+
+
+def print_events(events, units):
+    for event in events:
+        print(f"{format_time_value(event['start_time'], units)} ~ {format_time_value(event['end_time'], units)}: "
+              f"최대 {event['peak']:.4g} ({format_time_value(event['peak_time'], units)}, "
+              f"격자 {event['peak_row']}, {event['peak_col']})")
+
+
+if __name__ == "__main__":
+    frames_folder = r"C:\CAM_test_analysis\hdf5_data"
+    output_file = r"C:\CAM_test_analysis\output\exceedance.h5"
+    build_exceedance(frames_folder, output_file)
+
+    # 예: 벤젠이 1 km 안에서 1.6 을 넘은 시간
+    events, units = query_exceedance(output_file, 'Benzene', 1.6, within=1000)
+    print_events(events, units)
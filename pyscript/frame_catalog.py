@@ -0,0 +1,228 @@
+import os
+import re
+import sqlite3
+from collections import namedtuple
+from datetime import datetime
+
+from grid_reader import parse_frame_time, format_frame_time
+from hdf5_store import MEDIA, HOURLY_TIME_UNITS, MINUTE_TIME_UNITS, read_manifest, frame_time_value, open_hdf5
+
+INTERVALS = ('1hour_interval', '1minute_interval')
+_SUBSTANCE_FOLDER = re.compile(r'Concentration(\d+)$')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS frames (
+    path TEXT PRIMARY KEY,      -- base_folder 기준 상대경로 ('/' 구분, HDF5 manifest 의 path 와 같음)
+    substance INTEGER NOT NULL,
+    medium TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    frame_time REAL,            -- hdf5_store 의 time 좌표와 같은 값 (units 참고). 파일명 형식이 다르면 NULL
+    units TEXT NOT NULL,
+    timestamp TEXT NOT NULL,    -- grid_reader.format_frame_time 형식 (HDF5 timestamp 와 같음). 파일명 형식이 다르면 파일명
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    hdf5_file TEXT,
+    hdf5_frame TEXT
+);
+CREATE INDEX IF NOT EXISTS frames_lookup ON frames (substance, medium, interval, frame_time);
+CREATE TABLE IF NOT EXISTS folders (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL
+);
+"""
+# 폴더 바로 아래 파일 (LIKE 는 '_' 를 와일드카드로 보므로 문자열 범위로 비교, '0' 은 '/' 다음 문자)
+_IN_FOLDER = "path > ? || '/' AND path < ? || '0'"
+
+
+def open_catalog(db_path):
+    """카탈로그 DB 열기 (없으면 생성)"""
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _frame_row(entry, rel_path, substance, medium, interval):
+    frame_time = parse_frame_time(entry.name)
+    if frame_time is None:
+        value, timestamp = None, os.path.splitext(entry.name)[0]
+        units = MINUTE_TIME_UNITS if interval == '1minute_interval' else HOURLY_TIME_UNITS
+    else:
+        (value, units), timestamp = frame_time_value(frame_time), format_frame_time(frame_time)
+    stat = entry.stat()
+    return (rel_path, substance, medium, interval, value, units, timestamp, stat.st_size, stat.st_mtime_ns)
+
+
+def _scan_folder(conn, folder, rel_folder, substance, medium, interval):
+    """폴더 하나를 scandir 로 읽어 추가/변경/삭제 반영. 반환: (추가·변경 수, 삭제 수)"""
+    known = {row['path']: (row['size'], row['mtime_ns'])
+             for row in conn.execute("SELECT path, size, mtime_ns FROM frames WHERE " + _IN_FOLDER,
+                                     (rel_folder, rel_folder))}
+    changed = []
+    seen = set()
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if not entry.name.endswith('.TXT') or not entry.is_file():
+                continue
+            rel_path = f"{rel_folder}/{entry.name}"
+            seen.add(rel_path)
+            stat = entry.stat()
+            if known.get(rel_path) == (stat.st_size, stat.st_mtime_ns):
+                continue
+            changed.append(_frame_row(entry, rel_path, substance, medium, interval))
+
+    # 파일 내용이 바뀌면 HDF5 위치는 다음 link_hdf5 때까지 비워 둠
+    conn.executemany("""
+        INSERT INTO frames (path, substance, medium, interval, frame_time, units, timestamp, size, mtime_ns)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(path) DO UPDATE SET
+            frame_time = excluded.frame_time, units = excluded.units, timestamp = excluded.timestamp,
+            size = excluded.size, mtime_ns = excluded.mtime_ns, hdf5_file = NULL, hdf5_frame = NULL
+    """, changed)
+    removed = [(path,) for path in known if path not in seen]
+    conn.executemany("DELETE FROM frames WHERE path = ?", removed)
+    return len(changed), len(removed)
+
+
+def update_catalog(db_path, base_folder, full=False):
+    """base_folder/ConcentrationNN/{interval}/{medium} 폴더를 한 번씩 훑어 카탈로그 갱신.
+    폴더 수정시각이 기록과 같으면 (파일 추가·삭제·이름 변경 없음) 파일 목록을 읽지 않음.
+    파일 내용만 덮어쓴 경우는 폴더 수정시각이 바뀌지 않으므로 full=True 로 모든 폴더를 다시 훑음"""
+    counts = {'folders': 0, 'scanned': 0, 'changed': 0, 'removed': 0}
+    with open_catalog(db_path) as conn:
+        folder_mtimes = {row['path']: row['mtime_ns'] for row in conn.execute("SELECT path, mtime_ns FROM folders")}
+        present = set()
+        with os.scandir(base_folder) as substances:
+            substance_entries = sorted((e for e in substances if e.is_dir() and _SUBSTANCE_FOLDER.match(e.name)), key=lambda e: e.name)
+        for substance_entry in substance_entries:
+            substance = int(_SUBSTANCE_FOLDER.match(substance_entry.name).group(1))
+            for interval in INTERVALS:
+                for medium in MEDIA:
+                    folder_name = 'Air1' if interval == '1minute_interval' and medium == 'Air' else medium
+                    rel_folder = f"{substance_entry.name}/{interval}/{folder_name}"
+                    folder = os.path.join(base_folder, substance_entry.name, interval, folder_name)
+                    try:
+                        mtime_ns = os.stat(folder).st_mtime_ns
+                    except FileNotFoundError:
+                        continue
+                    present.add(rel_folder)
+                    counts['folders'] += 1
+                    if not full and folder_mtimes.get(rel_folder) == mtime_ns:
+                        continue
+                    changed, removed = _scan_folder(conn, folder, rel_folder, substance, medium, interval)
+                    counts['scanned'] += 1
+                    counts['changed'] += changed
+                    counts['removed'] += removed
+                    conn.execute("INSERT OR REPLACE INTO folders (path, mtime_ns) VALUES (?, ?)", (rel_folder, mtime_ns))
+
+        # 사라진 폴더의 파일 삭제 (folder_entries 로 따로 등록된 폴더는 남아 있으면 유지)
+        for rel_folder in set(folder_mtimes) - present:
+            if os.path.isdir(os.path.join(base_folder, *rel_folder.split('/'))):
+                continue
+            cursor = conn.execute("DELETE FROM frames WHERE " + _IN_FOLDER, (rel_folder, rel_folder))
+            counts['removed'] += cursor.rowcount
+            conn.execute("DELETE FROM folders WHERE path = ?", (rel_folder,))
+    conn.close()
+    return counts
+
+
+CatalogStat = namedtuple('CatalogStat', ['st_size', 'st_mtime_ns'])
+
+
+class CatalogEntry:
+    """os.DirEntry 대신 쓰는 카탈로그 항목 (name, path, stat()). stat() 은 기록된 크기와 수정시각만 가짐"""
+
+    __slots__ = ('name', 'path', '_stat')
+
+    def __init__(self, folder, name, size, mtime_ns):
+        self.name = name
+        self.path = os.path.join(folder, name)
+        self._stat = CatalogStat(size, mtime_ns)
+
+    def stat(self):
+        return self._stat
+
+
+def folder_entries(db_path, folder_path):
+    """폴더 (base_folder/ConcentrationNN/{interval}/{매체 폴더}) 의 .TXT 파일을 시간 순으로 (CatalogEntry 목록).
+    파일 내용만 덮어쓰면 폴더 수정시각이 바뀌지 않으므로, 폴더는 항상 scandir 로 훑어 파일별 크기·수정시각을
+    기록과 비교하고 바뀐 행만 다시 씀 (파일을 열지 않으므로 가벼움)"""
+    parts = os.path.normpath(folder_path).split(os.sep)[-3:]
+    match = _SUBSTANCE_FOLDER.match(parts[0]) if len(parts) == 3 else None
+    if match is None or parts[1] not in INTERVALS:
+        raise ValueError(f"카탈로그 폴더 형식이 아닙니다 (ConcentrationNN/간격/매체): {folder_path}")
+    rel_folder = '/'.join(parts)
+    mtime_ns = os.stat(folder_path).st_mtime_ns
+
+    with open_catalog(db_path) as conn:
+        medium = 'Air' if parts[2] == 'Air1' else parts[2]
+        _scan_folder(conn, folder_path, rel_folder, int(match.group(1)), medium, parts[1])
+        conn.execute("INSERT OR REPLACE INTO folders (path, mtime_ns) VALUES (?, ?)", (rel_folder, mtime_ns))
+        rows = conn.execute("SELECT path, size, mtime_ns FROM frames WHERE " + _IN_FOLDER +
+                            " ORDER BY frame_time IS NULL, frame_time, path", (rel_folder, rel_folder)).fetchall()
+    conn.close()
+    return [CatalogEntry(folder_path, row['path'].rsplit('/', 1)[1], row['size'], row['mtime_ns']) for row in rows]
+
+
+def list_catalog_files(db_path, folder_path, prefix=''):
+    """grid_reader.list_grid_files 와 같은 결과 (파일명, 시간 순) 를 카탈로그에서 읽음"""
+    return [entry.name for entry in folder_entries(db_path, folder_path) if entry.name.startswith(prefix)]
+
+
+def link_hdf5(db_path, hdf5_folder, interval='1hour_interval'):
+    """ConcentrationNN.h5 의 manifest 로 각 원본 파일이 저장된 HDF5 파일 경로와 프레임 이름을 기록.
+    HDF5 파일은 간격 하나만 담으므로 (convert_to_hdf5 의 interval) 그 간격의 행만 갱신.
+    manifest 의 크기·수정시각이 카탈로그와 다르면 (HDF5 변환 이후 바뀐 파일) 연결하지 않음"""
+    linked = 0
+    with open_catalog(db_path) as conn:
+        substances = [row[0] for row in conn.execute(
+            "SELECT DISTINCT substance FROM frames WHERE interval = ? ORDER BY substance", (interval,))]
+        for substance in substances:
+            hdf5_file = os.path.join(hdf5_folder, f"Concentration{substance}.h5")
+            conn.execute("UPDATE frames SET hdf5_file = NULL, hdf5_frame = NULL WHERE substance = ? AND interval = ?",
+                         (substance, interval))
+            if not os.path.exists(hdf5_file):
+                continue
+            with open_hdf5(hdf5_file) as hf:
+                rows = []
+                for medium in MEDIA:
+                    for path, (_, row) in read_manifest(hf, medium).items():
+                        rows.append((hdf5_file, row['frame'].decode(), path, int(row['size']), int(row['mtime_ns']),
+                                     interval))
+            cursor = conn.executemany("""
+                UPDATE frames SET hdf5_file = ?, hdf5_frame = ?
+                WHERE path = ? AND size = ? AND mtime_ns = ? AND interval = ?
+            """, rows)
+            linked += cursor.rowcount
+    conn.close()
+    return linked
+
+
+def query_frames(db_path, substance, medium, interval='1hour_interval', t0=None, t1=None):
+    """물질/매체/간격의 프레임을 시간 순으로 (t0 <= 시각 <= t1, None 이면 제한 없음).
+    t0, t1: 1시간 간격은 datetime, 1분 간격은 경과 분. 파일 시스템은 읽지 않음.
+    반환: sqlite3.Row 목록 (path, frame_time, timestamp, size, hdf5_file, hdf5_frame 등)"""
+    sql = "SELECT * FROM frames WHERE substance = ? AND medium = ? AND interval = ?"
+    params = [substance, medium, interval]
+    if t0 is not None:
+        sql += " AND frame_time >= ?"
+        params.append(frame_time_value(t0)[0])
+    if t1 is not None:
+        sql += " AND frame_time <= ?"
+        params.append(frame_time_value(t1)[0])
+    sql += " ORDER BY frame_time IS NULL, frame_time, path"
+    with open_catalog(db_path) as conn:
+        rows = conn.execute(sql, params).fetchall()
+    conn.close()
+    return rows
+
+
+if __name__ == "__main__":
+    base_folder = r"C:\CAM_test_analysis\input"
+    hdf5_folder = r"C:\CAM_test_analysis\hdf5_data"
+    db_path = r"C:\CAM_test_analysis\frame_catalog.sqlite"
+
+    print(update_catalog(db_path, base_folder))
+    print(f"HDF5 연결: {link_hdf5(db_path, hdf5_folder)}개")
+    for row in query_frames(db_path, 31, 'Air', '1hour_interval', datetime(2019, 6, 8, 10), datetime(2019, 6, 8, 15)):
+        print(row['timestamp'], row['path'], row['hdf5_file'], row['hdf5_frame'])
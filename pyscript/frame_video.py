@@ -0,0 +1,137 @@
+import os
+import subprocess
+
+import numpy as np
+from PIL import Image
+from tqdm import tqdm
+
+from hdf5_store import MEDIA, iter_frames, frame_count, open_frames, frame_store_path
+from grid_geometry import read_geometry
+from substances import SUBSTANCES
+from basemap_cache import basemap_or_fallback
+from map_render import DEFAULT_COLORS, FrameSequenceRenderer, global_range
+
+# 동영상 폭 (화소, 높이는 비율대로 짝수). None 이면 지도 이미지 크기 그대로 (300 dpi 에서 약 3500 x 3000)
+VIDEO_WIDTH = 1280
+
+
+class FFmpegFrameWriter:
+    """(높이, 폭, 3) uint8 화소를 ffmpeg 표준 입력으로 바로 보내 동영상으로 인코딩 (PNG 저장/읽기 없음).
+    ffmpeg 는 첫 프레임에서 크기를 알고 시작하며 모든 프레임의 크기가 같아야 함.
+    인코딩 설정은 동영상생성.py 와 같음 (h264, fps 2, 1800 kbps)"""
+
+    def __init__(self, output_file, fps=2, bitrate=1800, width=VIDEO_WIDTH, ffmpeg='ffmpeg'):
+        self.output_file = output_file
+        self.fps = fps
+        self.bitrate = bitrate
+        self.width = width
+        self.ffmpeg = ffmpeg
+        self.process = None
+        self.shape = None
+        self.frames = 0
+
+    def _start(self, shape):
+        height, width = shape[:2]
+        # yuv420p 는 폭과 높이가 짝수여야 함
+        scale = f'scale={self.width}:-2' if self.width else 'scale=trunc(iw/2)*2:trunc(ih/2)*2'
+        command = [self.ffmpeg, '-y', '-loglevel', 'error',
+                   '-f', 'rawvideo', '-vcodec', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f'{width}x{height}',
+                   '-framerate', str(self.fps), '-i', 'pipe:',
+                   '-vf', scale, '-vcodec', 'h264', '-pix_fmt', 'yuv420p', '-b:v', f'{self.bitrate}k',
+                   '-metadata', 'artist=Me', self.output_file]
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+        self.shape = shape
+
+    def write(self, rgb):
+        if self.process is None:
+            self._start(rgb.shape)
+        if rgb.shape != self.shape:
+            raise ValueError(f"프레임 크기가 다릅니다: {rgb.shape} != {self.shape}")
+        try:
+            self.process.stdin.write(memoryview(np.ascontiguousarray(rgb, dtype=np.uint8)))
+        except BrokenPipeError:
+            self.process.wait()
+            raise RuntimeError(f"ffmpeg 가 종료되었습니다: {self.process.stderr.read().decode(errors='replace')}")
+        self.frames += 1
+
+    def close(self):
+        """입력을 닫고 인코딩이 끝날 때까지 기다림"""
+        if self.process is None:
+            return
+        process, self.process = self.process, None
+        process.stdin.close()
+        error = process.stderr.read()
+        if process.wait():
+            raise RuntimeError(f"ffmpeg 오류 ({process.returncode}): {error.decode(errors='replace')}")
+
+    def abort(self):
+        if self.process is not None:
+            self.process.kill()
+            self.process.wait()
+            self.process = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def render_video(hdf5_file, output_folder, name, geometry=None, basemap=True, png_folder=None, fps=2,
+                 bitrate=1800, width=VIDEO_WIDTH):
+    """저장된 프레임을 매체별로 지도 (raster, FrameSequenceRenderer) 로 그려 화소를 ffmpeg 로 바로 보냄.
+    결과: output_folder/{name}_{매체}_animation.mp4. basemap 은 map_render.add_basemap 참고.
+    png_folder 를 주면 같은 화소를 png_folder/{매체}/frame_NNN.png 로도 저장 (generate_images_from_hdf5 와 같은 구성)"""
+    os.makedirs(output_folder, exist_ok=True)
+    with open_frames(hdf5_file) as hf:
+        geometry = geometry or read_geometry(hf)
+        for data_type in MEDIA:
+            if data_type not in hf:
+                print(f"Warning: {data_type} data not found in {hdf5_file}. Skipping.")
+                continue
+
+            group = hf[data_type]
+            global_min, global_max = global_range(group, data_type)
+            if png_folder:
+                os.makedirs(os.path.join(png_folder, data_type), exist_ok=True)
+            output_file = os.path.join(output_folder, f"{name}_{data_type}_animation.mp4")
+
+            with FrameSequenceRenderer(geometry, DEFAULT_COLORS, data_type, global_min, global_max, basemap) as renderer, \
+                    FFmpegFrameWriter(output_file, fps, bitrate, width) as writer:
+                for i, timestamp, data in tqdm(iter_frames(group), total=frame_count(group),
+                                               desc=f"{name} {data_type}"):
+                    if not renderer.update(data, f'{data_type} Concentration at {timestamp}'):
+                        continue
+                    rgb = renderer.to_rgb()
+                    writer.write(rgb)
+                    if png_folder:
+                        Image.fromarray(rgb).save(os.path.join(png_folder, data_type, f'frame_{i:03d}.png'),
+                                                  dpi=(renderer.dpi, renderer.dpi))
+            print(f"애니메이션이 '{output_file}' 파일로 저장되었습니다.")
+
+
+def process_all_substances(save_png=False):
+    hdf5_folder = r"C:\CAM_test_analysis\hdf5_data"
+    output_folder = r"C:\CAM_test_analysis\animations"
+    graph_folder = r"C:\CAM_test_analysis\graph"
+    # 오프라인 타일 저장소 (None 이거나 배경 지도를 만들 수 없으면 온라인 타일)
+    tile_store = r"C:\CAM_test_analysis\basemap\tiles"
+
+    for folder_number, substance_name in enumerate(SUBSTANCES, start=26):
+        hdf5_file = frame_store_path(hdf5_folder, folder_number)
+        if not os.path.exists(hdf5_file):
+            continue
+        png_folder = os.path.join(graph_folder, f"Concentration{folder_number}") if save_png else None
+        try:
+            with open_frames(hdf5_file) as hf:
+                basemap = basemap_or_fallback(tile_store, read_geometry(hf))
+            render_video(hdf5_file, output_folder, substance_name, basemap=basemap, png_folder=png_folder)
+        except Exception as e:
+            print(f"Error processing {substance_name}: {e}")
+
+
+if __name__ == "__main__":
+    process_all_substances()
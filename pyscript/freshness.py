@@ -0,0 +1,98 @@
+import os
+import json
+import hashlib
+
+import numpy as np
+import h5py
+
+from hdf5_store import MANIFEST_GROUP, frame_count, frame_times, open_frames, frame_store_path
+from grid_geometry import read_geometry
+
+# 계산 결과 그룹에 기록하는 속성: 입력 프레임 파일, 입력 서명, 설정 (JSON), 설정 서명
+SOURCE_ATTR = 'source_file'
+SOURCE_SIGNATURE_ATTR = 'source_signature'
+PARAMS_ATTR = 'params'
+PARAMS_SIGNATURE_ATTR = 'params_signature'
+
+
+def store_signature(store, medium):
+    """저장된 물질/매체 하나의 입력 서명 (프레임은 읽지 않음).
+    HDF5 파일은 manifest 의 프레임 이름과 원본 내용 해시 (수정시각만 바뀐 원본은 같은 서명),
+    manifest 가 없으면 프레임 수와 시간 좌표, 파일 크기와 수정시각"""
+    h = hashlib.sha1(medium.encode())
+    if isinstance(store, h5py.File) and MANIFEST_GROUP in store and medium in store[MANIFEST_GROUP]:
+        rows = store[MANIFEST_GROUP][medium][()]
+        for row in sorted(rows, key=lambda r: r['frame']):
+            h.update(row['frame'] + b'\0' + row['sha1'] + b'\0')
+        return h.hexdigest()
+
+    group = store[medium]
+    times, units = frame_times(group)
+    h.update(f"{frame_count(group)} {units}".encode())
+    h.update(np.ascontiguousarray(times, dtype=np.float64).tobytes())
+    path = store.filename if isinstance(store, h5py.File) else group.path
+    stat = os.stat(path)
+    h.update(f"{stat.st_size} {stat.st_mtime_ns}".encode())
+    return h.hexdigest()
+
+
+def params_signature(params):
+    """설정 dict 의 서명 (키 순서와 tuple/list 차이는 무시)"""
+    text = json.dumps(params, sort_keys=True, default=lambda v: np.asarray(v).tolist())
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def ring_params(distance_ranges, geometry):
+    """거리 구간 통계의 설정 (거리 구간, 중심점, 격자 크기)"""
+    return {
+        'distance_ranges': [list(r) for r in distance_ranges],
+        'center': list(geometry.source),
+        'cell_size': geometry.cell_size,
+    }
+
+
+def record_inputs(group, store_path, signature, params):
+    """결과를 다 쓴 뒤에 입력과 설정을 기록 (중단되면 기록이 없으므로 다음 실행에서 다시 계산됨)"""
+    group.attrs[SOURCE_ATTR] = os.path.abspath(store_path)
+    group.attrs[PARAMS_ATTR] = json.dumps(params, sort_keys=True)
+    group.attrs[PARAMS_SIGNATURE_ATTR] = params_signature(params)
+    group.attrs[SOURCE_SIGNATURE_ATTR] = signature
+
+
+def clear_inputs(group):
+    """다시 계산을 시작하기 전에 기록 삭제"""
+    if SOURCE_SIGNATURE_ATTR in group.attrs:
+        del group.attrs[SOURCE_SIGNATURE_ATTR]
+
+
+def is_fresh(group, signature, params):
+    """기록된 입력 서명과 설정이 지금과 같은지"""
+    return (group.attrs.get(SOURCE_SIGNATURE_ATTR) == signature
+            and group.attrs.get(PARAMS_SIGNATURE_ATTR) == params_signature(params))
+
+
+def stale_groups(output_file, frames_folder, substances, distance_ranges, media=('Air', 'Soil')):
+    """output_file (concentration_data.h5) 에서 입력 프레임이나 설정이 바뀌어 다시 계산해야 하는 (매체, 물질) 목록.
+    물질 순서는 ConcentrationNN 26번부터. 프레임은 읽지 않고 manifest 와 속성만 비교.
+    입력 파일이 없는 물질은 건너뜀 (기존 결과를 그대로 사용).
+    hdf5_watch 가 쓰고 있는 입력은 SWMR 읽기 모드로 열고 (hdf5_store.open_hdf5), 그래도 읽을 수 없으면
+    경고 후 최신 여부를 알 수 없는 그룹으로 보고 목록에 넣음"""
+    stale = []
+    with h5py.File(output_file, 'r') as f:
+        for folder_number, substance in enumerate(substances, start=26):
+            store_path = frame_store_path(frames_folder, folder_number)
+            if not os.path.exists(store_path):
+                continue
+            try:
+                with open_frames(store_path) as store:
+                    params = ring_params(distance_ranges, read_geometry(store))
+                    for medium in media:
+                        if medium not in store:
+                            continue
+                        key = f"{medium}/{substance}"
+                        if key not in f or not is_fresh(f[key], store_signature(store, medium), params):
+                            stale.append((medium, substance))
+            except (OSError, KeyError) as e:
+                print(f"Warning: {store_path}를 읽을 수 없어 최신 여부를 확인하지 못했습니다: {e}")
+                stale.extend((medium, substance) for medium in media if (medium, substance) not in stale)
+    return stale
@@ -0,0 +1,168 @@
+from functools import lru_cache
+
+import numpy as np
+
+from grid_reader import GRID_SHAPE
+
+
+def _read_only(array):
+    array.flags.writeable = False
+    return array
+
+
+class GridGeometry:
+    """격자 위치 (왼쪽 아래 모서리, m), 격자 크기, (행, 열) 수, 좌표계와 배출원 위치.
+    배출원은 0부터 세는 (행, 열) 격자 번호 기준 위치 (기본 (75.5, 75.5), 5구간별 스크립트의 center).
+    0번 행이 북쪽 (시각화 스크립트와 같은 방향), 열 번호가 커지면 동쪽.
+    값이 같으면 같은 객체로 취급하므로 격자 중심, 거리, 구간 번호 같은 파생 배열은 값이 같은 격자마다 한 번만 계산됨"""
+
+    def __init__(self, origin_x=164191, origin_y=470659, cell_size=100, shape=GRID_SHAPE, crs='EPSG:5186',
+                 sources=((75.5, 75.5),)):
+        self.origin_x = float(origin_x)
+        self.origin_y = float(origin_y)
+        self.cell_size = float(cell_size)
+        self.shape = tuple(int(n) for n in shape)
+        self.crs = str(crs)
+        self.sources = tuple((float(row), float(col)) for row, col in sources)
+        if not self.sources:
+            raise ValueError("배출원 위치가 하나 이상 필요합니다.")
+
+    def _key(self):
+        return self.origin_x, self.origin_y, self.cell_size, self.shape, self.crs, self.sources
+
+    def __eq__(self, other):
+        return isinstance(other, GridGeometry) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return (f"GridGeometry(origin=({self.origin_x:g}, {self.origin_y:g}), cell_size={self.cell_size:g}, "
+                f"shape={self.shape}, crs={self.crs!r}, sources={self.sources})")
+
+    @property
+    def source(self):
+        """첫 번째 배출원 위치 (행, 열)"""
+        return self.sources[0]
+
+    def with_sources(self, sources):
+        """배출원 위치만 바꾼 새 격자"""
+        return GridGeometry(self.origin_x, self.origin_y, self.cell_size, self.shape, self.crs, sources)
+
+    # ---- 좌표 변환 ----
+
+    def to_xy(self, row, col):
+        """격자 번호 기준 위치 (행, 열) 를 지도 좌표 (x, y) 로. 정수 번호는 격자 중심"""
+        x = self.origin_x + (np.asarray(col) + 0.5) * self.cell_size
+        y = self.origin_y + (self.shape[0] - np.asarray(row) - 0.5) * self.cell_size
+        return x, y
+
+    def from_xy(self, x, y):
+        """지도 좌표를 격자 번호 기준 위치 (행, 열) 로 (to_xy 의 역변환)"""
+        col = (np.asarray(x) - self.origin_x) / self.cell_size - 0.5
+        row = self.shape[0] - (np.asarray(y) - self.origin_y) / self.cell_size - 0.5
+        return row, col
+
+    def source_xy(self, source=0):
+        return self.to_xy(*self.sources[source])
+
+    # ---- 파생 배열 (읽기 전용, 값이 같은 격자끼리 공유) ----
+
+    @property
+    def extent(self):
+        """imshow 용 (왼쪽, 오른쪽, 아래, 위)"""
+        return (self.origin_x, self.origin_x + self.shape[1] * self.cell_size,
+                self.origin_y, self.origin_y + self.shape[0] * self.cell_size)
+
+    @lru_cache(maxsize=None)
+    def cell_centers(self):
+        """열별 x, 행별 y 격자 중심 좌표"""
+        x, y = self.to_xy(np.arange(self.shape[0]), np.arange(self.shape[1]))
+        return _read_only(x), _read_only(y)
+
+    @lru_cache(maxsize=None)
+    def cell_bounds(self):
+        """(행 x 열, 4) 격자별 (x1, y1, x2, y2). 순서는 data.flatten() 과 같음"""
+        rows, cols = np.indices(self.shape)
+        x1 = self.origin_x + cols.ravel() * self.cell_size
+        y1 = self.origin_y + (self.shape[0] - rows.ravel() - 1) * self.cell_size
+        return _read_only(np.column_stack((x1, y1, x1 + self.cell_size, y1 + self.cell_size)))
+
+    @lru_cache(maxsize=None)
+    def cell_polygons(self):
+        """격자별 shapely Polygon 목록 (data.flatten() 순서)"""
+        from shapely.geometry import box
+        return tuple(box(*bounds) for bounds in self.cell_bounds())
+
+    @lru_cache(maxsize=None)
+    def distance(self, source=0):
+        """격자별 배출원까지의 거리 (m)"""
+        from ring_stats import calculate_distance
+        return _read_only(calculate_distance(*np.indices(self.shape), self.sources[source], self.cell_size))
+
+    def ring_labels(self, distance_ranges, source=0):
+        """격자별 거리 구간 번호 (구간 밖은 -1)"""
+        return self.ring_index(distance_ranges, source).labels
+
+    def ring_index(self, distance_ranges, source=0):
+        """거리 구간 ZoneIndex (ring_stats.ring_index 캐시를 같이 사용)"""
+        from ring_stats import ring_index
+        return ring_index(self.shape, self.sources[source], self.cell_size, distance_ranges)
+
+    # ---- 저장 ----
+
+    def to_attrs(self, attrs):
+        """HDF5 속성 (파일 또는 그룹의 attrs) 에 기록"""
+        attrs['grid_origin_x'] = self.origin_x
+        attrs['grid_origin_y'] = self.origin_y
+        attrs['grid_cell_size'] = self.cell_size
+        attrs['grid_shape'] = np.array(self.shape, dtype=np.int64)
+        attrs['grid_crs'] = self.crs
+        attrs['grid_sources'] = np.array(self.sources, dtype=np.float64)
+
+    @classmethod
+    def from_attrs(cls, attrs):
+        """속성이 없으면 None"""
+        if 'grid_origin_x' not in attrs:
+            return None
+        crs = attrs['grid_crs']
+        return cls(attrs['grid_origin_x'], attrs['grid_origin_y'], attrs['grid_cell_size'], attrs['grid_shape'],
+                   crs.decode() if isinstance(crs, bytes) else crs, np.reshape(attrs['grid_sources'], (-1, 2)))
+
+    def to_dict(self):
+        """npy 폴더 JSON 용. origin_x, origin_y, cell_size 는 예전 DEFAULT_GEOMETRY 와 같은 키"""
+        return {'origin_x': self.origin_x, 'origin_y': self.origin_y, 'cell_size': self.cell_size,
+                'shape': list(self.shape), 'crs': self.crs, 'sources': [list(s) for s in self.sources]}
+
+    @classmethod
+    def from_dict(cls, meta):
+        """to_dict 결과 (예전 형식처럼 일부 키만 있으면 나머지는 기본값)"""
+        default = DEFAULT_GEOMETRY
+        return cls(meta.get('origin_x', default.origin_x), meta.get('origin_y', default.origin_y),
+                   meta.get('cell_size', default.cell_size), meta.get('shape', default.shape),
+                   meta.get('crs', default.crs), meta.get('sources', default.sources))
+
+
+# 시각화 스크립트의 start_x, start_y, cell_size 와 5구간별 스크립트의 center
+DEFAULT_GEOMETRY = GridGeometry()
+
+
+def read_geometry(store, default=DEFAULT_GEOMETRY):
+    """열린 HDF5 파일 또는 npy 폴더 (open_frames 결과) 의 격자 정보. 기록이 없으면 default"""
+    geometry = GridGeometry.from_attrs(store.attrs) if hasattr(store, 'attrs') else None
+    if geometry is None and not hasattr(store, 'attrs'):
+        meta = next((cube.geometry for cube in store.values() if cube.geometry), None)
+        geometry = GridGeometry.from_dict(meta) if meta else None
+    return geometry or default
+
+
+def write_geometry(hf, geometry=None):
+    """HDF5 파일에 격자 정보 기록 후 반환. geometry 가 None 이면 기록된 값 (없으면 DEFAULT_GEOMETRY).
+    이미 다른 값이 기록되어 있으면 ValueError (격자가 다른 자료를 한 파일에 섞지 않도록)"""
+    existing = GridGeometry.from_attrs(hf.attrs)
+    geometry = geometry or existing or DEFAULT_GEOMETRY
+    if existing is not None and existing != geometry:
+        raise ValueError(f"{hf.filename}: 이미 다른 격자로 저장되어 있습니다 ({existing} != {geometry})")
+    if existing is None:
+        geometry.to_attrs(hf.attrs)
+    return geometry
@@ -0,0 +1,131 @@
+import os
+import re
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+# CAM 격자 크기 (행, 열)
+GRID_SHAPE = (150, 150)
+
+
+def parse_grid(buf, shape=GRID_SHAPE, out=None, source='<buffer>'):
+    """파일 내용(bytes)을 격자 배열로 변환하고 크기를 검증"""
+    if out is None:
+        out = np.empty(shape, dtype=np.float64)
+    elif out.shape != tuple(shape):
+        raise ValueError(f"{source}: 출력 배열 크기 {out.shape}가 격자 크기 {tuple(shape)}와 다릅니다.")
+
+    # 공백으로 나눈 토큰을 한 번에 변환 (float() 과 같은 값)
+    values = np.array(buf.split(), dtype=np.float64)
+    if values.size != out.size:
+        raise ValueError(f"{source}: {out.size}개 값이 필요하지만 {values.size}개를 읽었습니다 (격자 {tuple(shape)}).")
+    out[...] = values.reshape(shape)
+    return out
+
+
+def read_grid(file_path, shape=GRID_SHAPE, out=None):
+    """텍스트 파일을 읽어 numpy 배열로 변환"""
+    with open(file_path, 'rb') as f:
+        buf = f.read()
+    return parse_grid(buf, shape, out, source=file_path)
+
+
+EPOCH = datetime(1970, 1, 1)
+
+# 파일명 형식: 'Air2019Y 6M 8D10H.TXT' (1시간 간격), 'Air 10min.TXT' / 'Air1 10min.TXT' (1분 간격)
+_HOURLY_NAME = re.compile(r'[A-Za-z]+\d*?(\d{4})Y\s*(\d{1,2})M\s*(\d{1,2})D\s*(\d{1,2})H\.TXT$')
+_MINUTE_NAME = re.compile(r'[A-Za-z]+\d*\s+(\d+)min\.TXT$')
+
+
+def parse_frame_time(filename):
+    """파일명에서 시각 추출: 1시간 간격은 datetime, 1분 간격은 모형 시작 후 경과 분(int). 형식이 다르면 None"""
+    match = _HOURLY_NAME.match(filename)
+    if match:
+        year, month, day, hour = map(int, match.groups())
+        return datetime(year, month, day, hour)
+    match = _MINUTE_NAME.match(filename)
+    if match:
+        return int(match.group(1))
+    return None
+
+
+def format_frame_time(frame_time):
+    """parse_frame_time 결과를 기존 timestamp 문자열 형식으로 ('2019Y 6M 8D10H', '10min')"""
+    if isinstance(frame_time, datetime):
+        return f"{frame_time.year}Y{frame_time.month:2d}M{frame_time.day:2d}D{frame_time.hour:2d}H"
+    return f"{frame_time}min"
+
+
+def frame_sort_key(filename):
+    """시간 순 정렬 키 ('Air 100min' 이 'Air 10min' 보다 앞서지 않도록). 시각이 없는 파일은 뒤로"""
+    frame_time = parse_frame_time(filename)
+    if isinstance(frame_time, datetime):
+        return (0, (frame_time - EPOCH).total_seconds() / 60, filename)
+    if frame_time is not None:
+        return (0, float(frame_time), filename)
+    return (1, 0, filename)
+
+
+def list_grid_files(folder_path, prefix=''):
+    """폴더 내 .TXT 격자 파일 목록 (시간 순)"""
+    with os.scandir(folder_path) as entries:
+        names = [e.name for e in entries if e.name.endswith('.TXT') and e.name.startswith(prefix)]
+    return sorted(names, key=frame_sort_key)
+
+
+def read_grid_folder(folder_path, prefix='', shape=GRID_SHAPE, dtype=np.float64):
+    """폴더 내 모든 격자 파일을 (시간, 행, 열) 배열 하나로 읽기"""
+    files = list_grid_files(folder_path, prefix)
+    cube = np.empty((len(files),) + tuple(shape), dtype=dtype)
+    frame = np.empty(shape, dtype=np.float64) if dtype != np.float64 else None
+    for i, filename in enumerate(files):
+        file_path = os.path.join(folder_path, filename)
+        if frame is None:
+            read_grid(file_path, shape, out=cube[i])
+        else:
+            cube[i] = read_grid(file_path, shape, out=frame)
+    return files, cube
+
+
+def _read_data_legacy(file_path):
+    """기존 스크립트의 판독 방식 (비교용)"""
+    with open(file_path, 'r') as f:
+        lines = f.readlines()
+    data = []
+    for line in lines:
+        row = [float(x) for x in line.strip().split() if x]
+        data.append(row)
+    return np.array(data)
+
+
+def benchmark_readers(folder_path, repeat=3):
+    """같은 파일에 대해 기존 판독기와 고속 판독기의 속도 및 결과 비교"""
+    paths = [os.path.join(folder_path, f) for f in list_grid_files(folder_path)]
+    if not paths:
+        print(f"폴더에 텍스트 파일이 없습니다: {folder_path}")
+        return None
+
+    timings = {}
+    for name, reader in [('legacy', _read_data_legacy), ('read_grid', read_grid)]:
+        best = np.inf
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for path in paths:
+                reader(path)
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+
+    mismatches = sum(not np.array_equal(_read_data_legacy(p), read_grid(p)) for p in paths)
+    speedup = timings['legacy'] / timings['read_grid']
+    print(f"{len(paths)}개 파일: legacy {timings['legacy'] / len(paths) * 1e3:.2f} ms/파일, "
+          f"read_grid {timings['read_grid'] / len(paths) * 1e3:.2f} ms/파일, "
+          f"속도 향상 {speedup:.1f}배, 불일치 {mismatches}개")
+    return speedup
+
+
+if __name__ == "__main__":
+    test_folders = sys.argv[1:] or [r"C:\CAM_test_analysis\input\Concentration31\1hour_interval\Air"]
+    for test_folder in test_folders:
+        benchmark_readers(test_folder)
@@ -0,0 +1,105 @@
+import os
+import sys
+import glob
+import time
+import tempfile
+import numpy as np
+import h5py
+
+from hdf5_store import MEDIA, CODECS, SPARSE_DATASETS, cube_chunks, codec_options, read_all_frames, frame_keys
+from sparse_frames import SparseFrame
+
+
+def load_frames(hdf5_folder):
+    """Concentration*.h5 의 매체별 프레임을 {(파일 이름, 매체): (시간, 행, 열) 배열} 로 읽기"""
+    frames = {}
+    for path in sorted(glob.glob(os.path.join(hdf5_folder, 'Concentration*.h5'))):
+        with h5py.File(path, 'r') as hf:
+            for medium in MEDIA:
+                if medium in hf:
+                    frames[(os.path.basename(path), medium)] = read_all_frames(hf[medium])
+    return frames
+
+
+def _write(path, frames, options, layout):
+    with h5py.File(path, 'w') as hf:
+        for (name, medium), cube in frames.items():
+            group = hf.create_group(f"{name}/{medium}")
+            if layout == 'cube':
+                group.create_dataset('concentration', data=cube, chunks=cube_chunks(len(cube)), maxshape=(None,) + cube.shape[1:],
+                                     **options)
+            elif layout == 'sparse':
+                # 가변 길이 자료는 필터가 적용되지 않으므로 bbox 에만 codec 적용
+                sparse = [SparseFrame.from_dense(data) for data in cube]
+                group.create_dataset('bbox', data=np.array([f.bbox for f in sparse], dtype=np.int16), **options)
+                group['bbox'].attrs['shape'] = cube.shape[1:]
+                for key, dtype in SPARSE_DATASETS.items():
+                    ds = group.create_dataset(key, shape=(len(sparse),), dtype=h5py.vlen_dtype(dtype))
+                    for i, frame in enumerate(sparse):
+                        ds[i] = getattr(frame, key)
+            else:
+                for i, data in enumerate(cube):
+                    group.create_dataset(f"frame_{i:03d}", data=data, **options)
+
+
+def _read(path, layout):
+    result = {}
+    with h5py.File(path, 'r') as hf:
+        for name in hf:
+            for medium in hf[name]:
+                group = hf[name][medium]
+                if layout == 'cube':
+                    result[(name, medium)] = group['concentration'][()]
+                elif layout == 'sparse':
+                    shape = tuple(group['bbox'].attrs['shape'])
+                    parts = [group[key][()] for key in ('bbox', *SPARSE_DATASETS)]
+                    result[(name, medium)] = np.array([SparseFrame(shape, *frame).to_dense() for frame in zip(*parts)])
+                else:
+                    result[(name, medium)] = np.array([group[key][()] for key in frame_keys(group)])
+    return result
+
+
+def benchmark_codecs(hdf5_folder, codecs=None, layout='frames', repeat=3):
+    """압축 방식별 쓰기 시간, 읽기 시간, 파일 크기 비교 (같은 자료를 임시 파일에 다시 저장)"""
+    frames = load_frames(hdf5_folder)
+    if not frames:
+        print(f"HDF5 파일이 없습니다: {hdf5_folder}")
+        return None
+
+    raw_bytes = sum(cube.nbytes for cube in frames.values())
+    n_frames = sum(cube.shape[0] for cube in frames.values())
+    print(f"{len(frames)}개 데이터 그룹, {n_frames}개 프레임, 원자료 {raw_bytes / 1e6:.1f} MB, layout={layout}")
+    print(f"{'codec':<18}{'쓰기(s)':>10}{'읽기(s)':>10}{'크기(MB)':>11}{'압축률':>8}  무손실")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for codec in codecs or CODECS:
+            try:
+                options = codec_options(codec)
+            except ValueError as e:
+                print(f"{codec:<18}건너뜀: {e}")
+                continue
+
+            path = os.path.join(tmp, f"{codec}.h5")
+            write_time = read_time = np.inf
+            for _ in range(repeat):
+                start = time.perf_counter()
+                _write(path, frames, options, layout)
+                write_time = min(write_time, time.perf_counter() - start)
+
+                start = time.perf_counter()
+                restored = _read(path, layout)
+                read_time = min(read_time, time.perf_counter() - start)
+
+            lossless = all(np.array_equal(restored[key], cube) for key, cube in frames.items())
+            size = os.path.getsize(path)
+            results[codec] = {'write': write_time, 'read': read_time, 'bytes': size, 'lossless': lossless}
+            print(f"{codec:<18}{write_time:>10.3f}{read_time:>10.3f}{size / 1e6:>11.2f}{raw_bytes / size:>8.1f}  "
+                  f"{'예' if lossless else '아니오'}")
+    return results
+
+
+if __name__ == "__main__":
+    hdf5_folder = sys.argv[1] if len(sys.argv) > 1 else r"C:\CAM_test_analysis\hdf5_data"
+    layout = sys.argv[2] if len(sys.argv) > 2 else 'frames'  # frames, cube, sparse
+    benchmark_codecs(hdf5_folder, layout=layout)
@@ -0,0 +1,837 @@
+import os
+import hashlib
+import queue
+import multiprocessing as mp
+from datetime import datetime, timedelta
+import numpy as np
+import h5py
+from tqdm import tqdm
+
+from grid_reader import EPOCH, parse_grid, parse_frame_time, format_frame_time, frame_sort_key
+from sparse_frames import SparseFrame, INDEX_DTYPE
+from precision import PrecisionStats, cast_frame
+from grid_geometry import write_geometry
+
+MEDIA = ['Air', 'Soil']
+
+# 프레임별 원본 파일 기록 (경로, 크기, 수정시각, 해시)
+MANIFEST_GROUP = 'manifest'
+MANIFEST_DTYPE = np.dtype([
+    ('frame', h5py.string_dtype()),
+    ('path', h5py.string_dtype()),
+    ('size', np.int64),
+    ('mtime_ns', np.int64),
+    ('sha1', 'S40'),
+])
+
+# 'cube' 저장 방식: 매체별 (시간, 행, 열) 데이터셋 하나 + 숫자 시간 좌표
+CUBE_DATASET = 'concentration'
+TIME_DATASET = 'time'
+# 청크 하나 = 16 프레임 x 30 x 30 격자 (float64 약 115KB).
+# 프레임 전체 읽기는 25개 청크, 한 격자의 시계열은 16 프레임당 청크 1개만 읽으면 됨
+CUBE_CHUNKS = (16, 30, 30)
+# 쓰는 동안 한 시간 구간의 청크(25개)가 모두 캐시에 남도록 충분히 크게
+CHUNK_CACHE_BYTES = 64 * 1024 * 1024
+# 병렬 변환에서 쓰기 프로세스 생존 확인 간격 (초)
+PROGRESS_TIMEOUT = 5.0
+
+# 'sparse' 저장 방식: 프레임별 bounding box + 그 안의 CSR (가변 길이 데이터셋, sparse_frames.SparseFrame)
+SPARSE_BBOX = 'bbox'
+SPARSE_DATASETS = {'indptr': np.int32, 'indices': INDEX_DTYPE, 'values': np.float64}
+SPARSE_BLOCK = 64
+
+# 압축/필터 설정 (h5py create_dataset 인자). 'gzip' 이 기존 기본값 (level 4)
+CODECS = {
+    'none': {},
+    'gzip': {'compression': 'gzip'},
+    'gzip1': {'compression': 'gzip', 'compression_opts': 1},
+    'gzip9': {'compression': 'gzip', 'compression_opts': 9},
+    'shuffle-gzip': {'compression': 'gzip', 'shuffle': True},
+    'shuffle-gzip9': {'compression': 'gzip', 'compression_opts': 9, 'shuffle': True},
+    'lzf': {'compression': 'lzf'},
+    'shuffle-lzf': {'compression': 'lzf', 'shuffle': True},
+}
+DEFAULT_CODEC = 'gzip'
+
+HOURLY_TIME_UNITS = 'minutes since 1970-01-01 00:00:00'
+MINUTE_TIME_UNITS = 'minutes since model start'
+
+
+def codec_options(codec):
+    """codec 이름을 create_dataset 인자로 변환"""
+    if codec not in CODECS:
+        raise ValueError(f"알 수 없는 압축 방식: {codec} (사용 가능: {', '.join(CODECS)})")
+    return dict(CODECS[codec])
+
+
+def cube_chunks(n_frames=None):
+    """'cube' 청크 크기. 프레임 수를 알면 시간 길이를 청크 개수가 같은 범위에서 가장 짧게
+    (24 프레임이면 16+16 대신 12+12, 짧은 실행에서 마지막 청크가 빈 칸으로 채워지지 않도록)"""
+    if not n_frames:
+        return CUBE_CHUNKS
+    n_chunks = -(-n_frames // CUBE_CHUNKS[0])
+    return (-(-n_frames // n_chunks),) + CUBE_CHUNKS[1:]
+
+
+def read_manifest(hf, medium):
+    """매체별 manifest를 {원본 상대경로: (행 번호, 기록)} 형태로 읽기"""
+    if MANIFEST_GROUP not in hf or medium not in hf[MANIFEST_GROUP]:
+        return {}
+    rows = hf[MANIFEST_GROUP][medium][()]
+    return {row['path'].decode(): (i, row) for i, row in enumerate(rows)}
+
+
+def _manifest_dataset(hf, medium):
+    group = hf.require_group(MANIFEST_GROUP)
+    if medium not in group:
+        group.create_dataset(medium, shape=(0,), maxshape=(None,), dtype=MANIFEST_DTYPE, chunks=(256,))
+    return group[medium]
+
+
+def _write_manifest_row(manifest_ds, row_index, frame_key, rel_path, stat, sha1):
+    """manifest 행 기록 (row_index가 None이면 끝에 추가)"""
+    if row_index is None:
+        row_index = manifest_ds.shape[0]
+        manifest_ds.resize((row_index + 1,))
+    manifest_ds[row_index] = (frame_key, rel_path, stat.st_size, stat.st_mtime_ns, sha1.encode())
+    return row_index
+
+
+def frame_index(key):
+    """프레임 키 ('frame_012') 의 번호"""
+    return int(key.split('_')[1])
+
+
+def frame_time_value(frame_time):
+    """parse_frame_time 결과를 숫자 시간 좌표(분)와 단위로 변환"""
+    if isinstance(frame_time, datetime):
+        return (frame_time - EPOCH).total_seconds() / 60, HOURLY_TIME_UNITS
+    return float(frame_time), MINUTE_TIME_UNITS
+
+
+def entry_sort_key(entry):
+    """os.scandir 항목의 시간 순 정렬 키 (grid_reader.frame_sort_key)"""
+    return frame_sort_key(entry.name)
+
+
+def is_cube(group):
+    """매체 그룹이 'cube' 저장 방식인지 확인"""
+    return CUBE_DATASET in group
+
+
+def is_sparse(group):
+    """매체 그룹이 'sparse' 저장 방식인지 확인"""
+    return SPARSE_BBOX in group
+
+
+def _layout_name(group):
+    if is_cube(group):
+        return 'cube'
+    return 'sparse' if is_sparse(group) else 'frames'
+
+
+def _check_layout(group, layout):
+    existing = _layout_name(group)
+    if len(group.keys()) and existing != layout:
+        raise ValueError(f"{group.name}: '{existing}' 방식으로 저장된 그룹에는 '{layout}' 방식으로 추가할 수 없습니다.")
+
+
+def _check_dtype(group, stored, dtype):
+    if stored is not None and np.dtype(stored) != np.dtype(dtype):
+        raise ValueError(f"{group.name}: {np.dtype(stored).name}로 저장된 그룹에 {np.dtype(dtype).name}로 "
+                         f"추가할 수 없습니다. 같은 dtype으로 변환하거나 새 파일로 변환하세요.")
+
+
+def _prepare_frames(group, recorded, dtype=np.float64):
+    """'frames' 방식: manifest에 없는 (쓰다 중단된) 프레임 삭제 후 다음 프레임 번호 반환"""
+    _check_layout(group, 'frames')
+    for key in [k for k in group.keys() if k not in recorded]:
+        del group[key]
+    if len(group.keys()):
+        _check_dtype(group, group[next(iter(group.keys()))].dtype, dtype)
+    return max((frame_index(k) for k in group.keys()), default=-1) + 1
+
+
+def _prepare_cube(group, recorded, shape, codec=DEFAULT_CODEC, time_units=None, dtype=np.float64, n_frames=None):
+    """'cube' 방식: 데이터셋 생성, manifest에 없는 뒤쪽 프레임 잘라낸 뒤 다음 프레임 번호 반환.
+    n_frames: 예상 프레임 수 (새로 만들 때 청크 크기에 사용)"""
+    _check_layout(group, 'cube')
+    if CUBE_DATASET not in group:
+        # 이미 있는 데이터셋은 만들 때의 필터를 그대로 사용
+        group.create_dataset(CUBE_DATASET, shape=(0,) + tuple(shape), maxshape=(None,) + tuple(shape),
+                             dtype=dtype, chunks=cube_chunks(n_frames), **codec_options(codec))
+        _create_time(group, time_units)
+    _check_dtype(group, group[CUBE_DATASET].dtype, dtype)
+    n_frames = max((frame_index(k) for k in recorded), default=-1) + 1
+    group[CUBE_DATASET].resize(n_frames, axis=0)
+    group[TIME_DATASET].resize(n_frames, axis=0)
+    return n_frames
+
+
+def _create_time(group, time_units):
+    group.create_dataset(TIME_DATASET, shape=(0,), maxshape=(None,), dtype=np.float64, chunks=(1024,))
+    if time_units is not None:
+        # SWMR 모드에서는 속성을 새로 쓸 수 없으므로 만들 때 미리 기록
+        group[TIME_DATASET].attrs['units'] = time_units
+
+
+def _prepare_sparse(group, recorded, shape, time_units=None, dtype=np.float64):
+    """'sparse' 방식: 데이터셋 생성, manifest에 없는 뒤쪽 프레임 잘라낸 뒤 다음 프레임 번호 반환.
+    가변 길이 데이터셋에는 압축 필터가 적용되지 않으므로 codec은 쓰지 않음"""
+    _check_layout(group, 'sparse')
+    if SPARSE_BBOX not in group:
+        group.create_dataset(SPARSE_BBOX, shape=(0, 4), maxshape=(None, 4), dtype=np.int16, chunks=(1024, 4))
+        group[SPARSE_BBOX].attrs['shape'] = tuple(shape)
+        for name, base in SPARSE_DATASETS.items():
+            base = dtype if name == 'values' else base
+            group.create_dataset(name, shape=(0,), maxshape=(None,), dtype=h5py.vlen_dtype(base),
+                                 chunks=(SPARSE_BLOCK,))
+        _create_time(group, time_units)
+    _check_dtype(group, h5py.check_vlen_dtype(group['values'].dtype), dtype)
+    # 이전 파일의 uint8 열 번호에는 폭이 넓은 bbox 를 추가할 수 없음
+    _check_dtype(group, h5py.check_vlen_dtype(group['indices'].dtype), INDEX_DTYPE)
+    n_frames = max((frame_index(k) for k in recorded), default=-1) + 1
+    for name in (SPARSE_BBOX, TIME_DATASET, *SPARSE_DATASETS):
+        group[name].resize(n_frames, axis=0)
+    return n_frames
+
+
+def _open_datasets(group, layout):
+    """'cube', 'sparse' 방식에서 프레임을 쓸 데이터셋 (청크 캐시가 유지되도록 한 번만 열어 둠)"""
+    if layout == 'cube':
+        return {CUBE_DATASET: group[CUBE_DATASET], TIME_DATASET: group[TIME_DATASET]}
+    if layout == 'sparse':
+        return {name: group[name] for name in (SPARSE_BBOX, TIME_DATASET, *SPARSE_DATASETS)}
+    return None
+
+
+def _write_frame(group, key, data, frame_time, timestamp, datasets=None, codec=DEFAULT_CODEC):
+    """datasets: 'cube', 'sparse' 방식일 때 _open_datasets 결과. 'frames' 방식이면 None"""
+    if datasets is not None:
+        index = frame_index(key)
+        times = datasets[TIME_DATASET]
+        # 시간 좌표를 농도보다 나중에 늘려서, 읽는 쪽에서는 시간 길이까지가 완성된 프레임
+        if CUBE_DATASET in datasets:
+            cube = datasets[CUBE_DATASET]
+            if index >= cube.shape[0]:
+                cube.resize(index + 1, axis=0)
+            cube[index] = data
+        else:
+            frame = SparseFrame.from_dense(data)
+            for name in (SPARSE_BBOX, *SPARSE_DATASETS):
+                if index >= datasets[name].shape[0]:
+                    datasets[name].resize(index + 1, axis=0)
+            datasets[SPARSE_BBOX][index] = frame.bbox
+            for name in SPARSE_DATASETS:
+                datasets[name][index] = getattr(frame, name)
+        if index >= times.shape[0]:
+            times.resize(index + 1, axis=0)
+        if frame_time is not None:
+            value, units = frame_time_value(frame_time)
+            times[index] = value
+            if times.attrs.get('units') != units:
+                times.attrs['units'] = units
+        else:
+            times[index] = np.nan
+    else:
+        if key in group:
+            del group[key]
+        group.create_dataset(key, data=data, **codec_options(codec))
+        group[key].attrs['timestamp'] = timestamp
+
+
+def medium_folder_path(base_folder, folder_number, medium, interval='1hour_interval'):
+    """원본 .TXT 폴더 경로 (1분 간격 대기 자료는 'Air1' 폴더)"""
+    folder_name = 'Air1' if interval == '1minute_interval' and medium == 'Air' else medium
+    return os.path.join(base_folder, f"Concentration{folder_number}", interval, folder_name)
+
+
+def load_source(task):
+    """원본 파일 읽기: (sha1, 격자). 내용이 기록된 해시와 같으면 격자 대신 None (병렬 작업자에서도 사용)"""
+    with open(task['path'], 'rb') as f:
+        buf = f.read()
+    sha1 = hashlib.sha1(buf).hexdigest()
+    if task['sha1'] == sha1:
+        return sha1, None
+    return sha1, parse_grid(buf, task['shape'], source=task['path'])
+
+
+class MediumWriter:
+    """한 HDF5 파일의 한 매체 그룹에 대한 변경 파일 목록 작성과 프레임 쓰기"""
+
+    def __init__(self, hf, base_folder, folder_number, medium, interval='1hour_interval', layout='frames',
+                 codec=DEFAULT_CODEC, create=False, flush_every=None, dtype=np.float64, geometry=None, catalog=None,
+                 expected_frames=None):
+        """create: 원본 폴더가 아직 없어도 그룹과 데이터셋을 미리 만듦 (SWMR 감시용)
+        flush_every: 몇 프레임마다 manifest 기록 후 flush할지
+        dtype: 저장 자료형. float64가 아니면 저장하면서 오차를 집계 (precision.PrecisionStats)
+        geometry: grid_geometry.GridGeometry (None이면 파일에 기록된 값, 없으면 기본 격자). 파일 속성에 기록
+        catalog: frame_catalog DB 경로. 주면 폴더 목록과 크기·수정시각을 카탈로그에서 읽음 (frame_catalog.folder_entries)
+        expected_frames: 'cube' 데이터셋을 새로 만들 때 청크 크기를 맞출 프레임 수.
+            None이면 원본 폴더의 .TXT 수, 0이면 알 수 없음 (기본 청크, 실행 중 계속 늘어나는 hdf5_watch)"""
+        self.hf = hf
+        self.catalog = catalog
+        self.geometry = write_geometry(hf, geometry)
+        self.base_folder = base_folder
+        self.medium = medium
+        self.codec = codec
+        self.dtype = np.dtype(dtype)
+        self.stats = PrecisionStats(dtype) if self.dtype != np.float64 else None
+        self.folder = medium_folder_path(base_folder, folder_number, medium, interval)
+        self.counts = {'added': 0, 'updated': 0, 'skipped': 0}
+        self.pending = []
+        self.flush_every_option = flush_every
+        self.expected_frames = expected_frames
+        self.layout = layout
+        self.time_units = MINUTE_TIME_UNITS if interval == '1minute_interval' else HOURLY_TIME_UNITS
+        # 시간 순서가 앞선 새 파일이라 SWMR 모드에서 건너뛴 파일 (경고는 한 번만)
+        self.late = set()
+        # 건너뛴 파일 (hdf5_watch 처럼 plan 을 여러 번 불러도 한 번만 셈)
+        self.skipped = set()
+        if not create and not os.path.isdir(self.folder):
+            self.group = None
+            return
+        self._open_group()
+
+    def _open_group(self):
+        self.group = self.hf.require_group(self.medium)
+        self.manifest = read_manifest(self.hf, self.medium)
+        self.manifest_ds = _manifest_dataset(self.hf, self.medium)
+
+        # manifest에 없는 프레임은 이전 실행이 쓰는 도중 중단된 것이므로 다시 씀
+        recorded = {row['frame'].decode() for _, row in self.manifest.values()}
+        shape = self.geometry.shape
+        if self.layout == 'cube':
+            n_frames = self.expected_frames
+            if n_frames is None and os.path.isdir(self.folder):
+                n_frames = sum(e.name.endswith('.TXT') for e in os.scandir(self.folder))
+            self.next_index = _prepare_cube(self.group, recorded, shape, self.codec, self.time_units, self.dtype,
+                                            n_frames)
+        elif self.layout == 'sparse':
+            self.next_index = _prepare_sparse(self.group, recorded, shape, self.time_units, self.dtype)
+        else:
+            self.next_index = _prepare_frames(self.group, recorded, self.dtype)
+        self.datasets = _open_datasets(self.group, self.layout)
+        # 'cube' 방식은 프레임마다 flush하면 청크 25개를 매번 다시 압축하므로 청크의 시간 길이마다 한 번씩 flush
+        if self.flush_every_option:
+            self.flush_every = self.flush_every_option
+        elif self.layout == 'cube':
+            self.flush_every = self.group[CUBE_DATASET].chunks[0]
+        else:
+            self.flush_every = 1 if self.layout == 'frames' else CUBE_CHUNKS[0]
+        # 저장된 프레임 중 가장 늦은 원본의 정렬 키 (이보다 앞선 새 파일은 뒤에 붙일 수 없음)
+        self.last_key = max((frame_sort_key(path.rsplit('/', 1)[-1]) for path in self.manifest), default=None)
+
+    def _rebuild(self):
+        """그룹과 manifest 를 지우고 처음부터 다시 씀 (시간 순서가 앞선 파일이 늦게 들어온 경우)"""
+        del self.hf[self.medium]
+        if self.medium in self.hf.get(MANIFEST_GROUP, {}):
+            del self.hf[MANIFEST_GROUP][self.medium]
+        self.pending.clear()
+        self.counts = {'added': 0, 'updated': 0, 'skipped': 0}
+        self.skipped.clear()
+        self._open_group()
+
+    def plan(self, entries=None):
+        """새 파일, 크기나 수정시각이 바뀐 파일의 작업 목록 (시간 순). 프레임 이름은 여기서 정해짐"""
+        if self.group is None:
+            print(f"폴더가 존재하지 않습니다: {self.folder}")
+            return []
+        if entries is None:
+            if not os.path.isdir(self.folder):
+                return []
+            if self.catalog:
+                # frame_catalog 가 이 모듈을 가져오므로 여기서 가져옴
+                from frame_catalog import folder_entries
+                entries = folder_entries(self.catalog, self.folder)
+            else:
+                entries = [e for e in os.scandir(self.folder) if e.name.endswith('.TXT')]
+
+        entries = sorted(entries, key=entry_sort_key)
+        # 프레임 번호가 곧 시간 순서이므로, 이미 저장된 프레임보다 앞선 시각의 새 파일은 뒤에 붙이지 않음
+        late = [e for e in entries if self.last_key is not None and entry_sort_key(e) < self.last_key
+                and os.path.relpath(e.path, self.base_folder).replace(os.sep, '/') not in self.manifest]
+        if late:
+            if self.hf.swmr_mode:
+                # SWMR 모드에서는 그룹을 지울 수 없으므로 건너뜀 (감시가 끝난 뒤 convert_to_hdf5 로 다시 변환)
+                for e in late:
+                    if e.path not in self.late:
+                        self.late.add(e.path)
+                        print(f"Warning: {e.path} 는 이미 저장된 프레임보다 앞선 시각이라 추가하지 않습니다.")
+                names = {e.path for e in late}
+                entries = [e for e in entries if e.path not in names]
+            else:
+                print(f"{self.folder}: 이미 저장된 프레임보다 앞선 시각의 새 파일 {len(late)}개가 있어 "
+                      f"{self.medium} 그룹을 시간 순으로 다시 만듭니다.")
+                self._rebuild()
+
+        tasks = []
+        for entry in entries:
+            rel_path = os.path.relpath(entry.path, self.base_folder).replace(os.sep, '/')
+            stat = entry.stat()
+            row_index, row = self.manifest.get(rel_path, (None, None))
+            if row is not None and row['size'] == stat.st_size and row['mtime_ns'] == stat.st_mtime_ns:
+                self._skip(rel_path)
+                continue
+
+            if row is not None:
+                key = row['frame'].decode()
+            else:
+                key = f"frame_{self.next_index:03d}"
+                self.next_index += 1
+            tasks.append({'path': entry.path, 'name': entry.name, 'rel_path': rel_path, 'stat': stat,
+                          'row_index': row_index, 'key': key, 'shape': self.geometry.shape,
+                          'sha1': row['sha1'].decode() if row is not None else None})
+        return tasks
+
+    def store(self, task, sha1, data):
+        """load_source 결과 기록. data가 None이면 내용은 같고 수정시각만 바뀐 경우"""
+        if data is None:
+            self._skip(task['rel_path'])
+        else:
+            self.counts['updated' if task['row_index'] is not None else 'added'] += 1
+            frame_time = parse_frame_time(task['name'])
+            timestamp = os.path.splitext(task['name'])[0] if frame_time is None else format_frame_time(frame_time)
+            data = cast_frame(data, self.dtype, self.stats)
+            _write_frame(self.group, task['key'], data, frame_time, timestamp, self.datasets, self.codec)
+            if task['row_index'] is None:
+                key = frame_sort_key(task['name'])
+                self.last_key = key if self.last_key is None else max(self.last_key, key)
+        self.pending.append((task['row_index'], task['key'], task['rel_path'], task['stat'], sha1))
+        if len(self.pending) >= self.flush_every:
+            self.commit()
+
+    def _skip(self, rel_path):
+        if rel_path not in self.skipped:
+            self.skipped.add(rel_path)
+            self.counts['skipped'] += 1
+
+    def commit(self):
+        """manifest 행은 프레임을 다 쓴 뒤에 기록 (중단 시 재개 기준)"""
+        if self.group is None or not self.pending:
+            return
+        for row_index, key, rel_path, stat, sha1 in self.pending:
+            row_index = _write_manifest_row(self.manifest_ds, row_index, key, rel_path, stat, sha1)
+            self.manifest[rel_path] = (row_index, self.manifest_ds[row_index])
+        self.hf.flush()
+        self.pending.clear()
+
+    def save_audit(self):
+        """float64가 아닌 자료형으로 저장한 경우 오차 집계를 그룹 속성에 누적 기록하고 counts['audit']에 요약"""
+        if self.stats is None or self.group is None:
+            return
+        previous = PrecisionStats.from_attrs(self.group.attrs)
+        if previous is not None and previous.dtype == self.stats.dtype:
+            self.stats.merge(previous)
+        self.stats.to_attrs(self.group.attrs)
+        self.counts['audit'] = self.stats.summary()
+
+
+def convert_medium(hf, base_folder, folder_number, medium, interval='1hour_interval', layout='frames',
+                   codec=DEFAULT_CODEC, dtype=np.float64, geometry=None, catalog=None):
+    """한 물질/매체 폴더의 새 파일, 바뀐 파일만 HDF5에 추가 (이미 저장된 프레임은 건너뜀)"""
+    writer = MediumWriter(hf, base_folder, folder_number, medium, interval, layout, codec, dtype=dtype,
+                          geometry=geometry, catalog=catalog)
+    for task in writer.plan():
+        writer.store(task, *load_source(task))
+    writer.commit()
+    writer.save_audit()
+    return writer.counts
+
+
+def _print_counts(folder_number, medium, counts):
+    print(f"Concentration{folder_number} {medium}: 추가 {counts['added']}, "
+          f"갱신 {counts['updated']}, 건너뜀 {counts['skipped']}")
+    if 'audit' in counts:
+        print(f"    {counts['audit']}")
+
+
+def convert_to_hdf5(base_folder, output_folder, folder_numbers=range(26, 42), interval='1hour_interval',
+                    layout='frames', codec=DEFAULT_CODEC, dtype=np.float64, geometry=None, catalog=None):
+    """layout: 'frames' (프레임별 데이터셋, 기존 방식), 'cube' (매체별 (시간, 행, 열) 데이터셋 하나)
+    또는 'sparse' (프레임별 bbox + 0이 아닌 값만)
+    codec: CODECS 중 하나 (hdf5_benchmark.py 로 비교)
+    dtype: np.float64 (기본), np.float32 또는 np.float16 (0으로 사라지는 값이 있으면 ValueError).
+    float64가 아니면 물질/매체별 오차를 그룹 속성에 기록 (precision_audit.py 로 확인)
+    geometry: 격자 위치/크기/배출원 (grid_geometry.GridGeometry, None이면 기본 격자). 파일 속성으로 저장
+    catalog: frame_catalog DB 경로. 주면 폴더를 다시 훑지 않고 카탈로그로 변경 파일을 찾고, 끝나면 HDF5 위치를 연결"""
+    codec_options(codec)
+    os.makedirs(output_folder, exist_ok=True)
+    if catalog:
+        from frame_catalog import update_catalog
+        update_catalog(catalog, base_folder)
+
+    for folder_number in tqdm(folder_numbers, desc="Processing substances"):
+        output_file = os.path.join(output_folder, f"Concentration{folder_number}.h5")
+
+        with h5py.File(output_file, 'a', rdcc_nbytes=CHUNK_CACHE_BYTES) as hf:
+            for medium in MEDIA:
+                counts = convert_medium(hf, base_folder, folder_number, medium, interval, layout, codec, dtype, geometry,
+                                        catalog)
+                _print_counts(folder_number, medium, counts)
+
+        print(f"Saved {output_file}")
+
+    if catalog:
+        _link_catalog(catalog, output_folder, interval)
+
+
+def _link_catalog(catalog, output_folder, interval):
+    from frame_catalog import link_hdf5
+    print(f"카탈로그 HDF5 연결: {link_hdf5(catalog, output_folder, interval)}개")
+
+
+# ---- 병렬 변환: 작업자 여러 개가 파일을 읽고, 출력 파일마다 쓰기 프로세스 하나 ----
+
+def _parse_worker(task_queue, result_queues):
+    while True:
+        item = task_queue.get()
+        if item is None:
+            break
+        folder_number, seq, task = item
+        try:
+            result = (seq,) + load_source(task) + (None,)
+        except Exception as e:
+            result = (seq, None, None, str(e))
+        # 쓰기가 밀리면 여기서 대기 (큐 크기 제한)
+        result_queues[folder_number].put(result)
+
+
+def _writer_process(output_file, base_folder, folder_number, interval, layout, codec, dtype, geometry, catalog,
+                    window, task_queue, result_queue, progress_queue, worker_lost):
+    try:
+        with h5py.File(output_file, 'a', rdcc_nbytes=CHUNK_CACHE_BYTES) as hf:
+            writers = [MediumWriter(hf, base_folder, folder_number, medium, interval, layout, codec, dtype=dtype,
+                                    geometry=geometry, catalog=catalog)
+                       for medium in MEDIA]
+            jobs = [(writer, task) for writer in writers for task in writer.plan()]
+            progress_queue.put(('total', folder_number, len(jobs)))
+            # 다음에 쓸 프레임보다 window 개 이상 앞선 작업은 내보내지 않음:
+            # 느린 파일 하나 뒤에 밀린 결과도 window 개까지만 메모리에 쌓임 (결과 큐 크기와 같음)
+            for seq in range(min(window, len(jobs))):
+                task_queue.put((folder_number, seq, jobs[seq][1]))
+
+            # 작업자마다 끝나는 순서가 다르므로 번호 순으로 다시 맞춰서 씀
+            arrived = {}
+            for seq, (writer, task) in enumerate(jobs):
+                while seq not in arrived:
+                    try:
+                        got, sha1, data, error = result_queue.get(timeout=PROGRESS_TIMEOUT)
+                    except queue.Empty:
+                        # 파일을 읽던 작업자가 죽으면 그 결과는 오지 않음
+                        if worker_lost.is_set():
+                            raise RuntimeError(f"작업자 프로세스가 비정상 종료되어 {task['path']} 결과를 받지 못했습니다.")
+                        continue
+                    arrived[got] = (sha1, data, error)
+                sha1, data, error = arrived.pop(seq)
+                if error is not None:
+                    raise ValueError(error)
+                if seq + window < len(jobs):
+                    task_queue.put((folder_number, seq + window, jobs[seq + window][1]))
+                writer.store(task, sha1, data)
+                progress_queue.put(('frame', folder_number, 1))
+            for writer in writers:
+                writer.commit()
+                writer.save_audit()
+        progress_queue.put(('done', folder_number, {w.medium: w.counts for w in writers}))
+    except Exception as e:
+        # 남은 결과는 주 프로세스가 비움
+        progress_queue.put(('error', folder_number, f"{output_file}: {e}"))
+
+
+def _drain(result_queues, folder_numbers):
+    """실패한 출력 파일 몫의 결과를 버림 (작업자가 결과를 보내다 멈추지 않도록)"""
+    for n in folder_numbers:
+        try:
+            while True:
+                result_queues[n].get_nowait()
+        except queue.Empty:
+            pass
+
+
+def convert_to_hdf5_parallel(base_folder, output_folder, folder_numbers=range(26, 42), interval='1hour_interval',
+                             layout='frames', codec=DEFAULT_CODEC, workers=None, queue_size=8, dtype=np.float64,
+                             geometry=None, catalog=None):
+    """convert_to_hdf5 와 같은 결과를 여러 프로세스로 생성.
+    workers: 파일을 읽는 작업자 수 (기본: CPU 수 - 1), queue_size: 출력 파일별로 읽어 둔 (쓰기 전) 프레임 수 상한.
+    작업자나 쓰기 프로세스가 비정상 종료되면 해당 물질을 실패로 보고 (멈추지 않음)"""
+    codec_options(codec)
+    os.makedirs(output_folder, exist_ok=True)
+    if catalog:
+        # 쓰기 프로세스들은 카탈로그를 읽기만 하도록 먼저 한 번 갱신
+        from frame_catalog import update_catalog
+        update_catalog(catalog, base_folder)
+    folder_numbers = list(folder_numbers)
+    workers = workers or max(1, (os.cpu_count() or 2) - 1)
+
+    task_queue = mp.Queue()
+    progress_queue = mp.Queue()
+    result_queues = {n: mp.Queue(maxsize=queue_size) for n in folder_numbers}
+    worker_lost = mp.Event()
+
+    parsers = [mp.Process(target=_parse_worker, args=(task_queue, result_queues), daemon=True)
+               for _ in range(workers)]
+    writers = [mp.Process(target=_writer_process,
+                          args=(os.path.join(output_folder, f"Concentration{n}.h5"), base_folder, n, interval,
+                                layout, codec, dtype, geometry, catalog, queue_size, task_queue, result_queues[n],
+                                progress_queue, worker_lost))
+               for n in folder_numbers]
+    for process in parsers + writers:
+        process.start()
+
+    bars = {}
+    errors = []
+    running = dict(zip(folder_numbers, writers))
+    failed = []
+    while running:
+        try:
+            kind, folder_number, value = progress_queue.get(timeout=PROGRESS_TIMEOUT)
+        except queue.Empty:
+            # 쓰기 프로세스가 결과를 보내지 못하고 죽은 경우 (메모리 부족 등)
+            for n, process in list(running.items()):
+                if not process.is_alive():
+                    del running[n]
+                    failed.append(n)
+                    if n in bars:
+                        bars[n].close()
+                    errors.append(f"Concentration{n}: 쓰기 프로세스가 비정상 종료되었습니다 (exitcode {process.exitcode}).")
+            # 작업자가 죽으면 읽던 파일의 결과를 기다리는 쓰기 프로세스가 실패하도록 알림
+            dead = [p for p in parsers if not p.is_alive()]
+            if dead and not worker_lost.is_set():
+                print(f"Warning: 작업자 프로세스 {len(dead)}개가 비정상 종료되었습니다 "
+                      f"(exitcode {', '.join(str(p.exitcode) for p in dead)}).")
+                worker_lost.set()
+        else:
+            if kind == 'total':
+                bars[folder_number] = tqdm(total=value, desc=f"Concentration{folder_number}",
+                                           position=folder_numbers.index(folder_number))
+            elif kind == 'frame':
+                bars[folder_number].update(value)
+            else:
+                running.pop(folder_number, None)
+                if folder_number in bars:
+                    bars[folder_number].close()
+                if kind == 'error':
+                    failed.append(folder_number)
+                    errors.append(value)
+                else:
+                    for medium, counts in value.items():
+                        _print_counts(folder_number, medium, counts)
+        _drain(result_queues, failed)
+
+    for process in writers:
+        process.join()
+    for process in parsers:
+        if process.is_alive():
+            task_queue.put(None)
+    for process in parsers:
+        # 실패한 물질의 남은 작업 결과를 비우면서 종료를 기다림
+        while process.is_alive():
+            _drain(result_queues, failed)
+            process.join(timeout=0.5)
+
+    if catalog:
+        _link_catalog(catalog, output_folder, interval)
+    if errors:
+        raise RuntimeError("변환 실패:\n" + "\n".join(errors))
+
+
+# ---- 읽기 (두 저장 방식 공통, npy_store.NpyCube 도 그룹 대신 사용 가능) ----
+
+def frame_store_path(folder, folder_number):
+    """물질 번호의 저장 위치: ConcentrationNN.h5, 없으면 npy 폴더 ConcentrationNN"""
+    hdf5_file = os.path.join(folder, f"Concentration{folder_number}.h5")
+    npy_folder = os.path.join(folder, f"Concentration{folder_number}")
+    if not os.path.exists(hdf5_file) and os.path.isdir(npy_folder):
+        return npy_folder
+    return hdf5_file
+
+
+def derived_store_path(folder, folder_number, subfolder, suffix):
+    """프레임 저장 폴더 아래 subfolder 의 계산 결과 파일 ConcentrationNN_{suffix}.h5.
+    하위 폴더에 두어 'Concentration*.h5' 로 프레임 파일을 찾는 스크립트에 섞이지 않도록 함"""
+    output_folder = os.path.join(folder, subfolder)
+    os.makedirs(output_folder, exist_ok=True)
+    return os.path.join(output_folder, f"Concentration{folder_number}_{suffix}.h5")
+
+
+def open_hdf5(path):
+    """HDF5 파일을 읽기용으로 열기. hdf5_watch 가 SWMR 모드로 쓰고 있는 파일은 일반 읽기가 잠금 때문에
+    실패하므로 SWMR 읽기 모드로 다시 열기 (쓰는 중에도 그 시점까지 완성된 프레임을 읽을 수 있음)"""
+    try:
+        return h5py.File(path, 'r')
+    except OSError:
+        return h5py.File(path, 'r', libver='latest', swmr=True)
+
+
+def open_frames(path):
+    """HDF5 파일 또는 npy 폴더를 읽기용으로 열기. 둘 다 with 문과 store['Air'] 형태로 사용"""
+    if os.path.isdir(path):
+        from npy_store import open_npy_store
+        return open_npy_store(path)
+    return open_hdf5(path)
+
+
+def _is_hdf5(group):
+    return isinstance(group, h5py.Group)
+
+
+def frame_keys(group):
+    """'frames' 방식 프레임 이름 (번호 순)"""
+    return sorted(group.keys(), key=frame_index)
+
+
+def frame_count(group):
+    if not _is_hdf5(group):
+        return group.frame_count()
+    if is_sparse(group):
+        return group[SPARSE_BBOX].shape[0]
+    return group[CUBE_DATASET].shape[0] if is_cube(group) else len(group.keys())
+
+
+def frame_timestamps(group):
+    """프레임별 timestamp 문자열 목록 (기존 'timestamp' 속성과 같은 형식)"""
+    if not _is_hdf5(group):
+        return list(group.timestamps)
+    if TIME_DATASET not in group:
+        return [group[key].attrs['timestamp'] for key in frame_keys(group)]
+
+    units = group[TIME_DATASET].attrs.get('units', MINUTE_TIME_UNITS)
+    return [format_time_value(t, units) for t in group[TIME_DATASET][()]]
+
+
+def frame_times(group):
+    """숫자 시간 좌표와 단위. 'frames' 방식은 timestamp를 원본 파일 이름으로 되돌려 해석"""
+    if not _is_hdf5(group):
+        return group.time, group.time_units
+    if TIME_DATASET in group:
+        return group[TIME_DATASET][()], group[TIME_DATASET].attrs.get('units', MINUTE_TIME_UNITS)
+
+    medium = group.name.strip('/')
+    values, units = [], MINUTE_TIME_UNITS
+    for timestamp in frame_timestamps(group):
+        # 1시간 간격 파일명은 'Air2019Y...', 1분 간격은 'Air 10min' 형식
+        frame_time = parse_frame_time(f"{medium}{timestamp}.TXT")
+        if frame_time is None:
+            frame_time = parse_frame_time(f"{medium} {timestamp}.TXT")
+        if frame_time is None:
+            values.append(np.nan)
+            continue
+        value, units = frame_time_value(frame_time)
+        values.append(value)
+    return np.array(values, dtype=np.float64), units
+
+
+def format_time_value(value, units):
+    """숫자 시간 좌표 하나를 timestamp 문자열로"""
+    if np.isnan(value):
+        return ''
+    if units == HOURLY_TIME_UNITS:
+        return format_frame_time(EPOCH + timedelta(minutes=round(value)))
+    return format_frame_time(int(round(value)))
+
+
+def _sparse_blocks(group, start=0, stop=None):
+    """'sparse' 방식 프레임을 SPARSE_BLOCK 개씩 묶어 읽어 (번호, SparseFrame) 반환"""
+    shape = tuple(group[SPARSE_BBOX].attrs['shape'])
+    stop = group[SPARSE_BBOX].shape[0] if stop is None else stop
+    for block_start in range(start, stop, SPARSE_BLOCK):
+        block = slice(block_start, min(block_start + SPARSE_BLOCK, stop))
+        bboxes = group[SPARSE_BBOX][block]
+        parts = [group[name][block] for name in SPARSE_DATASETS]
+        for offset, bbox in enumerate(bboxes):
+            yield block_start + offset, SparseFrame(shape, bbox, *(part[offset] for part in parts))
+
+
+def iter_sparse_frames(group):
+    """(번호, timestamp, SparseFrame)을 시간 순으로 반환. 다른 방식은 읽으면서 변환"""
+    timestamps = frame_timestamps(group)
+    if _is_hdf5(group) and is_sparse(group):
+        for i, frame in _sparse_blocks(group):
+            yield i, timestamps[i], frame
+        return
+    for i, timestamp, data in iter_frames(group):
+        yield i, timestamp, SparseFrame.from_dense(data)
+
+
+def iter_frames(group):
+    """(번호, timestamp, 2차원 배열)을 시간 순으로 반환. 'cube' 방식은 청크 단위로 묶어 읽음"""
+    timestamps = frame_timestamps(group)
+    if not _is_hdf5(group):
+        for i, data in enumerate(group.data):
+            yield i, timestamps[i], data
+        return
+    if is_sparse(group):
+        for i, frame in _sparse_blocks(group):
+            yield i, timestamps[i], frame.to_dense()
+        return
+    if not is_cube(group):
+        for i, key in enumerate(frame_keys(group)):
+            yield i, timestamps[i], group[key][()]
+        return
+
+    cube = group[CUBE_DATASET]
+    step = cube.chunks[0] if cube.chunks else 1
+    for start in range(0, cube.shape[0], step):
+        block = cube[start:start + step]
+        for offset, data in enumerate(block):
+            yield start + offset, timestamps[start + offset], data
+
+
+def iter_frame_blocks(group, block_size=64):
+    """(시작 번호, (프레임 수, 행, 열) 배열)을 block_size 프레임씩 반환 (메모리는 블록 하나 크기로 제한).
+    'cube' 방식은 청크 경계에 맞춰 읽고, npy는 memmap 슬라이스 그대로 반환"""
+    if not _is_hdf5(group):
+        for start in range(0, group.frame_count(), block_size):
+            yield start, group.data[start:start + block_size]
+        return
+    if is_cube(group):
+        cube = group[CUBE_DATASET]
+        step = cube.chunks[0] if cube.chunks else 1
+        block_size = max(step, block_size // step * step)
+        for start in range(0, cube.shape[0], block_size):
+            yield start, cube[start:start + block_size]
+        return
+
+    # 'frames', 'sparse' 방식은 블록 배열 하나를 재사용 (반환한 배열은 다음 블록을 읽으면 덮어씀)
+    n_frames = frame_count(group)
+    block = None
+    for i, _, data in iter_frames(group):
+        offset = i % block_size
+        if block is None:
+            block = np.empty((min(block_size, n_frames),) + data.shape, dtype=data.dtype)
+        block[offset] = data
+        if offset == block_size - 1 or i == n_frames - 1:
+            yield i - offset, block[:offset + 1]
+
+
+def read_frame(group, index):
+    if not _is_hdf5(group):
+        return group.data[index]
+    if is_sparse(group):
+        return next(_sparse_blocks(group, index, index + 1))[1].to_dense()
+    if is_cube(group):
+        return group[CUBE_DATASET][index]
+    return group[frame_keys(group)[index]][()]
+
+
+def read_all_frames(group):
+    """모든 프레임을 (시간, 행, 열) 배열 하나로 읽기 (npy는 복사 없이 memmap 그대로)"""
+    if not _is_hdf5(group):
+        return group.data
+    if is_sparse(group):
+        return np.array([frame.to_dense() for _, frame in _sparse_blocks(group)])
+    if is_cube(group):
+        return group[CUBE_DATASET][()]
+    return np.array([group[key][()] for key in frame_keys(group)])
+
+
+def read_cell_series(group, row, col):
+    """한 격자의 시계열"""
+    if not _is_hdf5(group):
+        return group.data[:, row, col]
+    if is_sparse(group):
+        return np.array([frame.value_at(row, col) for _, frame in _sparse_blocks(group)])
+    if is_cube(group):
+        return group[CUBE_DATASET][:, row, col]
+    return np.array([group[key][row, col] for key in frame_keys(group)])
@@ -0,0 +1,124 @@
+import os
+import time
+import h5py
+
+from hdf5_store import (MEDIA, CHUNK_CACHE_BYTES, CUBE_DATASET, TIME_DATASET, MINUTE_TIME_UNITS, DEFAULT_CODEC,
+                        MediumWriter, load_source, format_time_value, frame_index, entry_sort_key)
+
+INTERVAL = '1minute_interval'
+
+
+def open_live(path):
+    """감시 중인 HDF5 파일을 SWMR 읽기 모드로 열기 (쓰는 중에도 읽을 수 있음)"""
+    return h5py.File(path, 'r', libver='latest', swmr=True)
+
+
+def follow_frames(path, medium, start=0, poll_interval=5.0, idle_timeout=None):
+    """watch_to_hdf5 가 쓰고 있는 파일에서 새 프레임이 생기는 대로 (번호, timestamp, 격자) 반환.
+    idle_timeout 초 동안 새 프레임이 없으면 종료 (None이면 계속 대기)"""
+    with open_live(path) as hf:
+        cube, times = hf[medium][CUBE_DATASET], hf[medium][TIME_DATASET]
+        units = times.attrs.get('units', MINUTE_TIME_UNITS)
+        index = start
+        last_frame = time.monotonic()
+        while True:
+            cube.refresh()
+            times.refresh()
+            # 시간 좌표는 농도를 쓴 뒤에 늘어나므로 시간 길이까지가 완성된 프레임
+            available = min(cube.shape[0], times.shape[0])
+            if available > index:
+                for i in range(index, available):
+                    yield i, format_time_value(times[i], units), cube[i]
+                index = available
+                last_frame = time.monotonic()
+            elif idle_timeout is not None and time.monotonic() - last_frame > idle_timeout:
+                return
+            else:
+                time.sleep(poll_interval)
+
+
+def _stable_entries(folder, seen, settle_seconds, now):
+    """크기와 수정시각이 settle_seconds 동안 그대로인 파일을 시간 순으로, 아직 쓰는 중인 파일 앞까지만"""
+    if not os.path.isdir(folder):
+        return []
+    entries = sorted((e for e in os.scandir(folder) if e.name.endswith('.TXT')), key=entry_sort_key)
+    stable = []
+    for entry in entries:
+        stat = entry.stat()
+        signature = (stat.st_size, stat.st_mtime_ns)
+        if seen.get(entry.path, (None,))[0] != signature:
+            seen[entry.path] = (signature, now)
+        if now - seen[entry.path][1] < settle_seconds:
+            break
+        stable.append(entry)
+    return stable
+
+
+def _append_ready(writer, seen, settle_seconds, now):
+    """완성된 새 파일을 시간 순으로 추가하고 추가한 프레임 수 반환"""
+    appended = 0
+    # plan 은 새 파일마다 프레임 번호를 미리 배정하므로, 중간에 멈추면 실제로 쓴 프레임 다음 번호로 되돌림
+    next_index = writer.next_index
+    for task in writer.plan(_stable_entries(writer.folder, seen, settle_seconds, now)):
+        try:
+            sha1, data = load_source(task)
+        except ValueError:
+            # 크기는 그대로지만 격자가 모자라면 아직 쓰는 중으로 보고 다음에 다시 시도
+            break
+        writer.store(task, sha1, data)
+        appended += data is not None
+        if task['row_index'] is None:
+            next_index = frame_index(task['key']) + 1
+    writer.next_index = next_index
+    return appended
+
+
+def watch_to_hdf5(base_folder, output_folder, folder_numbers=range(26, 42), poll_interval=5.0,
+                  settle_seconds=2.0, idle_timeout=None, codec=DEFAULT_CODEC):
+    """CAM 실행 중 ConcentrationNN/1minute_interval/{Air1,Soil} 에 생기는 .TXT 를 'cube' 방식으로 계속 추가.
+    파일은 SWMR 모드로 쓰므로 follow_frames 등으로 동시에 읽을 수 있음.
+    idle_timeout 초 동안 새 파일이 없으면 종료 (None이면 Ctrl+C 까지)"""
+    os.makedirs(output_folder, exist_ok=True)
+    files = {}
+    writers = []
+    try:
+        for folder_number in folder_numbers:
+            output_file = os.path.join(output_folder, f"Concentration{folder_number}.h5")
+            hf = h5py.File(output_file, 'a', libver='latest', rdcc_nbytes=CHUNK_CACHE_BYTES)
+            files[folder_number] = hf
+            # SWMR 모드에서는 그룹, 데이터셋, 속성을 새로 만들 수 없으므로 먼저 모두 준비
+            for medium in MEDIA:
+                writer = MediumWriter(hf, base_folder, folder_number, medium, INTERVAL, layout='cube',
+                                      codec=codec, create=True, flush_every=1, expected_frames=0)
+                writers.append((folder_number, writer, {}))
+            try:
+                hf.swmr_mode = True
+            except RuntimeError as e:
+                raise ValueError(f"{output_file}: SWMR 모드로 열 수 없습니다. "
+                                 f"libver='latest' 로 만든 파일이 아니면 새 폴더를 지정하세요. ({e})")
+
+        print(f"감시 시작: {base_folder} -> {output_folder}")
+        last_frame = time.monotonic()
+        while True:
+            now = time.monotonic()
+            for folder_number, writer, seen in writers:
+                appended = _append_ready(writer, seen, settle_seconds, now)
+                if appended:
+                    last_frame = now
+                    print(f"Concentration{folder_number} {writer.medium}: {appended}개 프레임 추가 "
+                          f"(총 {writer.next_index}개)")
+            if idle_timeout is not None and time.monotonic() - last_frame > idle_timeout:
+                print(f"{idle_timeout}초 동안 새 파일이 없어 감시를 종료합니다.")
+                break
+            time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        print("감시를 중단했습니다.")
+    finally:
+        for hf in files.values():
+            hf.close()
+
+
+if __name__ == "__main__":
+    base_folder = r"C:\CAM_test_analysis\input"
+    output_folder = r"C:\CAM_test_analysis\hdf5_live"
+    watch_to_hdf5(base_folder, output_folder)
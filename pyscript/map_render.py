@@ -0,0 +1,263 @@
+from functools import lru_cache
+
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+from matplotlib.colors import LinearSegmentedColormap, BoundaryNorm, LogNorm, to_rgb
+
+from hdf5_store import iter_sparse_frames
+from sparse_frames import positive_range
+
+# 농도 지도 공통 색상 (0 부근 흰색 -> 빨강)
+DEFAULT_COLORS = ['#FFFFFF', '#87CEFA', '#ADFF2F', '#FFFF00', '#FFA500', '#FF0000']
+
+# 'vector': 격자마다 polygon (GeoDataFrame.plot), 'raster': 격자 범위에 맞춘 이미지 하나 + 격자선
+RENDER_MODES = ('vector', 'raster')
+
+# GeoDataFrame.plot 의 자동 축 범위와 같은 여백 (matplotlib 기본 axes.xmargin)
+MAP_MARGIN = 0.05
+
+
+@lru_cache(maxsize=None)
+def grid_frame(geometry):
+    """격자 polygon GeoDataFrame (값 열 없음). 공간 인덱스까지 만들어 두고 프로세스마다 격자별로 한 번만 생성"""
+    import geopandas as gpd
+    gdf = gpd.GeoDataFrame({'geometry': geometry.cell_polygons()}, crs=geometry.crs)
+    gdf.sindex
+    return gdf
+
+
+def grid_values(geometry, data, column='concentration'):
+    """캐시한 격자 GeoDataFrame 의 얕은 복사본에 값 열만 넣어 반환 (polygon 과 공간 인덱스는 공유).
+    data 는 (행, 열) 배열, 마스크/NaN 은 NaN"""
+    values = np.ma.asarray(data, dtype=np.float64)
+    if values.shape != geometry.shape:
+        raise ValueError(f"격자 크기가 다릅니다: {values.shape} != {geometry.shape}")
+    gdf = grid_frame(geometry).copy(deep=False)
+    gdf[column] = values.filled(np.nan).ravel()
+    return gdf
+
+
+def global_range(group, data_type):
+    """매체 전체 프레임의 색상 범위 (Soil 만 사용, Air 는 (None, None)): 0보다 큰 값의 최소 ~ 최대"""
+    if data_type != 'Soil':
+        return None, None
+    global_min, global_max = positive_range(frame for _, _, frame in iter_sparse_frames(group))
+    if global_min == np.inf or global_max == -np.inf:
+        print(f"Warning: All Soil data is zero or invalid. Using default global range: 0, 1")
+        return 0, 1
+    if global_min == global_max:
+        print(f"Warning: All non-zero Soil data has the same value. Adjusting range slightly.")
+        return global_min * 0.9, global_max * 1.1
+    return global_min, global_max
+
+
+def concentration_range(data, data_type, global_min, global_max):
+    """색상 범위: Soil 은 전체 프레임 범위, Air 는 프레임별 (0 제외 최소값 ~ 최대값). 모두 0이면 0~1"""
+    if data_type == 'Soil':
+        min_conc, max_conc = global_min, global_max
+    else:
+        non_zero_data = data[data > 0]
+        if non_zero_data.size > 0:
+            min_conc, max_conc = np.min(non_zero_data), np.max(data)
+        else:
+            min_conc = max_conc = 0
+    if min_conc == max_conc == 0:
+        min_conc, max_conc = 0, 1
+    return min_conc, max_conc
+
+
+def concentration_norm(data_type, colors, min_conc, max_conc):
+    """(cmap, norm): Soil 은 로그 스케일, Air 는 색상 수만큼 같은 간격 구간"""
+    if data_type == 'Soil':
+        norm = LogNorm(vmin=max(min_conc, 1e-10), vmax=max(max_conc, 1e-9))
+    else:
+        norm = BoundaryNorm(np.linspace(min_conc, max_conc, len(colors) + 1), len(colors))
+    return LinearSegmentedColormap.from_list('custom', colors, N=len(colors)), norm
+
+
+def add_basemap(ax, geometry, basemap=True):
+    """basemap: True 면 contextily 로 OpenStreetMap 타일 (온라인), False/None 이면 그리지 않음,
+    문자열이면 basemap_cache.prepare_basemap 으로 만든 배경 지도 파일 (재투영 없이 이미지 하나만 그림)"""
+    if basemap is True:
+        import contextily as ctx
+        ctx.add_basemap(ax, crs=geometry.crs, source=ctx.providers.OpenStreetMap.Mapnik)
+    elif basemap:
+        from basemap_cache import read_basemap
+        image, extent, attribution = read_basemap(basemap)
+        xlim, ylim = ax.get_xlim(), ax.get_ylim()
+        ax.imshow(image, extent=extent, origin='upper', interpolation='bilinear', zorder=0)
+        ax.set_xlim(xlim)
+        ax.set_ylim(ylim)
+        if attribution:
+            ax.text(0.005, 0.005, attribution, transform=ax.transAxes, fontsize=8, ha='left', va='bottom')
+
+
+def set_colorbar_ticks(cbar, data_type, colors, min_conc, max_conc):
+    """색상 구간 경계마다 눈금 (Soil 은 로그 간격)"""
+    if data_type == 'Soil':
+        cbar.set_ticks(np.logspace(np.log10(max(min_conc, 1e-10)), np.log10(max(max_conc, 1e-9)), num=len(colors) + 1))
+    else:
+        cbar.set_ticks(np.linspace(min_conc, max_conc, num=len(colors) + 1))
+    cbar.set_ticklabels([f'{b:.1e}' for b in cbar.get_ticks()])
+
+
+def add_colorbar(fig, ax, cmap, norm, data_type, colors, min_conc, max_conc):
+    sm = plt.cm.ScalarMappable(cmap=cmap, norm=norm)
+    sm.set_array([])
+    cbar = fig.colorbar(sm, ax=ax, pad=0.02)
+    set_colorbar_ticks(cbar, data_type, colors, min_conc, max_conc)
+
+    concentration_unit = 'μg/m³' if data_type == 'Air' else 'μg/kg'
+    cbar.set_label(f'Concentration ({concentration_unit})', fontsize=10)
+    cbar.ax.tick_params(labelsize=9)
+    return cbar
+
+
+def set_map_axes(ax, geometry, title):
+    """축 제목과 km 단위 눈금 (격자 범위를 5등분)"""
+    ax.set_xlabel('X Coordinate (km)')
+    ax.set_ylabel('Y Coordinate (km)')
+    x_ticks = np.linspace(*geometry.extent[:2], 6)
+    y_ticks = np.linspace(*geometry.extent[2:], 6)
+    ax.set_xticks(x_ticks)
+    ax.set_yticks(y_ticks)
+    ax.set_xticklabels([f'{x / 1000:.2f}' for x in x_ticks])
+    ax.set_yticklabels([f'{y / 1000:.2f}' for y in y_ticks])
+    ax.set_title(title)
+
+
+def grid_lines(geometry, edgecolor='gray', linewidth=0.5):
+    """격자 경계선 (행 수 + 열 수 + 2 개의 선분)"""
+    left, right, bottom, top = geometry.extent
+    xs = np.linspace(left, right, geometry.shape[1] + 1)
+    ys = np.linspace(bottom, top, geometry.shape[0] + 1)
+    segments = [[(x, bottom), (x, top)] for x in xs] + [[(left, y), (right, y)] for y in ys]
+    return LineCollection(segments, colors=edgecolor, linewidths=linewidth, zorder=2)
+
+
+def draw_grid_raster(ax, data, geometry, cmap, norm, alpha=0.7, edgecolor='gray', linewidth=0.5):
+    """0이 아닌 격자를 이미지 하나로 그리고 격자선을 덧그림 (0과 NaN 은 투명).
+    0번 행이 북쪽이므로 origin='upper'. 축 범위와 비율은 GeoDataFrame.plot 과 같게 맞춤"""
+    values = np.ma.masked_where(np.ma.getdata(data) == 0, np.ma.masked_invalid(data))
+    image = ax.imshow(values, cmap=cmap, norm=norm, alpha=alpha, extent=geometry.extent, origin='upper',
+                      interpolation='nearest', zorder=1)
+    lines = ax.add_collection(grid_lines(geometry, edgecolor, linewidth))
+    left, right, bottom, top = geometry.extent
+    dx, dy = (right - left) * MAP_MARGIN, (top - bottom) * MAP_MARGIN
+    ax.set_xlim(left - dx, right + dx)
+    ax.set_ylim(bottom - dy, top + dy)
+    ax.set_aspect('equal')
+    return image, lines
+
+
+def visualize_grid_raster(data, geometry, colors, title, data_type, global_min, global_max, basemap=True):
+    """visualize_grid (polygon) 와 같은 지도를 이미지 하나로 그림. basemap 은 add_basemap 참고.
+    반환: (fig, ax), 모두 NaN 이면 (None, None)"""
+    data = np.ma.masked_invalid(data)
+    if np.all(data.mask):
+        print(f"Skipping frame: All data is invalid")
+        return None, None
+
+    min_conc, max_conc = concentration_range(data, data_type, global_min, global_max)
+    cmap, norm = concentration_norm(data_type, colors, min_conc, max_conc)
+
+    fig, ax = plt.subplots(figsize=(12, 10), constrained_layout=True)
+    draw_grid_raster(ax, data, geometry, cmap, norm)
+    add_basemap(ax, geometry, basemap)
+    add_colorbar(fig, ax, cmap, norm, data_type, colors, min_conc, max_conc)
+    set_map_axes(ax, geometry, title)
+    return fig, ax
+
+
+class FrameSequenceRenderer:
+    """물질/매체 하나의 프레임 지도를 그림 하나로 이어서 그림 (raster 방식).
+    그림, 배경 지도, 격자선, 색상 막대, cmap/norm 은 처음에 한 번만 만들고 프레임마다 자료와 제목만 바꿔 저장.
+    배치 (constrained_layout) 와 저장 범위 (bbox_inches='tight') 는 첫 프레임에서 한 번 계산해 고정하므로
+    모든 프레임의 이미지 크기가 같음. 결과는 visualize_grid_raster + savefig(dpi, bbox_inches='tight') 와 같음
+    (Air 는 프레임마다 색상 막대 눈금 글자가 바뀌므로 프레임별 저장보다 폭이 몇 화소 다를 수 있음)"""
+
+    def __init__(self, geometry, colors, data_type, global_min=None, global_max=None, basemap=True, dpi=300):
+        self.geometry = geometry
+        self.colors = colors
+        self.data_type = data_type
+        self.global_min, self.global_max = global_min, global_max
+        self.dpi = dpi
+        self.bbox = None
+
+        self.range = concentration_range(np.zeros(0), data_type, global_min, global_max)
+        self.cmap, norm = concentration_norm(data_type, colors, *self.range)
+        self.fig, self.ax = plt.subplots(figsize=(12, 10), dpi=dpi, constrained_layout=True)
+        try:
+            self.image, _ = draw_grid_raster(self.ax, np.zeros(geometry.shape), geometry, self.cmap, norm)
+            add_basemap(self.ax, geometry, basemap)
+            self.cbar = add_colorbar(self.fig, self.ax, self.cmap, norm, data_type, colors, *self.range)
+            set_map_axes(self.ax, geometry, '')
+        except Exception:
+            # with 문에 들어가기 전이므로 여기서 그림을 닫음
+            plt.close(self.fig)
+            raise
+
+    def update(self, data, title):
+        """자료와 제목만 교체. 모두 NaN 이면 False (그리지 않음)"""
+        data = np.ma.masked_invalid(data)
+        if np.all(data.mask):
+            print(f"Skipping frame: All data is invalid")
+            return False
+        frame_range = concentration_range(data, self.data_type, self.global_min, self.global_max)
+        if frame_range != self.range:
+            # Air 는 프레임마다 범위가 바뀜: norm 과 색상 막대 눈금만 새로
+            self.range = frame_range
+            _, norm = concentration_norm(self.data_type, self.colors, *frame_range)
+            self.image.set_norm(norm)
+            self.cbar.mappable.set_norm(norm)
+            set_colorbar_ticks(self.cbar, self.data_type, self.colors, *frame_range)
+        self.image.set_data(np.ma.masked_where(np.ma.getdata(data) == 0, data))
+        self.ax.set_title(title)
+        return True
+
+    def _fix_layout(self):
+        """첫 프레임에서 배치와 저장 범위를 한 번 계산하고 고정"""
+        if self.bbox is None:
+            self.fig.canvas.draw()
+            self.bbox = self.fig.get_tightbbox().padded(plt.rcParams['savefig.pad_inches'])
+            self.fig.set_layout_engine('none')
+
+    def save(self, path):
+        self._fix_layout()
+        self.fig.savefig(path, dpi=self.dpi, bbox_inches=self.bbox)
+
+    def to_rgb(self):
+        """현재 프레임을 저장 범위의 (높이, 폭, 3) uint8 화소로 (PNG 인코딩 없이 그림 화면을 잘라냄).
+        저장 범위를 화소 경계로 넓혀 자르므로 save 결과와 크기가 1~2 화소, 위치가 1 화소 미만 다를 수 있음"""
+        self._fix_layout()
+        self.fig.canvas.draw()
+        rgba = np.asarray(self.fig.canvas.buffer_rgba())
+        height, width = rgba.shape[:2]
+        x0, y0 = np.floor(self.bbox.p0 * self.dpi).astype(int)
+        x1, y1 = np.ceil(self.bbox.p1 * self.dpi).astype(int)
+        # 저장 범위가 그림 밖으로 나간 부분은 savefig 처럼 배경색
+        background = np.rint(np.array(to_rgb(self.fig.get_facecolor())) * 255).astype(np.uint8)
+        rgb = np.empty((y1 - y0, x1 - x0, 3), dtype=np.uint8)
+        rgb[:] = background
+        top = height - y1
+        r0, r1 = max(top, 0), min(height - y0, height)
+        c0, c1 = max(x0, 0), min(x1, width)
+        rgb[r0 - top:r1 - top, c0 - x0:c1 - x0] = rgba[r0:r1, c0:c1, :3]
+        return rgb
+
+    def render(self, data, title, path):
+        """update 후 저장. 그렸으면 True"""
+        if not self.update(data, title):
+            return False
+        self.save(path)
+        return True
+
+    def close(self):
+        plt.close(self.fig)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
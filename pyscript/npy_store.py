@@ -0,0 +1,140 @@
+import os
+import json
+import numpy as np
+import h5py
+
+from hdf5_store import (MEDIA, CUBE_DATASET, TIME_DATASET, DEFAULT_CODEC, cube_chunks, codec_options, open_hdf5,
+                        frame_count, frame_timestamps, frame_times, iter_frames)
+from grid_geometry import DEFAULT_GEOMETRY, read_geometry, write_geometry
+
+
+def _sidecar_path(npy_path):
+    return os.path.splitext(npy_path)[0] + '.json'
+
+
+class NpyCube:
+    """매체 하나의 (시간, 행, 열) raw .npy 큐브와 JSON 부가 정보 (timestamp, 시간 좌표, 격자 위치).
+    np.memmap 으로 열기 때문에 프레임 슬라이스는 복사 없는 view. hdf5_store 읽기 함수에 그룹 대신 넘길 수 있음"""
+
+    def __init__(self, npy_path, mode='r'):
+        with open(_sidecar_path(npy_path), encoding='utf-8') as f:
+            meta = json.load(f)
+        self.path = npy_path
+        self.medium = meta['medium']
+        self.timestamps = meta['timestamps']
+        self.time = np.array(meta['time'], dtype=np.float64)
+        self.time_units = meta['time_units']
+        self.geometry = meta['geometry']
+        self.data = np.load(npy_path, mmap_mode=mode)
+
+    def frame_count(self):
+        return self.data.shape[0]
+
+    def close(self):
+        mm = getattr(self.data, '_mmap', None)
+        self.data = None
+        if mm is not None:
+            mm.close()
+
+
+class NpyStore(dict):
+    """물질 하나의 npy 폴더 ({medium: NpyCube}). h5py.File 처럼 with 문으로 사용"""
+
+    def __init__(self, folder, mode='r'):
+        super().__init__()
+        self.folder = folder
+        for medium in MEDIA:
+            npy_path = os.path.join(folder, f"{medium}.npy")
+            if os.path.exists(npy_path):
+                self[medium] = NpyCube(npy_path, mode)
+
+    def close(self):
+        for cube in self.values():
+            cube.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_npy_store(folder, mode='r'):
+    return NpyStore(folder, mode)
+
+
+def write_npy_cube(npy_path, source, medium, geometry=None):
+    """그룹(HDF5 세 방식 또는 NpyCube)의 프레임을 raw .npy 큐브와 JSON 파일로 저장 (geometry: GridGeometry).
+    자료형은 저장된 프레임 그대로 (float32 로 변환한 저장소는 float32 큐브)"""
+    geometry = geometry or DEFAULT_GEOMETRY
+    n_frames = frame_count(source)
+    time, time_units = frame_times(source)
+    first = next(iter_frames(source), None)
+    if first is not None:
+        shape, dtype = (n_frames,) + first[2].shape, first[2].dtype
+    else:
+        shape, dtype = (n_frames,) + geometry.shape, np.dtype(np.float64)
+
+    # 다 쓴 뒤에 이름을 바꿔서, 읽는 쪽이 쓰는 도중의 파일을 열지 않도록 함
+    tmp_path = npy_path + '.tmp'
+    cube = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=dtype, shape=shape)
+    for i, _, data in iter_frames(source):
+        cube[i] = data
+    cube.flush()
+    del cube
+
+    meta = {
+        'medium': medium,
+        'shape': list(shape),
+        'dtype': dtype.name,
+        'timestamps': frame_timestamps(source),
+        'time': [None if np.isnan(t) else float(t) for t in time],
+        'time_units': time_units,
+        'geometry': geometry.to_dict(),
+    }
+    with open(_sidecar_path(npy_path) + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, npy_path)
+    os.replace(_sidecar_path(npy_path) + '.tmp', _sidecar_path(npy_path))
+
+
+def export_to_npy(hdf5_file, output_folder, geometry=None):
+    """ConcentrationNN.h5 를 npy 폴더 ConcentrationNN/{Air,Soil}.npy(.json) 으로 내보내기.
+    geometry 가 없으면 HDF5 파일에 기록된 격자 정보를 그대로 옮김"""
+    os.makedirs(output_folder, exist_ok=True)
+    with open_hdf5(hdf5_file) as hf:
+        geometry = geometry or read_geometry(hf)
+        for medium in MEDIA:
+            if medium not in hf:
+                continue
+            write_npy_cube(os.path.join(output_folder, f"{medium}.npy"), hf[medium], medium, geometry)
+
+
+def import_from_npy(npy_folder, hdf5_file, layout='cube', codec=DEFAULT_CODEC):
+    """npy 폴더를 HDF5 로 되돌리기 (layout: 'cube' 또는 'frames'). 원본 .TXT 가 없으므로 manifest 는 만들지 않음"""
+    with open_npy_store(npy_folder) as store, h5py.File(hdf5_file, 'w') as hf:
+        write_geometry(hf, read_geometry(store))
+        for medium, cube in store.items():
+            group = hf.create_group(medium)
+            if layout == 'cube':
+                # 프레임이 없는 큐브도 열 수 있도록, 공간 크기가 0이면 (예전 파일) 청크 크기를 h5py 에 맡김
+                chunks = cube_chunks(cube.frame_count()) if all(cube.data.shape[1:]) else True
+                group.create_dataset(CUBE_DATASET, data=cube.data, chunks=chunks,
+                                     maxshape=(None,) + cube.data.shape[1:], **codec_options(codec))
+                group.create_dataset(TIME_DATASET, data=cube.time, maxshape=(None,), chunks=(1024,))
+                group[TIME_DATASET].attrs['units'] = cube.time_units
+            else:
+                for i, timestamp, data in iter_frames(cube):
+                    key = f"frame_{i:03d}"
+                    group.create_dataset(key, data=data, **codec_options(codec))
+                    group[key].attrs['timestamp'] = timestamp
+
+
+if __name__ == "__main__":
+    hdf5_folder = r"C:\CAM_test_analysis\hdf5_data"
+    npy_folder = r"C:\CAM_test_analysis\npy_data"
+    for folder_number in range(26, 42):
+        hdf5_file = os.path.join(hdf5_folder, f"Concentration{folder_number}.h5")
+        if os.path.exists(hdf5_file):
+            export_to_npy(hdf5_file, os.path.join(npy_folder, f"Concentration{folder_number}"))
+            print(f"Exported {hdf5_file}")
@@ -0,0 +1,164 @@
+import os
+
+import numpy as np
+import pandas as pd
+import h5py
+
+from hdf5_store import (MEDIA, HOURLY_TIME_UNITS, frame_count, frame_times, iter_frame_blocks,
+                        open_frames, frame_store_path, derived_store_path)
+from grid_reader import EPOCH
+from grid_geometry import DEFAULT_GEOMETRY, read_geometry
+from polar_zones import read_wind
+
+# 프레임별 plume 요약. 좌표는 시각화 스크립트와 같은 EPSG:5186 (m), 0번 행이 북쪽.
+# orientation 은 주축의 방위각 (북쪽 0°, 시계 방향, 0~180°), bbox 는 0이 아닌 격자의 행/열 범위 (끝 포함, 없으면 -1)
+MOMENT_DTYPE = np.dtype([
+    ('time', np.float64),
+    ('mass', np.float64),
+    ('n_cells', np.int32),
+    ('centroid_x', np.float64),
+    ('centroid_y', np.float64),
+    ('sigma_major', np.float64),
+    ('sigma_minor', np.float64),
+    ('orientation', np.float64),
+    ('row0', np.int16),
+    ('col0', np.int16),
+    ('row1', np.int16),
+    ('col1', np.int16),
+])
+
+
+def _first_last(mask):
+    """(시간, n) bool 배열에서 True 인 첫 번호와 마지막 번호. 없으면 -1"""
+    found = mask.any(axis=1)
+    first = np.where(found, mask.argmax(axis=1), -1)
+    last = np.where(found, mask.shape[1] - 1 - mask[:, ::-1].argmax(axis=1), -1)
+    return first, last
+
+
+def plume_moments_block(block, times, geometry=None):
+    """(시간, 행, 열) 블록의 프레임별 질량, 중심, 2차 모멘트, 방향, bbox 를 한 번에 계산.
+    음수와 NaN 은 0으로 봄. 질량은 농도 x 면적 (ring_stats 의 'mass' 와 같은 단위)"""
+    geometry = geometry or DEFAULT_GEOMETRY
+    weights = np.nan_to_num(np.asarray(block, dtype=np.float64), nan=0.0)
+    np.maximum(weights, 0, out=weights)
+    if weights.shape[1:] != geometry.shape:
+        raise ValueError(f"격자 크기가 다릅니다: {weights.shape[1:]} != {geometry.shape}")
+    x, y = geometry.cell_centers()
+    # 격자 중앙 기준 좌표로 계산해 큰 좌표값의 제곱에서 생기는 자릿수 손실을 피함
+    x0, y0 = x.mean(), y.mean()
+    dx, dy = x - x0, y - y0
+
+    col_sums = weights.sum(axis=1)     # (시간, 열)
+    row_sums = weights.sum(axis=2)     # (시간, 행)
+    total = col_sums.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mx = col_sums @ dx / total
+        my = row_sums @ dy / total
+        cxx = col_sums @ dx ** 2 / total - mx ** 2
+        cyy = row_sums @ dy ** 2 / total - my ** 2
+        cxy = np.einsum('trc,r,c->t', weights, dy, dx) / total - mx * my
+    half_trace = (cxx + cyy) / 2
+    radius = np.sqrt(((cxx - cyy) / 2) ** 2 + cxy ** 2)
+    angle = 0.5 * np.arctan2(2 * cxy, cxx - cyy)    # 동쪽에서 반시계 방향 (rad)
+
+    row0, row1 = _first_last(row_sums > 0)
+    col0, col1 = _first_last(col_sums > 0)
+    table = np.zeros(len(weights), dtype=MOMENT_DTYPE)
+    table['time'] = times
+    table['mass'] = total * geometry.cell_size ** 2
+    table['n_cells'] = (weights > 0).sum(axis=(1, 2))
+    table['centroid_x'] = mx + x0
+    table['centroid_y'] = my + y0
+    table['sigma_major'] = np.sqrt(np.maximum(half_trace + radius, 0))
+    table['sigma_minor'] = np.sqrt(np.maximum(half_trace - radius, 0))
+    table['orientation'] = (90 - np.degrees(angle)) % 180
+    table['row0'], table['row1'], table['col0'], table['col1'] = row0, row1, col0, col1
+    empty = total <= 0
+    for name in ('centroid_x', 'centroid_y', 'sigma_major', 'sigma_minor', 'orientation'):
+        table[name][empty] = np.nan
+    return table
+
+
+def plume_moments(group, geometry=None, block_size=64):
+    """저장된 물질/매체 하나의 프레임별 plume 요약 표 (MOMENT_DTYPE). 블록 단위로 읽음"""
+    times, _ = frame_times(group)
+    table = np.zeros(frame_count(group), dtype=MOMENT_DTYPE)
+    for start, block in iter_frame_blocks(group, block_size):
+        table[start:start + len(block)] = plume_moments_block(block, times[start:start + len(block)], geometry)
+    return table
+
+
+def plume_file_path(frames_folder, folder_number):
+    return derived_store_path(frames_folder, folder_number, 'plume', 'plume')
+
+
+def save_plume_moments(frames_folder, folder_number, geometry=None):
+    """물질 하나의 매체별 plume 요약 표를 frames_folder/plume/ConcentrationNN_plume.h5 에 저장.
+    geometry 가 없으면 저장 파일에 기록된 격자 정보"""
+    with open_frames(frame_store_path(frames_folder, folder_number)) as store, \
+            h5py.File(plume_file_path(frames_folder, folder_number), 'w') as out:
+        geometry = geometry or read_geometry(store)
+        geometry.to_attrs(out.attrs)
+        for medium in MEDIA:
+            if medium not in store:
+                continue
+            table = plume_moments(store[medium], geometry)
+            ds = out.create_dataset(medium, data=table)
+            ds.attrs['time_units'] = frame_times(store[medium])[1]
+            print(f"Concentration{folder_number} {medium}: {len(table)}개 프레임")
+
+
+def read_plume_moments(plume_file, medium):
+    """저장된 plume 요약 표를 DataFrame 으로 (시간 단위는 df.attrs['time_units'])"""
+    with h5py.File(plume_file, 'r') as f:
+        df = pd.DataFrame(f[medium][()])
+        df.attrs['time_units'] = f[medium].attrs['time_units']
+    return df
+
+
+def track_velocity(df):
+    """연속한 프레임 사이 중심 이동 속도 (m/s) 와 이동 방위 (북쪽 0°, 시계 방향). 첫 행은 NaN"""
+    seconds = df['time'].diff() * 60
+    dx, dy = df['centroid_x'].diff(), df['centroid_y'].diff()
+    result = df[['time']].copy()
+    result['track_speed'] = np.sqrt(dx ** 2 + dy ** 2) / seconds
+    result['track_direction'] = (np.degrees(np.arctan2(dx, dy)) + 360) % 360
+    return result
+
+
+def compare_with_wind(df, met_file):
+    """1시간 간격 plume 중심 이동 속도/방위와 met_data.xlsx 의 풍속/풍하 방위 비교.
+    방위 차이는 -180~180° (양수면 중심이 바람보다 시계 방향으로 치우쳐 이동)"""
+    if df.attrs.get('time_units') != HOURLY_TIME_UNITS:
+        raise ValueError(f"1시간 간격 자료만 기상 자료와 맞출 수 있습니다 (시간 단위 {df.attrs.get('time_units')})")
+    track = track_velocity(df)
+    track['time'] = [EPOCH + pd.Timedelta(minutes=round(t)) for t in track['time']]
+    wind = read_wind(met_file)[['time', 'wind_speed', 'downwind_direction']]
+    merged = track.merge(wind, on='time', how='left')
+    merged['speed_ratio'] = merged['track_speed'] / merged['wind_speed']
+    merged['direction_difference'] = (merged['track_direction'] - merged['downwind_direction'] + 180) % 360 - 180
+    return merged
+
+
+def plot_plume_track(ax, df, color='black', **kwargs):
+    """지도 축에 중심 이동 경로 표시 (시각화 스크립트와 같은 좌표계)"""
+    valid = df['centroid_x'].notna()
+    ax.plot(df.loc[valid, 'centroid_x'], df.loc[valid, 'centroid_y'], '-o', color=color, markersize=3, **kwargs)
+    return ax
+
+
+if __name__ == "__main__":
+    hdf5_folder = r"C:\CAM_test_analysis\hdf5_data"
+    output_path = r"C:\CAM_test_analysis\output"
+    met_file = r"C:\CAM_test_analysis\input\met_data.xlsx"
+
+    for folder_number in range(26, 42):
+        if not os.path.exists(frame_store_path(hdf5_folder, folder_number)):
+            continue
+        save_plume_moments(hdf5_folder, folder_number)
+        df = read_plume_moments(plume_file_path(hdf5_folder, folder_number), 'Air')
+        comparison = compare_with_wind(df, met_file)
+        output_file = os.path.join(output_path, f"plume_track_Concentration{folder_number}.csv")
+        comparison.to_csv(output_file, index=False, encoding='utf-8-sig')
+        print(f"plume 이동/풍속 비교가 '{output_file}' 파일로 저장되었습니다.")
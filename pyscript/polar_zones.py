@@ -0,0 +1,138 @@
+import os
+from functools import lru_cache
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from hdf5_store import HOURLY_TIME_UNITS, frame_count, frame_times, iter_frame_blocks, open_frames, frame_store_path
+from grid_reader import EPOCH
+from ring_stats import DISTANCE_RANGES, CENTER, CELL_SIZE, ZoneIndex, ring_labels
+from grid_geometry import read_geometry
+
+N_SECTORS = 16
+COMPASS_16 = ['N', 'NNE', 'NE', 'ENE', 'E', 'ESE', 'SE', 'SSE', 'S', 'SSW', 'SW', 'WSW', 'W', 'WNW', 'NW', 'NNW']
+
+
+def sector_names(n_sectors=N_SECTORS):
+    """방위 구역 이름 (16개면 N, NNE, ..., 아니면 구역 중심 방위각)"""
+    if n_sectors == 16:
+        return list(COMPASS_16)
+    return [f"{k * 360 / n_sectors:g}°" for k in range(n_sectors)]
+
+
+def bearing_to_sector(bearing, n_sectors=N_SECTORS):
+    """방위각 (북쪽 0°, 시계 방향) 을 구역 번호로. 구역 0 은 북쪽을 중심으로 ±(360/n/2)°"""
+    width = 360 / n_sectors
+    return (np.floor((np.asarray(bearing) % 360 + width / 2) / width).astype(int)) % n_sectors
+
+
+def sector_labels(shape, center=CENTER, n_sectors=N_SECTORS):
+    """격자별 방위 구역 번호. 0번 행이 북쪽 (시각화 스크립트와 같은 방향), 열 번호가 커지면 동쪽"""
+    rows, cols = np.indices(shape)
+    bearing = np.degrees(np.arctan2(cols - center[1], center[0] - rows))
+    return bearing_to_sector(bearing, n_sectors)
+
+
+@lru_cache(maxsize=None)
+def _polar_index(shape, center, cell_size, distance_ranges, n_sectors):
+    rings = ring_labels(shape, center, cell_size, distance_ranges)
+    labels = np.where(rings >= 0, rings * n_sectors + sector_labels(shape, center, n_sectors), -1)
+    return ZoneIndex(labels, len(distance_ranges) * n_sectors)
+
+
+def polar_index(shape, center=CENTER, cell_size=CELL_SIZE, distance_ranges=DISTANCE_RANGES, n_sectors=N_SECTORS):
+    """거리 구간 x 방위 구역 번호 (ring * n_sectors + sector). 격자 위치마다 한 번만 만들어 재사용"""
+    return _polar_index(tuple(shape), tuple(center), cell_size, tuple(tuple(r) for r in distance_ranges), n_sectors)
+
+
+def polar_stats(data, distance_ranges=DISTANCE_RANGES, n_sectors=N_SECTORS, center=CENTER, cell_size=CELL_SIZE):
+    """구간 x 방위 구역별 최대, 평균, 최대 위치. data: (행, 열) 또는 (시간, 행, 열).
+    반환: {'max', 'mean', 'argmax'} 각각 (..., 구간, 방위) 배열. argmax 는 1차원 격자 번호 (없으면 -1)"""
+    index = polar_index(np.shape(data)[-2:], center, cell_size, distance_ranges, n_sectors)
+    values = index.gather(data)
+    peak = index.reduce(np.maximum, values)
+    total = index.reduce(np.add, values)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / index.counts
+    shape = peak.shape[:-1] + (len(distance_ranges), n_sectors)
+    return {
+        'max': peak.reshape(shape),
+        'mean': mean.reshape(shape),
+        'argmax': index.argmax(values, peak).reshape(shape),
+    }
+
+
+def polar_stats_series(group, distance_ranges=DISTANCE_RANGES, n_sectors=N_SECTORS, center=CENTER,
+                       cell_size=CELL_SIZE, block_size=64):
+    """저장된 물질/매체 하나 전체의 (시간, 구간, 방위) 통계. 블록 단위로 읽어 메모리 사용 제한"""
+    n_frames = frame_count(group)
+    shape = (n_frames, len(distance_ranges), n_sectors)
+    result = {'max': np.full(shape, np.nan), 'mean': np.full(shape, np.nan), 'argmax': np.full(shape, -1, np.intp)}
+    for start, block in iter_frame_blocks(group, block_size):
+        stats = polar_stats(block, distance_ranges, n_sectors, center, cell_size)
+        for name, values in stats.items():
+            result[name][start:start + len(block)] = values
+    return result
+
+
+def read_wind(met_file, n_sectors=N_SECTORS):
+    """met_data.xlsx 의 시각별 풍향 (바람이 불어오는 방위) 과 풍하 방위 구역 (바람이 불어가는 쪽)"""
+    df = pd.read_excel(met_file, header=0)
+    df['time'] = pd.to_datetime(df[['year', 'month', 'day', 'hour']])
+    df['wind_speed'] = np.sqrt(df['windX'] ** 2 + df['windY'] ** 2)
+    df['wind_direction'] = (np.arctan2(-df['windX'], -df['windY']) * 180 / np.pi + 360) % 360
+    df['downwind_direction'] = (df['wind_direction'] + 180) % 360
+    df['downwind_sector'] = bearing_to_sector(df['downwind_direction'], n_sectors)
+    return df[['time', 'wind_speed', 'wind_direction', 'downwind_direction', 'downwind_sector']]
+
+
+def downwind_report(group, met_file, distance_ranges=DISTANCE_RANGES, n_sectors=N_SECTORS, stats=None, geometry=None):
+    """1시간 간격 프레임마다 풍하 방위 구역의 구간별 최대 농도와, 실제로 최대 농도가 나타난 방위 구역.
+    stats: 이미 계산한 polar_stats_series 결과 (없으면 계산). 풍향은 같은 시각의 met_data 행을 사용.
+    geometry: 배출원 위치와 격자 크기 (grid_geometry.GridGeometry, 없으면 기본 격자)"""
+    times, units = frame_times(group)
+    if units != HOURLY_TIME_UNITS:
+        raise ValueError(f"{group.name}: 1시간 간격 자료만 기상 자료와 맞출 수 있습니다 (시간 단위 {units})")
+    if stats is None:
+        center, cell_size = (geometry.source, geometry.cell_size) if geometry else (CENTER, CELL_SIZE)
+        stats = polar_stats_series(group, distance_ranges, n_sectors, center, cell_size)
+    wind = read_wind(met_file, n_sectors).set_index('time')
+    names = sector_names(n_sectors)
+
+    rows = []
+    for i, value in enumerate(times):
+        if np.isnan(value):
+            continue
+        time = EPOCH + timedelta(minutes=round(value))
+        if pd.Timestamp(time) not in wind.index:
+            continue
+        met = wind.loc[pd.Timestamp(time)]
+        sector = int(met['downwind_sector'])
+        peak = stats['max'][i]
+        row = {'time': time, 'wind_direction': met['wind_direction'], 'downwind_sector': names[sector]}
+        for k, (start, end) in enumerate(distance_ranges):
+            ring_peak = peak[k]
+            row[f'{start}m-{end}m downwind max'] = ring_peak[sector]
+            row[f'{start}m-{end}m peak sector'] = (names[int(np.nanargmax(ring_peak))]
+                                                  if np.isfinite(ring_peak).any() and np.nanmax(ring_peak) > 0 else '')
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    hdf5_folder = r"C:\CAM_test_analysis\hdf5_data"
+    output_path = r"C:\CAM_test_analysis\output"
+    met_file = r"C:\CAM_test_analysis\input\met_data.xlsx"
+
+    for folder_number in range(26, 42):
+        store_path = frame_store_path(hdf5_folder, folder_number)
+        if not os.path.exists(store_path):
+            continue
+        with open_frames(store_path) as store:
+            if 'Air' not in store:
+                continue
+            report = downwind_report(store['Air'], met_file, geometry=read_geometry(store))
+        output_file = os.path.join(output_path, f"downwind_sector_Concentration{folder_number}.csv")
+        report.to_csv(output_file, index=False, encoding='utf-8-sig')
+        print(f"풍하 방위 보고서가 '{output_file}' 파일로 저장되었습니다.")
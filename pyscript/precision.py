@@ -0,0 +1,100 @@
+import numpy as np
+
+# 그룹 속성에 저장하는 감사 결과 이름
+AUDIT_ATTRS = ('audit_dtype', 'audit_values', 'audit_nonzero', 'audit_max_abs_error', 'audit_max_rel_error',
+               'audit_underflow', 'audit_subnormal', 'audit_overflow', 'audit_min_nonzero')
+
+
+class PrecisionStats:
+    """float64 원본을 더 작은 자료형으로 저장할 때의 오차 집계"""
+
+    def __init__(self, dtype):
+        self.dtype = np.dtype(dtype)
+        self.values = 0
+        self.nonzero = 0
+        self.max_abs_error = 0.0
+        self.max_rel_error = 0.0
+        self.underflow = 0     # 0이 아닌 값이 0으로 저장된 개수
+        self.subnormal = 0     # 비정규수로 저장되어 유효숫자를 잃은 개수 (상대오차가 커짐)
+        self.overflow = 0      # 유한한 값이 inf로 저장된 개수
+        self.min_nonzero = np.inf
+
+    def update(self, original, stored):
+        original = np.asarray(original, dtype=np.float64)
+        restored = np.asarray(stored, dtype=np.float64)
+        finite = np.isfinite(original)
+        nonzero = finite & (original != 0)
+        overflow = finite & ~np.isfinite(restored)
+        self.values += original.size
+        self.nonzero += int(nonzero.sum())
+        self.overflow += int(overflow.sum())
+        self.underflow += int((nonzero & (restored == 0)).sum())
+        tiny = np.finfo(self.dtype).tiny
+        self.subnormal += int((nonzero & (restored != 0) & (np.abs(restored) < tiny)).sum())
+
+        ok = finite & ~overflow
+        if ok.any():
+            error = np.abs(restored[ok] - original[ok])
+            self.max_abs_error = max(self.max_abs_error, float(error.max()))
+        ok_nonzero = nonzero & ~overflow
+        if ok_nonzero.any():
+            magnitude = np.abs(original[ok_nonzero])
+            rel = np.abs(restored[ok_nonzero] - original[ok_nonzero]) / magnitude
+            self.max_rel_error = max(self.max_rel_error, float(rel.max()))
+            self.min_nonzero = min(self.min_nonzero, float(magnitude.min()))
+
+    def merge(self, other):
+        self.values += other.values
+        self.nonzero += other.nonzero
+        self.max_abs_error = max(self.max_abs_error, other.max_abs_error)
+        self.max_rel_error = max(self.max_rel_error, other.max_rel_error)
+        self.underflow += other.underflow
+        self.subnormal += other.subnormal
+        self.overflow += other.overflow
+        self.min_nonzero = min(self.min_nonzero, other.min_nonzero)
+
+    @property
+    def trustworthy(self):
+        """0으로 사라지거나 inf가 된 값이 없으면 True"""
+        return self.underflow == 0 and self.overflow == 0
+
+    def to_attrs(self, attrs):
+        attrs['audit_dtype'] = self.dtype.name
+        for name in AUDIT_ATTRS[1:]:
+            attrs[name] = getattr(self, name[len('audit_'):])
+
+    @classmethod
+    def from_attrs(cls, attrs):
+        """속성이 없으면 None"""
+        if 'audit_dtype' not in attrs:
+            return None
+        stats = cls(attrs['audit_dtype'])
+        for name in AUDIT_ATTRS[1:]:
+            if name in attrs:
+                setattr(stats, name[len('audit_'):], attrs[name].item())
+        return stats
+
+    def summary(self):
+        flag = '' if self.trustworthy else '  <-- 확인 필요'
+        return (f"{self.dtype.name}: 최대 절대오차 {self.max_abs_error:.3e}, 최대 상대오차 {self.max_rel_error:.3e}, "
+                f"0으로 사라진 값 {self.underflow}개, 비정규수 {self.subnormal}개, inf {self.overflow}개 "
+                f"(0이 아닌 값 {self.nonzero}/{self.values}개, 최소 {self.min_nonzero:.3e}){flag}")
+
+
+def cast_frame(data, dtype, stats=None, check=None):
+    """격자를 저장 자료형으로 변환. stats가 있으면 오차 집계.
+    check: 0이 아닌 값이 0이 되거나 inf가 되면 ValueError (기본: float16일 때만)"""
+    dtype = np.dtype(dtype)
+    if dtype == data.dtype:
+        return data
+    with np.errstate(over='ignore'):
+        stored = data.astype(dtype)
+    frame_stats = PrecisionStats(dtype)
+    frame_stats.update(data, stored)
+    if check is None:
+        check = dtype == np.float16
+    if check and not frame_stats.trustworthy:
+        raise ValueError(f"{dtype.name}로 저장할 수 없습니다: {frame_stats.summary()}")
+    if stats is not None:
+        stats.merge(frame_stats)
+    return stored
@@ -0,0 +1,63 @@
+import os
+import sys
+import glob
+import numpy as np
+
+from hdf5_store import MEDIA, iter_frames, open_hdf5
+from precision import PrecisionStats
+
+
+def audit_hdf5(hdf5_folder, dtypes=(np.float32, np.float16)):
+    """float64 로 저장된 Concentration*.h5 를 각 dtype 으로 저장했을 때의 오차를 물질/매체별로 보고.
+    반환: {(파일 이름, 매체, dtype 이름): PrecisionStats}"""
+    results = {}
+    paths = sorted(glob.glob(os.path.join(hdf5_folder, 'Concentration*.h5')))
+    if not paths:
+        print(f"HDF5 파일이 없습니다: {hdf5_folder}")
+        return results
+
+    for path in paths:
+        name = os.path.splitext(os.path.basename(path))[0]
+        with open_hdf5(path) as hf:
+            for medium in MEDIA:
+                if medium not in hf:
+                    continue
+                stats = [PrecisionStats(dtype) for dtype in dtypes]
+                for _, _, data in iter_frames(hf[medium]):
+                    for s in stats:
+                        with np.errstate(over='ignore'):
+                            s.update(data, data.astype(s.dtype))
+                for s in stats:
+                    results[(name, medium, s.dtype.name)] = s
+                    print(f"{name} {medium:<4} {s.summary()}")
+
+    for dtype in dtypes:
+        dtype = np.dtype(dtype)
+        total = PrecisionStats(dtype)
+        for (_, _, dtype_name), s in results.items():
+            if dtype_name == dtype.name:
+                total.merge(s)
+        if not total.trustworthy:
+            verdict = '사용 불가 (0으로 사라지거나 inf가 되는 값 있음)'
+        elif total.subnormal:
+            verdict = f'사용 가능 (단, {total.min_nonzero:.1e} 부근의 아주 작은 값은 상대오차 최대 {total.max_rel_error:.1e})'
+        else:
+            verdict = '사용 가능'
+        print(f"전체 {total.summary()} -> {verdict}")
+    return results
+
+
+def recorded_audit(hdf5_folder):
+    """float32/float16 으로 변환할 때 그룹 속성에 기록된 오차 보고"""
+    for path in sorted(glob.glob(os.path.join(hdf5_folder, 'Concentration*.h5'))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        with open_hdf5(path) as hf:
+            for medium in MEDIA:
+                stats = PrecisionStats.from_attrs(hf[medium].attrs) if medium in hf else None
+                if stats is not None:
+                    print(f"{name} {medium:<4} {stats.summary()}")
+
+
+if __name__ == "__main__":
+    hdf5_folder = sys.argv[1] if len(sys.argv) > 1 else r"C:\CAM_test_analysis\hdf5_data"
+    audit_hdf5(hdf5_folder)
@@ -0,0 +1,194 @@
+import re
+import warnings
+from functools import lru_cache
+
+import numpy as np
+
+from hdf5_store import frame_count, iter_frame_blocks
+from grid_geometry import DEFAULT_GEOMETRY
+
+# 5구간별 스크립트의 거리 구간 (미터), 중심 (75번째와 76번째 격자 사이), 격자 크기 (미터).
+# 다른 격자나 배출원 위치는 저장 파일의 grid_geometry.read_geometry 결과를 center, cell_size 로 넘김
+DISTANCE_RANGES = ((0, 500), (500, 1000), (1000, 3000), (3000, 5000), (5000, 7000))
+CENTER = DEFAULT_GEOMETRY.source
+CELL_SIZE = DEFAULT_GEOMETRY.cell_size
+
+
+def calculate_distance(x, y, center=CENTER, cell_size=CELL_SIZE):
+    """격자 위치로부터 중심까지의 거리 계산"""
+    return np.sqrt((x - center[0]) ** 2 + (y - center[1]) ** 2) * cell_size
+
+
+def ring_labels(shape, center=CENTER, cell_size=CELL_SIZE, distance_ranges=DISTANCE_RANGES):
+    """격자별 거리 구간 번호 (구간 밖은 -1)"""
+    distance = calculate_distance(*np.indices(shape), center, cell_size)
+    labels = np.full(shape, -1, dtype=np.int32)
+    for k, (start, end) in enumerate(distance_ranges):
+        mask = (distance >= start) & (distance < end)
+        if (labels[mask] >= 0).any():
+            raise ValueError(f"거리 구간이 겹칩니다: {distance_ranges}")
+        labels[mask] = k
+    return labels
+
+
+class ZoneIndex:
+    """격자별 구역 번호 (구역 밖은 -1) 와, 구역 순서로 정렬한 격자 번호.
+    프레임의 값을 order 순으로 꺼내면 구역별로 연속된 구간이 되어 reduceat 한 번으로 집계됨"""
+
+    def __init__(self, labels, n_zones):
+        flat = labels.ravel()
+        inside = np.flatnonzero(flat >= 0)
+        self.shape = labels.shape
+        self.labels = labels
+        self.order = inside[np.argsort(flat[inside], kind='stable')]
+        self.counts = np.bincount(flat[inside], minlength=n_zones)
+        self.starts = np.concatenate(([0], np.cumsum(self.counts)[:-1]))
+        self.labels.flags.writeable = False
+        self.order.flags.writeable = False
+
+    @property
+    def n_zones(self):
+        return self.counts.size
+
+    def gather(self, data):
+        """(..., 행, 열) 배열을 (..., 구역 안 격자 수) 로 구역 순서대로 꺼내기"""
+        data = np.asarray(data)
+        if data.shape[-2:] != self.shape:
+            raise ValueError(f"격자 크기가 다릅니다: {data.shape[-2:]} != {self.shape}")
+        return data.reshape(data.shape[:-2] + (-1,))[..., self.order]
+
+    def reduce(self, ufunc, values, empty=np.nan):
+        """gather 결과를 구역별로 ufunc.reduceat. 격자가 없는 구역은 empty"""
+        nonempty = self.counts > 0
+        out = np.full(values.shape[:-1] + (self.n_zones,), empty,
+                      dtype=np.result_type(values.dtype, np.asarray(empty).dtype))
+        if nonempty.any():
+            out[..., nonempty] = ufunc.reduceat(values, self.starts[nonempty], axis=-1)
+        return out
+
+    def argmax(self, values, peak):
+        """gather 결과에서 구역별 최대값(peak)이 처음 나오는 격자의 1차원 번호 (row * 열 수 + col). 없으면 -1"""
+        zone = np.repeat(np.arange(self.n_zones), self.counts)
+        position = np.where(values == peak[..., zone], np.arange(values.shape[-1]), values.shape[-1])
+        first = self.reduce(np.minimum, position, empty=values.shape[-1]).astype(np.intp)
+        found = first < values.shape[-1]
+        return np.where(found, self.order[np.where(found, first, 0)], -1)
+
+
+@lru_cache(maxsize=None)
+def _ring_index(shape, center, cell_size, distance_ranges):
+    return ZoneIndex(ring_labels(shape, center, cell_size, distance_ranges), len(distance_ranges))
+
+
+def ring_index(shape, center=CENTER, cell_size=CELL_SIZE, distance_ranges=DISTANCE_RANGES):
+    """격자 위치 (크기, 중심, 격자 크기, 거리 구간) 마다 한 번만 만들어 재사용"""
+    return _ring_index(tuple(shape), tuple(center), cell_size, tuple(tuple(r) for r in distance_ranges))
+
+
+def ring_max(data, distance_ranges=DISTANCE_RANGES, center=CENTER, cell_size=CELL_SIZE, positive_only=False):
+    """거리 구간별 최대 농도. data: (행, 열) 또는 (시간, 행, 열) -> (구간,) 또는 (시간, 구간).
+    positive_only: 0 이하 값은 제외하고, 0보다 큰 값이 없는 구간은 NaN (로그 스케일 그래프용)"""
+    index = ring_index(np.shape(data)[-2:], center, cell_size, distance_ranges)
+    values = index.gather(data)
+    return _positive_max(index, values) if positive_only else index.reduce(np.maximum, values)
+
+
+def _positive_max(index, values):
+    result = index.reduce(np.maximum, np.where(values > 0, values, -np.inf))
+    result[result == -np.inf] = np.nan
+    return result
+
+
+def ring_max_series(group, distance_ranges=DISTANCE_RANGES, center=CENTER, cell_size=CELL_SIZE, positive_only=False,
+                    block_size=64):
+    """저장된 물질/매체 하나 (HDF5 그룹 또는 NpyCube) 전체의 (시간, 구간) 최대 농도.
+    block_size 프레임씩 읽어 ring_max 한 번으로 계산하므로 메모리는 블록 크기만큼만 사용"""
+    n_frames = frame_count(group)
+    result = np.full((n_frames, len(distance_ranges)), np.nan)
+    for start, block in iter_frame_blocks(group, block_size):
+        result[start:start + len(block)] = ring_max(block, distance_ranges, center, cell_size, positive_only)
+    return result
+
+
+# ---- 구간별 통계 여러 개를 한 번에: 이름 -> 함수(index, 구역 순서로 꺼낸 값, 격자 면적) ----
+
+def _count_positive(index, values, cell_area):
+    return index.reduce(np.add, (values > 0).astype(np.int64), empty=0)
+
+
+def _mean(index, values, cell_area):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return index.reduce(np.add, values) / index.counts
+
+
+RING_STATISTICS = {
+    'max': lambda index, values, cell_area: index.reduce(np.maximum, values),
+    'positive_max': lambda index, values, cell_area: _positive_max(index, values),
+    'count_positive': _count_positive,
+    'area_positive': lambda index, values, cell_area: _count_positive(index, values, cell_area) * cell_area,
+    'mean': _mean,
+    'sum': lambda index, values, cell_area: index.reduce(np.add, values),
+    # 농도 x 면적 (농도 단위 x m^2). 면적 가중 적분으로, 지표/층 두께를 곱하면 질량
+    'mass': lambda index, values, cell_area: index.reduce(np.add, values) * cell_area,
+}
+# 'p95' 는 구간 안 모든 격자, 'positive_p95' 는 0보다 큰 격자만의 백분위수 (없으면 NaN)
+_PERCENTILE = re.compile(r'(positive_)?p(\d+(?:\.\d+)?)$')
+
+DEFAULT_STATISTICS = ('positive_max', 'max', 'count_positive', 'area_positive', 'mean', 'mass', 'positive_p50',
+                      'positive_p95')
+
+
+def _percentile(index, values, q, positive):
+    out = np.full(values.shape[:-1] + (index.n_zones,), np.nan)
+    for k, (start, count) in enumerate(zip(index.starts, index.counts)):
+        if count == 0:
+            continue
+        segment = values[..., start:start + count]
+        if not positive:
+            out[..., k] = np.percentile(segment, q, axis=-1)
+            continue
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # 0보다 큰 값이 없는 구간 (All-NaN slice)
+            out[..., k] = np.nanpercentile(np.where(segment > 0, segment, np.nan), q, axis=-1)
+    return out
+
+
+def check_statistics(statistics):
+    """통계 이름 확인 (모르는 이름이면 ValueError)"""
+    for name in statistics:
+        if name not in RING_STATISTICS and not _PERCENTILE.match(name):
+            raise ValueError(f"알 수 없는 통계: {name} (사용 가능: {', '.join(RING_STATISTICS)}, pNN, positive_pNN)")
+    return tuple(statistics)
+
+
+def ring_summary(data, statistics=DEFAULT_STATISTICS, distance_ranges=DISTANCE_RANGES, center=CENTER,
+                 cell_size=CELL_SIZE):
+    """거리 구간별 통계 여러 개. data: (행, 열) 또는 (시간, 행, 열).
+    반환: {통계 이름: (구간,) 또는 (시간, 구간) 배열}. 프레임 값은 한 번만 꺼내 모든 통계에 사용"""
+    index = ring_index(np.shape(data)[-2:], center, cell_size, distance_ranges)
+    values = index.gather(data)
+    cell_area = float(cell_size) ** 2
+    result = {}
+    for name in check_statistics(statistics):
+        if name in RING_STATISTICS:
+            result[name] = RING_STATISTICS[name](index, values, cell_area)
+        else:
+            match = _PERCENTILE.match(name)
+            result[name] = _percentile(index, values, float(match.group(2)), bool(match.group(1)))
+    return result
+
+
+def ring_summary_series(group, statistics=DEFAULT_STATISTICS, distance_ranges=DISTANCE_RANGES, center=CENTER,
+                        cell_size=CELL_SIZE, block_size=64):
+    """저장된 물질/매체 하나 전체의 {통계 이름: (시간, 구간)}. 프레임은 블록 단위로 한 번만 읽음"""
+    statistics = check_statistics(statistics)
+    n_frames = frame_count(group)
+    result = {}
+    for start, block in iter_frame_blocks(group, block_size):
+        for name, values in ring_summary(block, statistics, distance_ranges, center, cell_size).items():
+            if name not in result:
+                result[name] = np.zeros((n_frames, len(distance_ranges)), dtype=values.dtype)
+            result[name][start:start + len(block)] = values
+    for name in statistics:
+        result.setdefault(name, np.zeros((0, len(distance_ranges))))
+    return result
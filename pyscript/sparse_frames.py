@@ -0,0 +1,115 @@
+import numpy as np
+
+# bbox 기준 열 번호 dtype (uint8 이면 폭 256 이상인 bbox 에서 넘침)
+INDEX_DTYPE = np.uint16
+
+
+class SparseFrame:
+    """0이 아닌 격자만 담은 프레임: bounding box (행0, 열0, 행1, 열1, 끝은 포함하지 않음) 와
+    그 안의 CSR (행 포인터 indptr, bbox 기준 열 번호 indices, 값 values). 값은 원본 그대로 (무손실)"""
+
+    __slots__ = ('shape', 'bbox', 'indptr', 'indices', 'values')
+
+    def __init__(self, shape, bbox, indptr, indices, values):
+        self.shape = tuple(shape)
+        self.bbox = tuple(int(b) for b in bbox)
+        self.indptr = indptr
+        self.indices = indices
+        self.values = values
+
+    @classmethod
+    def from_dense(cls, data):
+        data = np.asarray(data)
+        rows = np.flatnonzero(data.any(axis=1))
+        if rows.size == 0:
+            return cls(data.shape, (0, 0, 0, 0), np.zeros(1, dtype=np.int32), np.zeros(0, dtype=INDEX_DTYPE),
+                       np.zeros(0, dtype=data.dtype))
+        cols = np.flatnonzero(data.any(axis=0))
+        r0, r1, c0, c1 = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+        window = data[r0:r1, c0:c1]
+        nz_rows, nz_cols = np.nonzero(window)
+        indptr = np.zeros(r1 - r0 + 1, dtype=np.int32)
+        np.cumsum(np.bincount(nz_rows, minlength=r1 - r0), out=indptr[1:])
+        return cls(data.shape, (r0, c0, r1, c1), indptr, nz_cols.astype(INDEX_DTYPE), window[nz_rows, nz_cols])
+
+    @property
+    def nnz(self):
+        return self.values.size
+
+    def rows(self):
+        """0이 아닌 값의 전체 격자 기준 행 번호"""
+        return np.repeat(np.arange(self.bbox[0], self.bbox[2]), np.diff(self.indptr))
+
+    def cols(self):
+        return self.indices.astype(np.intp) + self.bbox[1]
+
+    def flat_index(self):
+        """0이 아닌 값의 전체 격자 기준 1차원 번호 (row * 열 수 + col)"""
+        return self.rows() * self.shape[1] + self.cols()
+
+    def to_dense(self, out=None):
+        if out is None:
+            out = np.zeros(self.shape, dtype=self.values.dtype)
+        else:
+            out[...] = 0
+        out[self.rows(), self.cols()] = self.values
+        return out
+
+    def value_at(self, row, col):
+        r0, c0, r1, _ = self.bbox
+        if not r0 <= row < r1:
+            return 0.0
+        start, end = self.indptr[row - r0], self.indptr[row - r0 + 1]
+        pos = start + np.searchsorted(self.indices[start:end], col - c0)
+        if pos < end and self.indices[pos] == col - c0:
+            return self.values[pos]
+        return 0.0
+
+    def max(self):
+        """프레임 최대값 (0인 격자도 포함한 값과 같음)"""
+        if self.nnz == 0:
+            return 0.0
+        peak = self.values.max()
+        return max(peak, 0.0) if self.nnz < self.shape[0] * self.shape[1] else peak
+
+    def positive(self):
+        """0보다 큰 값"""
+        return self.values[self.values > 0]
+
+    def exceedance(self, threshold):
+        """threshold 초과 격자의 (개수, 행 번호, 열 번호). threshold < 0 이면 0인 격자도 포함하므로 밀집 배열로 계산"""
+        if threshold < 0:
+            rows, cols = np.nonzero(self.to_dense() > threshold)
+            return rows.size, rows, cols
+        mask = self.values > threshold
+        return int(mask.sum()), self.rows()[mask], self.cols()[mask]
+
+    def storage_bytes(self):
+        return self.indptr.nbytes + self.indices.nbytes + self.values.nbytes + 4 * 2
+
+
+def frames_max(frames):
+    """여러 프레임 전체의 최대값"""
+    return max((frame.max() for frame in frames), default=0.0)
+
+
+def positive_values(frames):
+    """여러 프레임의 0보다 큰 값을 이어 붙인 1차원 배열 (np.percentile 등에 사용)"""
+    parts = [frame.positive() for frame in frames]
+    return np.concatenate(parts) if parts else np.zeros(0)
+
+
+def positive_range(frames):
+    """0보다 큰 값의 (최소, 최대). 없으면 (inf, -inf)"""
+    low, high = np.inf, -np.inf
+    for frame in frames:
+        values = frame.positive()
+        if values.size:
+            low = min(low, values.min())
+            high = max(high, values.max())
+    return low, high
+
+
+def exceedance_counts(frames, threshold):
+    """프레임별 threshold 초과 격자 수"""
+    return np.array([frame.exceedance(threshold)[0] for frame in frames], dtype=np.int64)
@@ -0,0 +1,6 @@
+# CAM 모의 물질 목록. ConcentrationNN 폴더 번호 순서 (26번부터)
+SUBSTANCES = [
+    "Ethylacetate", "Benzene", "Methylacrylate", "Methyltrichlorosilane", "Ethyleneoxide",
+    "Triethylamine", "Methylethylketoneperoxide", "Methylhydrazine", "Chloromethane", "Methylamine",
+    "Vinylchloride", "Carbondisulfide", "Trimethylamine", "Propyleneoxide", "Methylvinylketone", "Nitrobenzene"
+]
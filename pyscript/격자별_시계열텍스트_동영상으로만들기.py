@@ -1,22 +1,18 @@
 import os
-import re
 import numpy as np
 from datetime import datetime
+from grid_reader import list_grid_files, parse_frame_time
 
 # 테스트 폴더 경로 설정
 test_folder = r"C:\CAM_test_analysis\input\Concentration31\1hour_interval\Air"
 
 def parse_filename(filename):
-    # 파일명에서 날짜와 시간 추출을 위한 정규표현식
-    pattern = r'Air(\d{4})Y\s*(\d{1,2})M\s*(\d{1,2})D\s*(\d{1,2})H\.TXT'
-    match = re.match(pattern, filename)
-    if match:
-        year, month, day, hour = map(int, match.groups())
-        return datetime(year, month, day, hour)
-    return None
+    # 1시간 간격 파일명만 사용 (1분 간격 파일은 None)
+    frame_time = parse_frame_time(filename)
+    return frame_time if isinstance(frame_time, datetime) else None
 
 # 폴더 내 텍스트 파일 목록 가져오기
-files = [f for f in os.listdir(test_folder) if f.endswith('.TXT')]
+files = list_grid_files(test_folder)
 
 # 파일명으로부터 날짜/시간 파싱 및 정렬
 file_datetimes = [(f, parse_filename(f)) for f in files]
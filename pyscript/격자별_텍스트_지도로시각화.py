@@ -1,7 +1,6 @@
 import os
 import numpy as np
 import matplotlib.pyplot as plt
-from shapely.geometry import Polygon
 import geopandas as gpd
 import contextily as ctx
 from matplotlib.colors import LinearSegmentedColormap, BoundaryNorm
@@ -9,48 +8,34 @@ from matplotlib.patches import Rectangle
 from matplotlib.animation import FuncAnimation
 import matplotlib.animation as animation
 from matplotlib.colors import ListedColormap
+from grid_geometry import DEFAULT_GEOMETRY
+from grid_reader import read_grid, read_grid_folder, parse_frame_time, format_frame_time
+from frame_catalog import list_catalog_files
 
 
 # 테스트 폴더 경로 설정
 test_folder = r"C:\CAM_test_analysis\input\Concentration31\1hour_interval\Air"
+# 파일 목록 카탈로그 (frame_catalog.py)
+catalog_path = r"C:\CAM_test_analysis\frame_catalog.sqlite"
 
 def read_data(file_path):
-    with open(file_path, 'r') as f:
-        lines = f.readlines()
-    data = []
-    for line in lines:
-        row = [float(x) for x in line.strip().split() if x]
-        data.append(row)
-    return np.array(data)
+    return read_grid(file_path)
 
 def find_concentration_range(folder_path):
-    all_data = []
-    for file in os.listdir(folder_path):
-        if file.endswith('.TXT'):
-            data = read_data(os.path.join(folder_path, file))
-            all_data.extend(data.flatten())
-    all_data = np.array(all_data)
+    _, all_data = read_grid_folder(folder_path)
     non_zero_data = all_data[all_data > 0]
     percentiles = np.percentile(non_zero_data, [20, 40, 60, 80])
     return [0] + list(percentiles) + [np.max(all_data)]
 
-def visualize_grid(data, start_x, start_y, cell_size=100):
-    rows, cols = data.shape
-
+def visualize_grid(data, geometry=DEFAULT_GEOMETRY):
     # 격자 생성
-    grid_cells = []
-    for i in range(rows):
-        for j in range(cols):
-            x1, y1 = start_x + j * cell_size, start_y + (rows - i - 1) * cell_size
-            x2, y2 = x1 + cell_size, y1 + cell_size
-            corners = [(x1, y1), (x2, y1), (x2, y2), (x1, y2)]
-            grid_cells.append(Polygon(corners))
+    grid_cells = geometry.cell_polygons()
 
     # GeoDataFrame 생성
     gdf = gpd.GeoDataFrame({
         'geometry': grid_cells,
         'concentration': data.flatten()
-    }, crs='EPSG:5186')
+    }, crs=geometry.crs)
 
     # 시각화
     fig, ax = plt.subplots(figsize=(10, 10), constrained_layout=True)
@@ -84,14 +69,14 @@ def visualize_grid(data, start_x, start_y, cell_size=100):
     ax.set_ylabel('Y Coordinate (km)')
 
     # 축 눈금 설정 (km 단위)
-    x_ticks = np.linspace(start_x, start_x + cols * cell_size, 6)
-    y_ticks = np.linspace(start_y, start_y + rows * cell_size, 6)
+    x_ticks = np.linspace(*geometry.extent[:2], 6)
+    y_ticks = np.linspace(*geometry.extent[2:], 6)
     ax.set_xticks(x_ticks)
     ax.set_yticks(y_ticks)
     ax.set_xticklabels([f'{x / 1000:.2f}' for x in x_ticks])
     ax.set_yticklabels([f'{y / 1000:.2f}' for y in y_ticks])
 
-    #ax.set_ylim(start_y - cell_size * 5, start_y + rows * cell_size + cell_size * 15)
+    #ax.set_ylim(geometry.extent[2] - geometry.cell_size * 5, geometry.extent[3] + geometry.cell_size * 15)
 
     return fig, ax
 
@@ -112,7 +97,7 @@ def update(frame):
     gdf = gpd.GeoDataFrame({
         'geometry': grid_cells,
         'concentration': data.flatten()
-    }, crs='EPSG:5186')
+    }, crs=geometry.crs)
     gdf.plot(column='concentration', ax=ax, cmap=cmap, norm=norm, alpha=0.7, edgecolor='gray', linewidth=0.8)
     ctx.add_basemap(ax, crs=gdf.crs.to_string(), source=ctx.providers.OpenStreetMap.Mapnik)
 
@@ -123,43 +108,30 @@ def update(frame):
     ax.set_yticks(y_ticks)
     ax.set_xticklabels([f'{x / 1000:.2f}' for x in x_ticks])
     ax.set_yticklabels([f'{y / 1000:.2f}' for y in y_ticks])
-    ax.set_ylim(start_y - cell_size * 5, start_y + rows * cell_size + cell_size * 15)
+    ax.set_ylim(geometry.extent[2] - geometry.cell_size * 5, geometry.extent[3] + geometry.cell_size * 15)
 
     # 제목 추가 (파일 이름에서 날짜와 시간 추출)
-    title = file.split('.')[0].split('Air')[1]
+    title = format_frame_time(parse_frame_time(file))
     ax.set_title(f'Concentration at {title}')
 
     return ax
 
 # 메인 코드
 if __name__ == "__main__":
-    # 좌표 입력 받기
-    start_x = float(164191)
-    start_y = float(470659)
-    cell_size = 100
+    # 격자 위치 (0번 행이 북쪽, 시각화 스크립트 공통)
+    geometry = DEFAULT_GEOMETRY
 
     # 농도 범위 찾기
     concentration_bounds = find_concentration_range(test_folder)
 
     # 파일 목록 가져오기 및 정렬
-    sorted_files = sorted([f for f in os.listdir(test_folder) if f.endswith('.TXT')])
+    sorted_files = list_catalog_files(catalog_path, test_folder)
 
     if not sorted_files:
         print("폴더에 텍스트 파일이 없습니다.")
     else:
-        # 첫 번째 파일로 초기 설정
-        first_file = os.path.join(test_folder, sorted_files[0])
-        data = read_data(first_file)
-        rows, cols = data.shape
-
         # 격자 생성 (한 번만 생성)
-        grid_cells = []
-        for i in range(rows):
-            for j in range(cols):
-                x1, y1 = start_x + j * cell_size, start_y + i * cell_size
-                x2, y2 = x1 + cell_size, y1 + cell_size
-                corners = [(x1, y1), (x2, y1), (x2, y2), (x1, y2)]
-                grid_cells.append(Polygon(corners))
+        grid_cells = geometry.cell_polygons()
 
         # 색상 매핑 설정
         colors = ['#FFFFFF', '#87CEFA', '#ADFF2F', '#FFFF00', '#FFA500', '#FF0000']
@@ -171,15 +143,15 @@ if __name__ == "__main__":
         norm = BoundaryNorm(concentration_bounds, cmap.N)
 
         # 축 눈금 설정
-        x_ticks = np.linspace(start_x, start_x + cols * cell_size, 6)
-        y_ticks = np.linspace(start_y, start_y + rows * cell_size, 6)
+        x_ticks = np.linspace(*geometry.extent[:2], 6)
+        y_ticks = np.linspace(*geometry.extent[2:], 6)
 
         # 각 시간에 대한 이미지 저장
         os.makedirs('frames', exist_ok=True)
         for i, file in enumerate(sorted_files):
             data = read_data(os.path.join(test_folder, file))
-            fig, ax = visualize_grid(data, start_x, start_y)
-            title = file.split('.')[0].split('Air')[1]
+            fig, ax = visualize_grid(data, geometry)
+            title = format_frame_time(parse_frame_time(file))
             ax.set_title(f'Concentration at {title}')
             plt.savefig(f'frames/frame_{i:03d}.png', dpi=600)
             plt.close(fig)
@@ -1,29 +1,23 @@
 import os
 import numpy as np
 import matplotlib.pyplot as plt
-from shapely.geometry import Polygon
 import geopandas as gpd
 import contextily as ctx
 from matplotlib.colors import LinearSegmentedColormap, BoundaryNorm
 from matplotlib.patches import Rectangle
-import h5py
 from tqdm import tqdm
 
-def visualize_grid(data, start_x, start_y, cell_size, concentration_bounds, colors, title):
-    rows, cols = data.shape
+from hdf5_store import iter_frames, iter_sparse_frames, frame_count, open_frames, frame_store_path
+from grid_geometry import read_geometry
+from sparse_frames import positive_values, frames_max
 
-    grid_cells = []
-    for i in range(rows):
-        for j in range(cols):
-            x1, y1 = start_x + j * cell_size, start_y + (rows - i - 1) * cell_size
-            x2, y2 = x1 + cell_size, y1 + cell_size
-            corners = [(x1, y1), (x2, y1), (x2, y2), (x1, y2)]
-            grid_cells.append(Polygon(corners))
+def visualize_grid(data, geometry, concentration_bounds, colors, title):
+    grid_cells = geometry.cell_polygons()
 
     gdf = gpd.GeoDataFrame({
         'geometry': grid_cells,
         'concentration': data.flatten()
-    }, crs='EPSG:5186')
+    }, crs=geometry.crs)
 
     n_bins = len(colors)
     cmap = LinearSegmentedColormap.from_list('custom', colors, N=n_bins)
@@ -48,8 +42,8 @@ def visualize_grid(data, start_x, start_y, cell_size, concentration_bounds, colo
 
     ax.set_xlabel('X Coordinate (km)')
     ax.set_ylabel('Y Coordinate (km)')
-    x_ticks = np.linspace(start_x, start_x + cols * cell_size, 6)
-    y_ticks = np.linspace(start_y, start_y + rows * cell_size, 6)
+    x_ticks = np.linspace(*geometry.extent[:2], 6)
+    y_ticks = np.linspace(*geometry.extent[2:], 6)
     ax.set_xticks(x_ticks)
     ax.set_yticks(y_ticks)
     ax.set_xticklabels([f'{x / 1000:.2f}' for x in x_ticks])
@@ -58,10 +52,12 @@ def visualize_grid(data, start_x, start_y, cell_size, concentration_bounds, colo
 
     return fig, ax
 
-def generate_images_from_hdf5(hdf5_file, output_folder, start_x, start_y, cell_size):
+def generate_images_from_hdf5(hdf5_file, output_folder, geometry=None):
+    """geometry: 격자 위치/크기 (grid_geometry.GridGeometry, 없으면 파일에 기록된 값)"""
     colors = ['#FFFFFF', '#87CEFA', '#ADFF2F', '#FFFF00', '#FFA500', '#FF0000']
 
-    with h5py.File(hdf5_file, 'r') as hf:
+    with open_frames(hdf5_file) as hf:
+        geometry = geometry or read_geometry(hf)
         for data_type in ['Air', 'Soil']:
             if data_type not in hf:
                 print(f"Warning: {data_type} data not found in {hdf5_file}. Skipping.")
@@ -71,35 +67,31 @@ def generate_images_from_hdf5(hdf5_file, output_folder, start_x, start_y, cell_s
             output_subfolder = os.path.join(output_folder, data_type)
             os.makedirs(output_subfolder, exist_ok=True)
 
-            all_data = np.array([group[key][()] for key in group.keys()])
-            concentration_bounds = [0] + list(np.percentile(all_data[all_data > 0], [20, 40, 60, 80])) + [np.max(all_data)]
+            frames = [frame for _, _, frame in iter_sparse_frames(group)]
+            concentration_bounds = [0] + list(np.percentile(positive_values(frames), [20, 40, 60, 80])) + [frames_max(frames)]
 
-            for i, key in enumerate(tqdm(group.keys(), desc=f"Generating {data_type} images")):
-                data = group[key][()]
-                timestamp = group[key].attrs['timestamp']
+            for i, timestamp, data in tqdm(iter_frames(group), total=frame_count(group),
+                                           desc=f"Generating {data_type} images"):
                 title = f'{data_type} Concentration at {timestamp}'
-                fig, ax = visualize_grid(data, start_x, start_y, cell_size, concentration_bounds, colors, title)
+                fig, ax = visualize_grid(data, geometry, concentration_bounds, colors, title)
                 plt.savefig(os.path.join(output_subfolder, f'frame_{i:03d}.png'), dpi=300)
                 plt.close(fig)
 
 def process_all_substances():
     hdf5_folder = r"C:\CAM_test_analysis\hdf5_data"
     output_base_folder = r"C:\CAM_test_analysis\graph"
-    start_x = 164191
-    start_y = 470659
-    cell_size = 100
 
     # 테스트를 위해 첫 번째 물질(Concentration26)만 처리
-    test_file = os.path.join(hdf5_folder, "Concentration26.h5")
+    test_file = frame_store_path(hdf5_folder, 26)
     test_output_folder = os.path.join(output_base_folder, "Concentration26")
-    generate_images_from_hdf5(test_file, test_output_folder, start_x, start_y, cell_size)
+    generate_images_from_hdf5(test_file, test_output_folder)
 
     # 주석 처리된 전체 물질 처리 코드
     """
     for folder_number in range(26, 42):
-        hdf5_file = os.path.join(hdf5_folder, f"Concentration{folder_number}.h5")
+        hdf5_file = frame_store_path(hdf5_folder, folder_number)
         output_folder = os.path.join(output_base_folder, f"Concentration{folder_number}")
-        generate_images_from_hdf5(hdf5_file, output_folder, start_x, start_y, cell_size)
+        generate_images_from_hdf5(hdf5_file, output_folder)
     """
 
 if __name__ == "__main__":
@@ -1,35 +1,29 @@
 import os
 import numpy as np
 import matplotlib.pyplot as plt
-from shapely.geometry import Polygon
 import geopandas as gpd
 import contextily as ctx
 from matplotlib.colors import LinearSegmentedColormap, BoundaryNorm, LogNorm
 from matplotlib.patches import Rectangle
-import h5py
 from tqdm import tqdm
 
-def visualize_grid(data, start_x, start_y, cell_size, colors, title, data_type, global_min, global_max):
+from hdf5_store import iter_frames, iter_sparse_frames, frame_count, open_frames, frame_store_path
+from grid_geometry import read_geometry
+from sparse_frames import positive_range
+
+def visualize_grid(data, geometry, colors, title, data_type, global_min, global_max):
     # Data validation
     data = np.ma.masked_invalid(data)
     if np.all(data.mask):
         print(f"Skipping frame: All data is invalid")
         return None, None
 
-    rows, cols = data.shape
-
-    grid_cells = []
-    for i in range(rows):
-        for j in range(cols):
-            x1, y1 = start_x + j * cell_size, start_y + (rows - i - 1) * cell_size
-            x2, y2 = x1 + cell_size, y1 + cell_size
-            corners = [(x1, y1), (x2, y1), (x2, y2), (x1, y2)]
-            grid_cells.append(Polygon(corners))
+    grid_cells = geometry.cell_polygons()
 
     gdf = gpd.GeoDataFrame({
         'geometry': grid_cells,
         'concentration': data.flatten()
-    }, crs='EPSG:5186')
+    }, crs=geometry.crs)
 
     # Calculate min and max for this frame
     non_zero_data = data[data > 0]
@@ -96,8 +90,8 @@ def visualize_grid(data, start_x, start_y, cell_size, colors, title, data_type,
 
     ax.set_xlabel('X Coordinate (km)')
     ax.set_ylabel('Y Coordinate (km)')
-    x_ticks = np.linspace(start_x, start_x + cols * cell_size, 6)
-    y_ticks = np.linspace(start_y, start_y + rows * cell_size, 6)
+    x_ticks = np.linspace(*geometry.extent[:2], 6)
+    y_ticks = np.linspace(*geometry.extent[2:], 6)
     ax.set_xticks(x_ticks)
     ax.set_yticks(y_ticks)
     ax.set_xticklabels([f'{x / 1000:.2f}' for x in x_ticks])
@@ -106,10 +100,12 @@ def visualize_grid(data, start_x, start_y, cell_size, colors, title, data_type,
 
     return fig, ax
 
-def generate_images_from_hdf5(hdf5_file, output_folder, start_x, start_y, cell_size):
+def generate_images_from_hdf5(hdf5_file, output_folder, geometry=None):
+    """geometry: 격자 위치/크기 (grid_geometry.GridGeometry, 없으면 파일에 기록된 값)"""
     colors = ['#FFFFFF', '#87CEFA', '#ADFF2F', '#FFFF00', '#FFA500', '#FF0000']
 
-    with h5py.File(hdf5_file, 'r') as hf:
+    with open_frames(hdf5_file) as hf:
+        geometry = geometry or read_geometry(hf)
         for data_type in ['Air', 'Soil']:
             if data_type not in hf:
                 print(f"Warning: {data_type} data not found in {hdf5_file}. Skipping.")
@@ -121,14 +117,7 @@ def generate_images_from_hdf5(hdf5_file, output_folder, start_x, start_y, cell_s
 
             # Calculate global min and max for Soil data
             if data_type == 'Soil':
-                global_min = np.inf
-                global_max = -np.inf
-                for key in group.keys():
-                    data = group[key][()]
-                    non_zero_data = data[data > 0]
-                    if non_zero_data.size > 0:
-                        global_min = min(global_min, np.min(non_zero_data))
-                        global_max = max(global_max, np.max(data))
+                global_min, global_max = positive_range(frame for _, _, frame in iter_sparse_frames(group))
 
                 if global_min == np.inf or global_max == -np.inf:
                     global_min, global_max = 0, 1
@@ -139,13 +128,12 @@ def generate_images_from_hdf5(hdf5_file, output_folder, start_x, start_y, cell_s
             else:
                 global_min, global_max = None, None  # Not used for Air data
 
-            for i, key in enumerate(tqdm(group.keys(), desc=f"Generating {data_type} images")):
+            for i, timestamp, data in tqdm(iter_frames(group), total=frame_count(group),
+                                           desc=f"Generating {data_type} images"):
                 try:
-                    data = group[key][()]
-                    timestamp = group[key].attrs['timestamp']
                     title = f'{data_type} Concentration at {timestamp}'
 
-                    fig, ax = visualize_grid(data, start_x, start_y, cell_size, colors, title, data_type, global_min, global_max)
+                    fig, ax = visualize_grid(data, geometry, colors, title, data_type, global_min, global_max)
                     if fig is not None:
                         plt.savefig(os.path.join(output_subfolder, f'frame_{i:03d}.png'), dpi=300, bbox_inches='tight')
                         plt.close(fig)
@@ -156,15 +144,12 @@ def generate_images_from_hdf5(hdf5_file, output_folder, start_x, start_y, cell_s
 def process_all_substances():
     hdf5_folder = r"C:\CAM_test_analysis\hdf5_data"
     output_base_folder = r"C:\CAM_test_analysis\graph"
-    start_x = 164191
-    start_y = 470659
-    cell_size = 100
 
     for folder_number in range(37, 38):
-        hdf5_file = os.path.join(hdf5_folder, f"Concentration{folder_number}.h5")
+        hdf5_file = frame_store_path(hdf5_folder, folder_number)
         output_folder = os.path.join(output_base_folder, f"Concentration{folder_number}")
         try:
-            generate_images_from_hdf5(hdf5_file, output_folder, start_x, start_y, cell_size)
+            generate_images_from_hdf5(hdf5_file, output_folder)
         except Exception as e:
             print(f"Error processing Concentration{folder_number}.h5: {e}")
             continue
@@ -1,72 +1,33 @@
 import os
+from contextlib import nullcontext
 import numpy as np
 import matplotlib.pyplot as plt
-from shapely.geometry import Polygon
-import geopandas as gpd
-import contextily as ctx
-from matplotlib.colors import LinearSegmentedColormap, BoundaryNorm, LogNorm
-from matplotlib.patches import Rectangle
-import h5py
 from tqdm import tqdm
 
-def visualize_grid(data, start_x, start_y, cell_size, colors, title, data_type, global_min, global_max):
+from hdf5_store import iter_frames, frame_count, open_frames, frame_store_path
+from grid_geometry import read_geometry
+from basemap_cache import basemap_or_fallback
+from map_render import (DEFAULT_COLORS, RENDER_MODES, concentration_range, concentration_norm, add_basemap,
+                        add_colorbar, set_map_axes, grid_values, global_range, FrameSequenceRenderer)
+
+def visualize_grid(data, geometry, colors, title, data_type, global_min, global_max, basemap=True):
     # Data validation
     data = np.ma.masked_invalid(data)
     if np.all(data.mask):
         print(f"Skipping frame: All data is invalid")
         return None, None
 
-    rows, cols = data.shape
-
-    grid_cells = []
-    for i in range(rows):
-        for j in range(cols):
-            x1, y1 = start_x + j * cell_size, start_y + (rows - i - 1) * cell_size
-            x2, y2 = x1 + cell_size, y1 + cell_size
-            corners = [(x1, y1), (x2, y1), (x2, y2), (x1, y2)]
-            grid_cells.append(Polygon(corners))
-
-    gdf = gpd.GeoDataFrame({
-        'geometry': grid_cells,
-        'concentration': data.flatten()
-    }, crs='EPSG:5186')
-
-    # Calculate min and max for this frame
-    non_zero_data = data[data > 0]
-    if non_zero_data.size > 0:
-        frame_min = np.min(non_zero_data)
-        frame_max = np.max(data)
-    else:
-        frame_min = frame_max = 0
+    gdf = grid_values(geometry, data)
 
     # Use global range for Soil, frame range for Air
-    if data_type == 'Soil':
-        min_conc, max_conc = global_min, global_max
-        print(f"Using global range for Soil: {min_conc}, {max_conc}")
-    else:
-        min_conc, max_conc = frame_min, frame_max
-        print(f"Using frame range for Air: {min_conc}, {max_conc}")
-
-    # If both min and max are 0, set a default range
-    if min_conc == max_conc == 0:
-        min_conc, max_conc = 0, 1
-        print("Warning: All data is zero. Using default range: 0, 1")
+    min_conc, max_conc = concentration_range(data, data_type, global_min, global_max)
+    cmap, norm = concentration_norm(data_type, colors, min_conc, max_conc)
 
     fig, ax = plt.subplots(figsize=(12, 10), constrained_layout=True)
 
     # 데이터가 0인 부분의 마스크 생성
     zero_mask = data == 0
 
-    if data_type == 'Soil':
-        # For soil, use log scale
-        norm = LogNorm(vmin=max(min_conc, 1e-10), vmax=max(max_conc, 1e-9))
-    else:
-        # For air, use linear scale
-        concentration_bounds = np.linspace(min_conc, max_conc, len(colors) + 1)
-        norm = BoundaryNorm(concentration_bounds, len(colors))
-
-    cmap = LinearSegmentedColormap.from_list('custom', colors, N=len(colors))
-
     # 모든 셀 그리기 (0 포함)
     gdf.plot(ax=ax, facecolor='none', edgecolor='gray', linewidth=0.5)
 
@@ -78,38 +39,26 @@ def visualize_grid(data, start_x, start_y, cell_size, colors, title, data_type,
     else:
         print("Warning: No non-zero data to plot")
 
-    sm = plt.cm.ScalarMappable(cmap=cmap, norm=norm)
-    sm.set_array([])
-
-    ctx.add_basemap(ax, crs=gdf.crs.to_string(), source=ctx.providers.OpenStreetMap.Mapnik)
-
-    cbar = fig.colorbar(sm, ax=ax, pad=0.02)
-    if data_type == 'Soil':
-        cbar.set_ticks(np.logspace(np.log10(max(min_conc, 1e-10)), np.log10(max(max_conc, 1e-9)), num=len(colors) + 1))
-    else:
-        cbar.set_ticks(np.linspace(min_conc, max_conc, num=len(colors) + 1))
-    cbar.set_ticklabels([f'{b:.1e}' for b in cbar.get_ticks()])
-
-    concentration_unit = 'μg/m³' if data_type == 'Air' else 'μg/kg'
-    cbar.set_label(f'Concentration ({concentration_unit})', fontsize=10)
-    cbar.ax.tick_params(labelsize=9)
-
-    ax.set_xlabel('X Coordinate (km)')
-    ax.set_ylabel('Y Coordinate (km)')
-    x_ticks = np.linspace(start_x, start_x + cols * cell_size, 6)
-    y_ticks = np.linspace(start_y, start_y + rows * cell_size, 6)
-    ax.set_xticks(x_ticks)
-    ax.set_yticks(y_ticks)
-    ax.set_xticklabels([f'{x / 1000:.2f}' for x in x_ticks])
-    ax.set_yticklabels([f'{y / 1000:.2f}' for y in y_ticks])
-    ax.set_title(title)
+    add_basemap(ax, geometry, basemap)
+    add_colorbar(fig, ax, cmap, norm, data_type, colors, min_conc, max_conc)
+    set_map_axes(ax, geometry, title)
 
     return fig, ax
 
-def generate_images_from_hdf5(hdf5_file, output_folder, start_x, start_y, cell_size):
-    colors = ['#FFFFFF', '#87CEFA', '#ADFF2F', '#FFFF00', '#FFA500', '#FF0000']
-
-    with h5py.File(hdf5_file, 'r') as hf:
+def generate_images_from_hdf5(hdf5_file, output_folder, geometry=None, render_mode='vector', tile_store=None,
+                              tile_source=None):
+    """geometry: 격자 위치/크기 (grid_geometry.GridGeometry, 없으면 파일에 기록된 값).
+    render_mode: 'vector' (격자별 polygon) 또는 'raster' (이미지 하나, 훨씬 빠름. map_render 참고).
+    'raster' 는 매체마다 그림 하나를 만들어 두고 프레임마다 자료와 제목만 바꿔 저장 (FrameSequenceRenderer).
+    tile_store: 오프라인 타일 저장소 폴더. 주면 배경 지도를 한 번만 재투영해 모든 프레임에 사용
+    (tile_source 는 저장소에 없는 타일을 가져올 로컬 폴더/내부 서버, basemap_cache 참고). 없거나 배경 지도를 만들 수 없으면 온라인 타일"""
+    if render_mode not in RENDER_MODES:
+        raise ValueError(f"render_mode 는 {RENDER_MODES} 중 하나여야 합니다: {render_mode!r}")
+    colors = DEFAULT_COLORS
+
+    with open_frames(hdf5_file) as hf:
+        geometry = geometry or read_geometry(hf)
+        basemap = basemap_or_fallback(tile_store, geometry, tile_source)
         for data_type in ['Air', 'Soil']:
             if data_type not in hf:
                 print(f"Warning: {data_type} data not found in {hdf5_file}. Skipping.")
@@ -119,52 +68,47 @@ def generate_images_from_hdf5(hdf5_file, output_folder, start_x, start_y, cell_s
             output_subfolder = os.path.join(output_folder, data_type)
             os.makedirs(output_subfolder, exist_ok=True)
 
-            # Calculate global min and max for Soil data
-            if data_type == 'Soil':
-                global_min = np.inf
-                global_max = -np.inf
-                for key in group.keys():
-                    data = group[key][()]
-                    non_zero_data = data[data > 0]
-                    if non_zero_data.size > 0:
-                        global_min = min(global_min, np.min(non_zero_data))
-                        global_max = max(global_max, np.max(data))
-
-                if global_min == np.inf or global_max == -np.inf:
-                    global_min, global_max = 0, 1
-                    print(f"Warning: All Soil data is zero or invalid. Using default global range: 0, 1")
-                elif global_min == global_max:
-                    global_min, global_max = global_min * 0.9, global_max * 1.1
-                    print(f"Warning: All non-zero Soil data has the same value. Adjusting range slightly.")
+            # Calculate global min and max for Soil data (not used for Air data)
+            global_min, global_max = global_range(group, data_type)
+
+            # 'vector' 방식은 프레임마다 그림을 만들고 닫으므로 renderer 없음 (None)
+            if render_mode == 'raster':
+                renderer_context = FrameSequenceRenderer(geometry, colors, data_type, global_min, global_max, basemap)
             else:
-                global_min, global_max = None, None  # Not used for Air data
-
-            for i, key in enumerate(tqdm(group.keys(), desc=f"Generating {data_type} images")):
-                try:
-                    data = group[key][()]
-                    timestamp = group[key].attrs['timestamp']
-                    title = f'{data_type} Concentration at {timestamp}'
-
-                    fig, ax = visualize_grid(data, start_x, start_y, cell_size, colors, title, data_type, global_min, global_max)
-                    if fig is not None:
-                        plt.savefig(os.path.join(output_subfolder, f'frame_{i:03d}.png'), dpi=300, bbox_inches='tight')
-                        plt.close(fig)
-                except Exception as e:
-                    print(f"Error processing frame {i} for {data_type}: {e}")
-                    continue
-
-def process_all_substances():
+                renderer_context = nullcontext()
+
+            with renderer_context as renderer:
+                for i, timestamp, data in tqdm(iter_frames(group), total=frame_count(group),
+                                               desc=f"Generating {data_type} images"):
+                    try:
+                        title = f'{data_type} Concentration at {timestamp}'
+                        output_path = os.path.join(output_subfolder, f'frame_{i:03d}.png')
+
+                        if renderer is not None:
+                            renderer.render(data, title, output_path)
+                            continue
+                        fig, ax = visualize_grid(data, geometry, colors, title, data_type, global_min, global_max,
+                                                 basemap)
+                        if fig is not None:
+                            plt.savefig(output_path, dpi=300, bbox_inches='tight')
+                            plt.close(fig)
+                    except Exception as e:
+                        print(f"Error processing frame {i} for {data_type}: {e}")
+                        continue
+
+def process_all_substances(render_mode='raster'):
     hdf5_folder = r"C:\CAM_test_analysis\hdf5_data"
     output_base_folder = r"C:\CAM_test_analysis\graph"
-    start_x = 164191
-    start_y = 470659
-    cell_size = 100
+    # 오프라인 타일 저장소와 저장소를 채울 로컬 타일 폴더 (None 이거나 배경 지도를 만들 수 없으면 온라인 타일)
+    tile_store = r"C:\CAM_test_analysis\basemap\tiles"
+    tile_source = r"C:\CAM_test_analysis\basemap\osm_tiles\{z}\{x}\{y}.png"
 
     for folder_number in range(26, 42):
-        hdf5_file = os.path.join(hdf5_folder, f"Concentration{folder_number}.h5")
+        hdf5_file = frame_store_path(hdf5_folder, folder_number)
         output_folder = os.path.join(output_base_folder, f"Concentration{folder_number}")
         try:
-            generate_images_from_hdf5(hdf5_file, output_folder, start_x, start_y, cell_size)
+            generate_images_from_hdf5(hdf5_file, output_folder, render_mode=render_mode, tile_store=tile_store,
+                                      tile_source=tile_source)
         except Exception as e:
             print(f"Error processing Concentration{folder_number}.h5: {e}")
             continue
@@ -1,17 +1,19 @@
 import os
 import numpy as np
 import matplotlib.pyplot as plt
-from shapely.geometry import Polygon
-import geopandas as gpd
-import contextily as ctx
-from matplotlib.colors import LinearSegmentedColormap, BoundaryNorm, LogNorm
-import h5py
 from tqdm import tqdm
 from concurrent.futures import ProcessPoolExecutor, as_completed
 import multiprocessing
 import psutil
 import math
 
+from hdf5_store import iter_frames, iter_sparse_frames, open_frames, frame_store_path
+from grid_geometry import read_geometry
+from sparse_frames import positive_range
+from basemap_cache import basemap_or_fallback
+from map_render import (DEFAULT_COLORS, RENDER_MODES, concentration_range, concentration_norm, add_basemap,
+                        add_colorbar, set_map_axes, grid_values, FrameSequenceRenderer)
+
 def get_available_memory():
     return psutil.virtual_memory().available
 
@@ -25,49 +27,21 @@ def get_optimal_workers():
     memory_based_workers = max(1, int(available_memory / (2 * 1024 * 1024 * 1024)))  # Assuming 2GB per worker
     return min(cpu_count, memory_based_workers)
 
-def visualize_grid(data, start_x, start_y, cell_size, colors, title, data_type, global_min, global_max):
+def visualize_grid(data, geometry, colors, title, data_type, global_min, global_max, basemap=True):
     data = np.ma.masked_invalid(data)
     if np.all(data.mask):
         print(f"Skipping frame: All data is invalid")
         return None, None
 
-    rows, cols = data.shape
-
-    x = np.arange(start_x, start_x + cols * cell_size, cell_size)
-    y = np.arange(start_y + rows * cell_size, start_y, -cell_size)
-    xx, yy = np.meshgrid(x, y)
-    grid_cells = [Polygon([(x1, y1), (x1+cell_size, y1), (x1+cell_size, y1+cell_size), (x1, y1+cell_size)])
-                  for x1, y1 in zip(xx.flatten(), yy.flatten())]
+    gdf = grid_values(geometry, data)
 
-    gdf = gpd.GeoDataFrame({
-        'geometry': grid_cells,
-        'concentration': data.flatten()
-    }, crs='EPSG:5186')
-
-    non_zero_data = data[data > 0]
-    frame_min = np.min(non_zero_data) if non_zero_data.size > 0 else 0
-    frame_max = np.max(data)
-
-    if data_type == 'Soil':
-        min_conc, max_conc = global_min, global_max
-    else:
-        min_conc, max_conc = frame_min, frame_max
-
-    if min_conc == max_conc == 0:
-        min_conc, max_conc = 0, 1
+    min_conc, max_conc = concentration_range(data, data_type, global_min, global_max)
+    cmap, norm = concentration_norm(data_type, colors, min_conc, max_conc)
 
     fig, ax = plt.subplots(figsize=(12, 10), constrained_layout=True)
 
     zero_mask = data == 0
 
-    if data_type == 'Soil':
-        norm = LogNorm(vmin=max(min_conc, 1e-10), vmax=max(max_conc, 1e-9))
-    else:
-        concentration_bounds = np.linspace(min_conc, max_conc, len(colors) + 1)
-        norm = BoundaryNorm(concentration_bounds, len(colors))
-
-    cmap = LinearSegmentedColormap.from_list('custom', colors, N=len(colors))
-
     gdf.plot(ax=ax, facecolor='none', edgecolor='gray', linewidth=0.5)
 
     non_zero_data = gdf.loc[~zero_mask.flatten()]
@@ -77,47 +51,48 @@ def visualize_grid(data, start_x, start_y, cell_size, colors, title, data_type,
     else:
         print("Warning: No non-zero data to plot")
 
-    sm = plt.cm.ScalarMappable(cmap=cmap, norm=norm)
-    sm.set_array([])
-
-    ctx.add_basemap(ax, crs=gdf.crs.to_string(), source=ctx.providers.OpenStreetMap.Mapnik)
-
-    cbar = fig.colorbar(sm, ax=ax, pad=0.02)
-    if data_type == 'Soil':
-        cbar.set_ticks(np.logspace(np.log10(max(min_conc, 1e-10)), np.log10(max(max_conc, 1e-9)), num=len(colors) + 1))
-    else:
-        cbar.set_ticks(np.linspace(min_conc, max_conc, num=len(colors) + 1))
-    cbar.set_ticklabels([f'{b:.1e}' for b in cbar.get_ticks()])
-
-    concentration_unit = 'μg/m³' if data_type == 'Air' else 'μg/kg'
-    cbar.set_label(f'Concentration ({concentration_unit})', fontsize=10)
-    cbar.ax.tick_params(labelsize=9)
-
-    ax.set_xlabel('X Coordinate (km)')
-    ax.set_ylabel('Y Coordinate (km)')
-    x_ticks = np.linspace(start_x, start_x + cols * cell_size, 6)
-    y_ticks = np.linspace(start_y, start_y + rows * cell_size, 6)
-    ax.set_xticks(x_ticks)
-    ax.set_yticks(y_ticks)
-    ax.set_xticklabels([f'{x / 1000:.2f}' for x in x_ticks])
-    ax.set_yticklabels([f'{y / 1000:.2f}' for y in y_ticks])
-    ax.set_title(title)
+    add_basemap(ax, geometry, basemap)
+    add_colorbar(fig, ax, cmap, norm, data_type, colors, min_conc, max_conc)
+    set_map_axes(ax, geometry, title)
 
     return fig, ax
 
 def process_frame(args):
-    key, data, timestamp, start_x, start_y, cell_size, colors, data_type, global_min, global_max, output_path = args
+    key, data, timestamp, geometry, colors, data_type, global_min, global_max, output_path, basemap = args
     title = f'{data_type} Concentration at {timestamp}'
-    fig, ax = visualize_grid(data, start_x, start_y, cell_size, colors, title, data_type, global_min, global_max)
+    fig, ax = visualize_grid(data, geometry, colors, title, data_type, global_min, global_max, basemap)
     if fig is not None:
         plt.savefig(output_path, dpi=300, bbox_inches='tight')
         plt.close(fig)
     return key
 
-def generate_images_from_hdf5(hdf5_file, output_folder, start_x, start_y, cell_size):
-    colors = ['#FFFFFF', '#87CEFA', '#ADFF2F', '#FFFF00', '#FFA500', '#FF0000']
-
-    with h5py.File(hdf5_file, 'r') as hf:
+def process_frame_batch(batch):
+    """raster 방식: 작업 프로세스마다 그림 하나를 만들어 두고 여러 프레임을 이어서 저장 (FrameSequenceRenderer)"""
+    _, _, _, geometry, colors, data_type, global_min, global_max, _, basemap = batch[0]
+    keys = []
+    with FrameSequenceRenderer(geometry, colors, data_type, global_min, global_max, basemap) as renderer:
+        for key, data, timestamp, *_, output_path, _ in batch:
+            try:
+                renderer.render(data, f'{data_type} Concentration at {timestamp}', output_path)
+                keys.append(key)
+            except Exception as e:
+                print(f"Error processing frame {key}: {e}")
+    return keys
+
+def generate_images_from_hdf5(hdf5_file, output_folder, geometry=None, render_mode='vector', tile_store=None,
+                              tile_source=None):
+    """geometry: 격자 위치/크기 (grid_geometry.GridGeometry, 없으면 파일에 기록된 값).
+    render_mode: 'vector' (격자별 polygon) 또는 'raster' (이미지 하나, 훨씬 빠름. map_render 참고).
+    'raster' 는 묶음의 프레임을 작업 프로세스 수만큼 나눠 프로세스마다 그림 하나로 이어서 그림.
+    tile_store: 오프라인 타일 저장소 폴더. 주면 배경 지도를 한 번만 재투영해 모든 프레임에 사용
+    (tile_source 는 저장소에 없는 타일을 가져올 로컬 폴더/내부 서버, basemap_cache 참고). 없거나 배경 지도를 만들 수 없으면 온라인 타일"""
+    if render_mode not in RENDER_MODES:
+        raise ValueError(f"render_mode 는 {RENDER_MODES} 중 하나여야 합니다: {render_mode!r}")
+    colors = DEFAULT_COLORS
+
+    with open_frames(hdf5_file) as hf:
+        geometry = geometry or read_geometry(hf)
+        basemap = basemap_or_fallback(tile_store, geometry, tile_source)
         for data_type in ['Air', 'Soil']:
             if data_type not in hf:
                 print(f"Warning: {data_type} data not found in {hdf5_file}. Skipping.")
@@ -128,11 +103,8 @@ def generate_images_from_hdf5(hdf5_file, output_folder, start_x, start_y, cell_s
             os.makedirs(output_subfolder, exist_ok=True)
 
             if data_type == 'Soil':
-                non_zero_data = [group[key][()] for key in group.keys() if np.any(group[key][()] > 0)]
-                if non_zero_data:
-                    global_min = min(np.min(arr[arr > 0]) for arr in non_zero_data)
-                    global_max = max(np.max(arr) for arr in non_zero_data)
-                else:
+                global_min, global_max = positive_range(frame for _, _, frame in iter_sparse_frames(group))
+                if global_min == np.inf:
                     global_min, global_max = 0, 1
                 if global_min == global_max:
                     global_min, global_max = global_min * 0.9, global_max * 1.1
@@ -140,9 +112,9 @@ def generate_images_from_hdf5(hdf5_file, output_folder, start_x, start_y, cell_s
                 global_min, global_max = None, None
 
             args_list = [
-                (key, group[key][()], group[key].attrs['timestamp'], start_x, start_y, cell_size, colors, data_type, global_min, global_max,
-                 os.path.join(output_subfolder, f'frame_{i:03d}.png'))
-                for i, key in enumerate(group.keys())
+                (f'frame_{i:03d}', data, timestamp, geometry, colors, data_type, global_min, global_max,
+                 os.path.join(output_subfolder, f'frame_{i:03d}.png'), basemap)
+                for i, timestamp, data in iter_frames(group)
             ]
 
             total_frames = len(args_list)
@@ -154,25 +126,30 @@ def generate_images_from_hdf5(hdf5_file, output_folder, start_x, start_y, cell_s
             for i in range(0, total_frames, chunk_size):
                 chunk = args_list[i:i+chunk_size]
                 with ProcessPoolExecutor(max_workers=num_workers) as executor:
-                    futures = [executor.submit(process_frame, args) for args in chunk]
+                    if render_mode == 'raster':
+                        futures = [executor.submit(process_frame_batch, chunk[k::num_workers])
+                                   for k in range(min(num_workers, len(chunk)))]
+                    else:
+                        futures = [executor.submit(process_frame, args) for args in chunk]
                     for future in tqdm(as_completed(futures), total=len(futures), desc=f"Generating {data_type} images (chunk {i//chunk_size + 1}/{math.ceil(total_frames/chunk_size)})"):
                         try:
                             future.result()
                         except Exception as e:
                             print(f"Error processing frame: {e}")
 
-def process_all_substances():
+def process_all_substances(render_mode='raster'):
     hdf5_folder = r"C:\CAM_test_analysis\hdf5_data"
     output_base_folder = r"C:\CAM_test_analysis\graph"
-    start_x = 164191
-    start_y = 470659
-    cell_size = 100
+    # 오프라인 타일 저장소와 저장소를 채울 로컬 타일 폴더 (None 이거나 배경 지도를 만들 수 없으면 온라인 타일)
+    tile_store = r"C:\CAM_test_analysis\basemap\tiles"
+    tile_source = r"C:\CAM_test_analysis\basemap\osm_tiles\{z}\{x}\{y}.png"
 
     for folder_number in range(26, 42):
-        hdf5_file = os.path.join(hdf5_folder, f"Concentration{folder_number}.h5")
+        hdf5_file = frame_store_path(hdf5_folder, folder_number)
         output_folder = os.path.join(output_base_folder, f"Concentration{folder_number}")
         try:
-            generate_images_from_hdf5(hdf5_file, output_folder, start_x, start_y, cell_size)
+            generate_images_from_hdf5(hdf5_file, output_folder, render_mode=render_mode, tile_store=tile_store,
+                                      tile_source=tile_source)
         except Exception as e:
             print(f"Error processing Concentration{folder_number}.h5: {e}")
             continue
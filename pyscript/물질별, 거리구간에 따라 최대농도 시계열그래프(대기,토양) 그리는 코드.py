@@ -6,9 +6,13 @@ from matplotlib.ticker import FuncFormatter, MaxNLocator
 from adjustText import adjust_text
 import h5py
 
+from freshness import stale_groups
+
 # 기본 경로 설정
 output_path = r'C:\CAM_test_analysis\output'
 hdf5_file = os.path.join(output_path, 'concentration_data.h5')
+# concentration_data.h5 를 만든 1분 간격 프레임 (최신 여부 확인용)
+frames_folder = r'C:\CAM_test_analysis\hdf5_live'
 
 # 거리 구간 정의 (미터 단위)
 distance_ranges = [(0, 500), (500, 1000), (1000, 3000), (3000, 5000), (5000, 7000)]
@@ -86,6 +90,12 @@ def process_hdf5_data(hdf5_file, output_path, substance_name, medium):
     print(f"그래프가 '{output_file}' 파일로 저장되었습니다.")
 
 
+# 그리기 전에 결과가 최신인지 확인 (프레임은 읽지 않음)
+stale = stale_groups(hdf5_file, frames_folder, substances, distance_ranges)
+if stale:
+    print(f"주의: 입력 프레임이나 설정이 바뀐 그룹이 있습니다 ({', '.join(f'{m}/{s}' for m, s in stale)}).")
+    print("HDF5 파일 생성 스크립트를 먼저 실행하면 최신 결과로 그립니다.")
+
 # 모든 물질에 대해 처리
 for substance_name in substances:
     for medium in ['Air', 'Soil']:
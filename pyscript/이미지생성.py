@@ -1,47 +1,25 @@
 import os
 import numpy as np
 import matplotlib.pyplot as plt
-from shapely.geometry import Polygon
-import geopandas as gpd
 import contextily as ctx
 from matplotlib.colors import LinearSegmentedColormap, BoundaryNorm
 from matplotlib.patches import Rectangle
+from grid_geometry import DEFAULT_GEOMETRY
+from map_render import grid_values
+from grid_reader import read_grid, read_grid_folder, list_grid_files, parse_frame_time, format_frame_time
+from frame_catalog import list_catalog_files
 
 def read_data(file_path):
-    with open(file_path, 'r') as f:
-        lines = f.readlines()
-    data = []
-    for line in lines:
-        row = [float(x) for x in line.strip().split() if x]
-        data.append(row)
-    return np.array(data)
+    return read_grid(file_path)
 
 def find_concentration_range(folder_path):
-    all_data = []
-    for file in os.listdir(folder_path):
-        if file.endswith('.TXT'):
-            data = read_data(os.path.join(folder_path, file))
-            all_data.extend(data.flatten())
-    all_data = np.array(all_data)
+    _, all_data = read_grid_folder(folder_path)
     non_zero_data = all_data[all_data > 0]
     percentiles = np.percentile(non_zero_data, [20, 40, 60, 80])
     return [0] + list(percentiles) + [np.max(all_data)]
 
-def visualize_grid(data, start_x, start_y, cell_size, concentration_bounds, colors):
-    rows, cols = data.shape
-
-    grid_cells = []
-    for i in range(rows):
-        for j in range(cols):
-            x1, y1 = start_x + j * cell_size, start_y + (rows - i - 1) * cell_size
-            x2, y2 = x1 + cell_size, y1 + cell_size
-            corners = [(x1, y1), (x2, y1), (x2, y2), (x1, y2)]
-            grid_cells.append(Polygon(corners))
-
-    gdf = gpd.GeoDataFrame({
-        'geometry': grid_cells,
-        'concentration': data.flatten()
-    }, crs='EPSG:5186')
+def visualize_grid(data, geometry, concentration_bounds, colors):
+    gdf = grid_values(geometry, data)
 
     n_bins = len(colors)
     cmap = LinearSegmentedColormap.from_list('custom', colors, N=n_bins)
@@ -66,8 +44,8 @@ def visualize_grid(data, start_x, start_y, cell_size, concentration_bounds, colo
 
     ax.set_xlabel('X Coordinate (km)')
     ax.set_ylabel('Y Coordinate (km)')
-    x_ticks = np.linspace(start_x, start_x + cols * cell_size, 6)
-    y_ticks = np.linspace(start_y, start_y + rows * cell_size, 6)
+    x_ticks = np.linspace(*geometry.extent[:2], 6)
+    y_ticks = np.linspace(*geometry.extent[2:], 6)
     ax.set_xticks(x_ticks)
     ax.set_yticks(y_ticks)
     ax.set_xticklabels([f'{x / 1000:.2f}' for x in x_ticks])
@@ -75,19 +53,23 @@ def visualize_grid(data, start_x, start_y, cell_size, concentration_bounds, colo
 
     return fig, ax
 
-def generate_images(substance_folder, substance_number, start_x, start_y, cell_size):
+def generate_images(substance_folder, substance_number, geometry=DEFAULT_GEOMETRY, catalog_path=None):
     concentration_bounds = find_concentration_range(substance_folder)
     colors = ['#FFFFFF', '#87CEFA', '#ADFF2F', '#FFFF00', '#FFA500', '#FF0000']
 
-    sorted_files = sorted([f for f in os.listdir(substance_folder) if f.endswith('.TXT')])
+    # 카탈로그가 있으면 폴더를 다시 훑지 않고 파일 목록을 읽음 (frame_catalog.py)
+    if catalog_path:
+        sorted_files = list_catalog_files(catalog_path, substance_folder)
+    else:
+        sorted_files = list_grid_files(substance_folder)
 
     output_folder = os.path.join(r'C:\CAM_test_analysis\graph', f'Concentration{substance_number}')
     os.makedirs(output_folder, exist_ok=True)
 
     for i, file in enumerate(sorted_files):
         data = read_data(os.path.join(substance_folder, file))
-        fig, ax = visualize_grid(data, start_x, start_y, cell_size, concentration_bounds, colors)
-        title = file.split('.')[0].split('Air')[1]
+        fig, ax = visualize_grid(data, geometry, concentration_bounds, colors)
+        title = format_frame_time(parse_frame_time(file))
         ax.set_title(f'Concentration{substance_number} at {title}')
         plt.savefig(os.path.join(output_folder, f'frame_{i:03d}.png'), dpi=300)
         plt.close(fig)
@@ -96,20 +78,18 @@ def generate_images(substance_folder, substance_number, start_x, start_y, cell_s
 
 def process_all_substances():
     base_folder = r"C:\CAM_test_analysis\input"
-    start_x = 164191
-    start_y = 470659
-    cell_size = 100
+    catalog_path = r"C:\CAM_test_analysis\frame_catalog.sqlite"
 
     # 테스트를 위해 첫 번째 물질(Concentration26)만 처리
     test_folder_number = 26
     test_folder = os.path.join(base_folder, f"Concentration{test_folder_number}", "1hour_interval", "Air")
-    generate_images(test_folder, test_folder_number, start_x, start_y, cell_size)
+    generate_images(test_folder, test_folder_number, catalog_path=catalog_path)
 
     # 주석 처리된 전체 물질 처리 코드
     """
     for folder_number in range(26, 42):
         substance_folder = os.path.join(base_folder, f"Concentration{folder_number}", "1hour_interval", "Air")
-        generate_images(substance_folder, folder_number, start_x, start_y, cell_size)
+        generate_images(substance_folder, folder_number, catalog_path=catalog_path)
     """
 
 if __name__ == "__main__":